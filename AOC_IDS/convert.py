@@ -50,6 +50,7 @@ FEATURES (15):
 # =============================================================================
 
 import os
+import sys
 import numpy as np
 import pandas as pd
 from scipy import stats
@@ -61,6 +62,12 @@ import argparse
 
 warnings.filterwarnings('ignore')
 
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+try:
+    import netmob_store
+except ImportError:
+    netmob_store = None
+
 
 # =============================================================================
 # SECTION 2 : CONFIGURATION DES 15 FEATURES
@@ -223,18 +230,31 @@ def extract_features(values, date, tile_id):
 # SECTION 5 : TRAITEMENT D'UN FICHIER
 # =============================================================================
 
-def process_file(filepath, tile_id):
+def process_file(filepath, tile_id, store=None):
     """
     Traite un fichier de tuile NetMob23.
     
     Args:
         filepath: Chemin vers le fichier .txt
         tile_id: ID de la tuile
+        store: TileStore optionnel (netmob_store.py), evite le parsing texte
     
     Returns:
         list: Liste de dictionnaires (un par jour)
     """
     records = []
+
+    s = store.series_index(filepath) if store is not None else None
+    if s is not None:
+        dates, values, lengths = store.tile(s)
+        for date, row, n in zip(dates, values, lengths):
+            # Meme regle que parse_line : au moins 9 valeurs, NaN -> 0
+            if n < 9:
+                continue
+            features = extract_features(np.nan_to_num(row[:n].astype(np.float64), nan=0.0), date, tile_id)
+            if features is not None:
+                records.append(features)
+        return records
     
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -256,13 +276,14 @@ def process_file(filepath, tile_id):
 # SECTION 6 : TRAITEMENT D'UN SERVICE (Facebook ou Netflix)
 # =============================================================================
 
-def process_service(base_path, service):
+def process_service(base_path, service, store=None):
     """
     Traite tous les fichiers d'un service (Facebook ou Netflix).
     
     Args:
         base_path: Chemin racine NetMob23
         service: 'Facebook' ou 'Netflix'
+        store: TileStore optionnel (netmob_store.py)
     
     Returns:
         pd.DataFrame: DataFrame avec toutes les donnees du service
@@ -287,7 +308,7 @@ def process_service(base_path, service):
         # Extraire tile_id du nom de fichier
         tile_id = filename.replace(f'{service}_DL_Tile_', '').replace('.txt', '')
         
-        records = process_file(filepath, tile_id)
+        records = process_file(filepath, tile_id, store)
         all_records.extend(records)
         
         # Progression tous les 100 fichiers ou a la fin
@@ -584,9 +605,13 @@ def main():
     print("TRAITEMENT DES DONNEES")
     print("=" * 60)
     
+    store = netmob_store.open_store(args.input) if netmob_store else None
+    if store is not None:
+        print(f"[INFO] Lecture depuis le store : {store.store_dir}")
+
     for service in services:
         # Extraire les features
-        df = process_service(args.input, service)
+        df = process_service(args.input, service, store)
         
         if len(df) == 0:
             print(f"[ATTENTION] Aucune donnee pour {service}, passage au suivant")
@@ -25,8 +25,11 @@ np.random.seed(0)
 
 import AWSCTDReadData
 import AWSCTDCreateModel
+import AWSCTDFold
 import AWSCTDClearSesion
+import AWSCTDResults
 import gc
+import shutil
 
 import os
 m_sWorkingDir = os.getcwd()
@@ -41,16 +44,36 @@ nBatchSize = config.getint('MAIN', 'nBatchSize') # Default 100
 nPatience = config.getint('MAIN', 'nPatience') # Default 3
 nKFolds = config.getint('MAIN', 'nKFolds') # Default 5
 bCategorical = config.getboolean('MAIN', 'bCategorical') # Default false
+nEmbeddingDim = config.getint('MAIN', 'nEmbeddingDim', fallback=0) # Default 0 (one-hot input)
+bStreaming = config.getboolean('MAIN', 'bStreaming', fallback=False) # Default false
+nParallelFolds = config.getint('MAIN', 'nParallelFolds', fallback=1) # Default 1 (folds trained one after the other)
+bJitCompile = config.getboolean('MAIN', 'bJitCompile', fallback=False) # Default false (XLA compilation of train/predict steps)
+bMixedPrecision = config.getboolean('MAIN', 'bMixedPrecision', fallback=False) # Default false (float32 everywhere)
+bRenderPlots = config.getboolean('MAIN', 'bRenderPlots', fallback=True) # Default true (SVG figures drawn at the end of the run)
+nScoringChunk = config.getint('MAIN', 'nScoringChunk', fallback=16384) # Default 16384 sequences per scoring block
+
+# main.py --auto-shard : le plan de ressources prévoit que le one-hot complet ne tient pas en RAM
+if os.environ.get('SIR_AUTO_SHARD') == '1' and not bStreaming:
+	print("SIR_AUTO_SHARD : entraînement en streaming (one-hot par batch) pour borner la mémoire")
+	bStreaming = True
+
+# Chaque fold parallèle relit le dataset dans son processus : sans streaming, le one-hot complet
+# serait matérialisé nParallelFolds fois
+if nParallelFolds > 1 and nEmbeddingDim == 0 and not bStreaming:
+	print("nParallelFolds > 1 : entraînement en streaming (one-hot par batch) dans chaque processus de fold")
+	bStreaming = True
 
 fIniFile = open(m_sWorkingDir+'config.ini', "r")
 sConfig = fIniFile.read()
 print ("Config file:")
 print (sConfig)
 
+AWSCTDCreateModel.SetPrecisionPolicy(bMixedPrecision)
+
 m_nParametersCount = 0
 m_nClassCount = 0
 m_nWordCount = 0
-Xtr, Ytr, m_nParametersCount, m_nClassCount, m_nWordCount = AWSCTDReadData.ReadDataImpl(m_sDataFile, bCategorical)
+Xtr, Ytr, m_nParametersCount, m_nClassCount, m_nWordCount = AWSCTDReadData.ReadDataImpl(m_sDataFile, bCategorical, nEmbeddingDim == 0 and not bStreaming)
 print (Ytr)
 gc.collect()
 
@@ -89,6 +112,7 @@ arrAcc  = []
 arrLoss = []
 arrMae  = []
 arrTimeFit = []
+arrTestSize = []
 arrTimeTest = []
 arrTimePredict = []
 from sklearn.model_selection import KFold
@@ -102,23 +126,19 @@ nFoldNumber = 1
 
 nAllSize = 0
 
-import AWSCTDPlotAcc
 #save the model history in a list after fitting so that we can plot later
 model_history = [] 
 
 # For Confusion Matrix
-import AWSCTDPlotCM
 from sklearn.metrics import confusion_matrix
 cm = np.zeros((m_nClassCount,m_nClassCount), dtype=int)
 
-# For ROC
-import matplotlib.pyplot as plt
+# For ROC (figures are drawn afterwards from the saved arrays, see AWSCTDRender.py)
 #from keras.utils import np_utils
 from sklearn.metrics import roc_curve, auc
 from scipy import interp
 from collections import defaultdict
-
-plt.rcParams['svg.fonttype'] = 'none'
+dictRocCurves = defaultdict(list)
 
 tprs = {}
 aucs = {}
@@ -139,38 +159,46 @@ elif m_nClassCount == 2:
 
 mean_fpr = np.linspace(0, 1, 100)
 
-for train, test in kfold.split(Xtr, Ytr):
+arrSplits = list(kfold.split(Xtr, Ytr))
+model_save_path = os.path.join(m_sWorkingDir, sSavedModelName)
+arrFoldResults = None
+if nParallelFolds > 1:
+	dictJob = {'sDataFile': m_sDataFile, 'sModel': m_sModel, 'bCategorical': bCategorical, 'nEmbeddingDim': nEmbeddingDim,
+		'bStreaming': bStreaming, 'nEpochs': nEpochs, 'nBatchSize': nBatchSize, 'nPatience': nPatience, 'sMonitor': sMonitor,
+		'bJitCompile': bJitCompile, 'bMixedPrecision': bMixedPrecision, 'sSaveModel': model_save_path}
+	arrFoldResults = AWSCTDFold.RunFoldsParallel(arrSplits, dictJob, nParallelFolds, m_sWorkingDir)
+
+for train, test in arrSplits:
 	print("KFold number: " + str(nFoldNumber))
 	nFoldNumber += 1 
-	# Create model
-	model = AWSCTDCreateModel.CreateModelImpl(m_sModel, m_nWordCount, m_nClassCount, m_nParametersCount, bCategorical)
-	print("modèle summary")
-	print(model.summary())
-	startFit = time.time()
-	# Train
-	#history = model.fit([Xtr[train]],Ytr[train],epochs=nEpochs,batch_size=nBatchSize, callbacks=None, verbose=1)
-	history = model.fit([Xtr[train]],Ytr[train],epochs=nEpochs,batch_size=nBatchSize, callbacks=callbacks_list, verbose=1)
-	endFit = time.time()
+	model = None
+	if arrFoldResults is not None:
+		# Fold already trained by a worker process (see AWSCTDFold.RunFoldsParallel)
+		result = arrFoldResults[nFoldNumber - 2]
+	else:
+		# Create model
+		model = AWSCTDCreateModel.CreateModelImpl(m_sModel, m_nWordCount, m_nClassCount, m_nParametersCount, bCategorical, nEmbeddingDim, bJitCompile)
+		print("modèle summary")
+		print(model.summary())
+		result = AWSCTDFold.FitFold(model, Xtr, Ytr, train, test, nEpochs, nBatchSize, callbacks_list, m_nWordCount, nEmbeddingDim == 0, bStreaming)
+	history = result['history']
+	scores = result['scores']
+	y_pred = result['y_pred']
 	model_history.append(history)
-	tmExecFit = endFit - startFit
-	startTest = time.time()
-	scores = model.evaluate([Xtr[test]], Ytr[test])
-	endTest = time.time()
-	
-	startPredict = time.time()
-	y_pred=model.predict([Xtr[test]])
-	endPredict = time.time()
+	tmExecFit = result['tmExecFit']
 	
-	nAllSize = nAllSize + len(Xtr[test])
+	nAllSize = nAllSize + len(test)
+	arrTestSize.append(len(test))
 	
-	tmExecTest = endTest - startTest
+	tmExecTest = result['tmExecTest']
 	arrTimeFit.append(tmExecFit)
 	arrTimeTest.append(tmExecTest)
 	
-	tmExecPredict = endPredict - startPredict
+	tmExecPredict = result['tmExecPredict']
 	arrTimePredict.append(tmExecPredict)
-	print(model.metrics_names)
-	print("%s: %.2f%%" % (model.metrics_names[1], scores[1]*100))
+	print("Fold time fit: %.3f s | test: %.3f s | predict: %.3f s" % (tmExecFit, tmExecTest, tmExecPredict))
+	print(result['metrics_names'])
+	print("%s: %.2f%%" % (result['metrics_names'][1], scores[1]*100))
 	arrAcc.append(scores[1] * 100)
 	arrLoss.append(scores[0])
 	
@@ -199,7 +227,6 @@ for train, test in kfold.split(Xtr, Ytr):
 	# ROC calculations
 	if bCategorical:
 		for x in range(m_nClassCount):
-			plt.figure(x)
 			fpr, tpr, thresholds = roc_curve(Ytr[test][:, x], y_pred[:, x])
 			fnr = 1 - tpr
 			eer_ = fpr[np.nanargmin(np.absolute((fnr - fpr)))]
@@ -209,7 +236,7 @@ for train, test in kfold.split(Xtr, Ytr):
 			tprs[x][-1][0] = 0.0
 			roc_auc = auc(fpr, tpr)
 			aucs[x].append(roc_auc)
-			plt.plot(fpr, tpr, lw=1, alpha=0.5, label='ROC fold %d (AUC = %0.2f)' % (nFoldNumber, roc_auc))
+			dictRocCurves[x].append((fpr, tpr))
 
 
 	# Confusion Matrix calculations
@@ -228,11 +255,10 @@ for train, test in kfold.split(Xtr, Ytr):
 			cm += confusion_matrix(Ytr[test], y_pred)	
 
 
-		print("\n[INFO] Sauvegarde intermédiaire du modèle...")
-		model_filename = sSavedModelName
-		model_save_path = os.path.join(m_sWorkingDir, model_filename)
-		model.save(model_save_path)
-		print(f"Modèle sauvegardé : {model_save_path}")
+		if model is not None:
+			print("\n[INFO] Sauvegarde intermédiaire du modèle...")
+			model.save(model_save_path)
+			print(f"Modèle sauvegardé : {model_save_path}")
 
 
 
@@ -244,6 +270,12 @@ for train, test in kfold.split(Xtr, Ytr):
 	AWSCTDClearSesion.reset_keras()
 
 	
+# Calibration de discrétisation gardée à côté du modèle : les nouvelles données sont
+# tokenisées comme celles de l'entraînement (AWSCTD_Serve.py, conversion incrémentale)
+sCalibrationFile = os.path.splitext(m_sDataFile)[0] + '_calibration.json'
+if os.path.exists(model_save_path) and os.path.exists(sCalibrationFile):
+	shutil.copyfile(sCalibrationFile, os.path.splitext(model_save_path)[0] + '_calibration.json')
+
 end = time.time()
 
 tmExec = end - start
@@ -260,9 +292,15 @@ print("Testing time        : %.7f" % dTimeTest)
 print("Predicting time All : %.7f" % dTimePredSum)
 print("Predicting time One : %.7f" % dTimePredForOneSample)
 
+# Per-fold timings: the first fold also pays the graph tracing / XLA compilation
+sPrecision = "mixed_bfloat16" if bMixedPrecision else "float32"
+print("Precision: %s | XLA jit_compile: %s" % (sPrecision, bJitCompile))
+for nFold in range(len(arrTimeFit)):
+	print("Fold %d fit: %.3f s (%+.3f) | predict: %.3f s (%+.3f)" % (nFold + 1, arrTimeFit[nFold], arrTimeFit[nFold] - arrTimeFit[0], arrTimePredict[nFold], arrTimePredict[nFold] - arrTimePredict[0]))
+
 print(" Acc: %.2f%% (+/- %.2f)" % (np.mean(arrAcc), np.std(arrAcc)))
 
-temp_model = AWSCTDCreateModel.CreateModelImpl(m_sModel, m_nWordCount, m_nClassCount, m_nParametersCount, bCategorical)
+temp_model = AWSCTDCreateModel.CreateModelImpl(m_sModel, m_nWordCount, m_nClassCount, m_nParametersCount, bCategorical, nEmbeddingDim, bJitCompile)
 
 sModel = str(temp_model.to_json())
 dAcc = np.mean(arrAcc)
@@ -270,98 +308,39 @@ dAccStd = np.std(arrAcc)
 dLoss = np.mean(arrLoss)
 dLossStd = np.std(arrLoss)
 
-dAcc1 = arrAcc[0]
-dAcc2 = arrAcc[1]
-dAcc3 = arrAcc[2]
-dAcc4 = arrAcc[3]
-dAcc5 = arrAcc[4]
+dAcc1, dAcc2, dAcc3, dAcc4, dAcc5 = AWSCTDResults.FoldAccuracies(arrAcc)
 
-import sqlite3
-con = sqlite3.connect(sDbName)
 sTestTag = m_sModel
+if bJitCompile:
+	sTestTag += " XLA"
+if bMixedPrecision:
+	sTestTag += " bf16"
 result = (m_sDataFile, m_nParametersCount, m_nClassCount, nEpochs, nBatchSize, sModel, tmExec, dAcc, dLoss, dTimeTrain, dTimeTest, sTestTag, dAccStd, dLossStd, sTime, dTimePredForOneSample, dAcc1, dAcc2, dAcc3, dAcc4, dAcc5, sConfig)
-sql = """INSERT INTO results 
-         (File, ParamCount, ClassCount, Epochs, BatchSize, Model, Time, Acc, Loss, TimeTrain, TimeTest, Comment, AccStd, LossStd, ExecutionTime, PredictingOneTime, Acc1, Acc2, Acc3, Acc4, Acc5, Config)
-         VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-      """
-cur = con.cursor()
-cur.execute("""
-    CREATE TABLE IF NOT EXISTS results (
-        File TEXT, ParamCount INTEGER, ClassCount INTEGER, Epochs INTEGER, 
-        BatchSize INTEGER, Model TEXT, Time REAL, Acc REAL, Loss REAL, 
-        TimeTrain REAL, TimeTest REAL, Comment TEXT, AccStd REAL, LossStd REAL, 
-        ExecutionTime TEXT, PredictingOneTime REAL, Acc1 REAL, Acc2 REAL, 
-        Acc3 REAL, Acc4 REAL, Acc5 REAL, Config TEXT
-    )
-""")
-con.commit()
-
-import os
-path_accloss = os.path.join(m_sWorkingDir, 'ACCLOSS')
-path_roc = os.path.join(m_sWorkingDir, 'ROC')
-path_cm = os.path.join(m_sWorkingDir, 'CM')
-
-if not os.path.exists(path_accloss):
-    os.makedirs(path_accloss)
-    print(f"Dossier créé : {path_accloss}")
-
-if not os.path.exists(path_roc):
-    os.makedirs(path_roc)
-    print(f"Dossier créé : {path_roc}")
+nRunId = AWSCTDResults.InsertResult(sDbName, result)
+# Benchmark ledger: dataset fingerprint, host, library versions, per-fold timings (see AWSCTDBench.py)
+import AWSCTDBench
+AWSCTDBench.RecordRun(sDbName, nRunId, m_sDataFile, sConfig, arrTimeFit, arrTimePredict, arrTestSize)
 
-if not os.path.exists(path_cm):
-    os.makedirs(path_cm)
-    print(f"Dossier créé : {path_cm}")
-	
-AWSCTDPlotAcc.plot_acc_loss(model_history, m_sModel, m_sDataFile, bCategorical, m_sWorkingDir)
-AWSCTDPlotCM.plot_cm(cm, m_sModel, m_nClassCount, m_sDataFile, m_sWorkingDir)
+# Raw curves / confusion matrix / ROC arrays, figures rendered on demand
+import AWSCTDRender
+sArtifactFile = AWSCTDRender.SaveArtifact(m_sWorkingDir, m_sModel, m_sDataFile, bCategorical, m_nClassCount, model_history, cm, dictRocCurves, tprs, aucs, mean_fpr)
+print("Courbes et matrices sauvegardées : " + sArtifactFile)
 
-# # Generate ROC figures
 if bCategorical:
 	sERR = ""
-	arrClassNames = ("Benign", "Malware")
-	import ntpath
+	arrClassNames = AWSCTDRender.arrClassNames
 	for x in range(m_nClassCount):
-		plt.figure(x)
-		#plt.plot([0, 1], [0, 1], linestyle='--', lw=1, color='r', label='Chance', alpha=.3)
-		plt.plot([0, 1], [0, 1], linestyle='--', lw=1, color='r', alpha=.3)
-		
-		mean_tpr = np.mean(tprs[x], axis=0)
-		mean_tpr[-1] = 1.0
-		mean_auc = auc(mean_fpr, mean_tpr)
-		std_auc = np.std(aucs[x])
-		plt.plot(mean_fpr, mean_tpr, color='b', label=r'Mean ROC (AUC = %0.2f $\pm$ %0.2f)' % (mean_auc, std_auc), lw=2, alpha=.8)
-		
-		std_tpr = np.std(tprs[x], axis=0)
-		tprs_upper = np.minimum(mean_tpr + std_tpr, 1)
-		tprs_lower = np.maximum(mean_tpr - std_tpr, 0)
-		plt.fill_between(mean_fpr, tprs_lower, tprs_upper, color='grey', alpha=.2,
-						 label=r'$\pm$ 1 std. dev.')
-		
-		plt.xlim([-0.05, 1.05])
-		plt.ylim([-0.05, 1.05])
-		plt.xlabel('False Positive Rate')
-		plt.ylabel('True Positive Rate')
-		sTitle = 'ROC of ' + arrClassNames[x]
-		plt.title(sTitle)
-		plt.grid(True)
-		plt.legend(loc="lower right")
-		
-		fileROC=m_sWorkingDir+'ROC/ROC_'+m_sModel+'_'
-		fileROC+=ntpath.basename(m_sDataFile)+'_'
-		fileROC+=arrClassNames[x]
-		fileROC+='.svg'
-		
-		plt.savefig(fileROC, dpi=300, format='svg')
-		
 		mean_eer = np.mean(EER[x], axis=0)
 		sERR += "[" + arrClassNames[x] + " " + str(mean_eer) + "]"
-		
 	print(sERR)
-	
-
-
 
+if bRenderPlots:
+	# Separate interpreter: the spawned render workers re-import __main__, which must not be this
+	# (unguarded) training script
+	import subprocess
+	subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'AWSCTDRender.py'), sArtifactFile], check=True)
+else:
+	print("Figures non générées (bRenderPlots = false) : python3 AWSCTDRender.py " + sArtifactFile)
 
 
 try:
@@ -374,6 +353,7 @@ try:
 	AWSCTD_Detect.META_FILE = os.path.join(base_data_path, 'netmob_metadata.csv')
 	AWSCTD_Detect.REPORT_FILE = os.path.join(m_sWorkingDir, sAnomalyReportName)
 	AWSCTD_Detect.ALERTRCA_FILE = os.path.join(m_sWorkingDir, sAnomalyReportcsv)
+	AWSCTD_Detect.CHUNK_ROWS = nScoringChunk
 
 	AWSCTD_Detect.generate_report()
 		
@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+import platform
+import subprocess
+from time import gmtime, strftime
+
+import numpy as np
+
+# Benchmark ledger on top of the results table of results.db.
+# Every AWSCTD.py / AWSCTDSweep.py run adds a row to the bench table, linked to its
+# results row (RunId = results rowid), with what is needed to compare runs fairly:
+# dataset fingerprint, config hash, git commit, host CPU, library versions and the
+# per-fold fit / predict timings (the samples used by the significance test).
+#
+# Usage:
+#   python AWSCTDBench.py list [--db results.db]
+#   python AWSCTDBench.py compare BASELINE CANDIDATE [--alpha 0.05] [--threshold 0.05]
+# BASELINE / CANDIDATE select runs by field: run:<RunId>, comment:<model tag>,
+# commit:<git commit prefix> or config:<config hash prefix>; all the matching runs
+# are pooled. Without prefix, the first of these fields with a match is used.
+# compare exits with code 1 when a significant slowdown is found (regression gate).
+
+arrLibraries = ('numpy', 'tensorflow', 'keras', 'scikit-learn')
+
+def CreateTable(con):
+	con.execute("""
+	    CREATE TABLE IF NOT EXISTS bench (
+	        RunId INTEGER, DatasetHash TEXT, ConfigHash TEXT, GitCommit TEXT,
+	        Host TEXT, Cpu TEXT, CpuCount INTEGER, Python TEXT, Libraries TEXT,
+	        FoldTimeFit TEXT, FoldTimePredict TEXT, FoldTestSize TEXT, RecordTime TEXT
+	    )
+	""")
+	con.commit()
+
+def FileHash(sFile, nChunk=1 << 22):
+	h = hashlib.sha1()
+	with open(sFile, 'rb') as f:
+		for chunk in iter(lambda: f.read(nChunk), b''):
+			h.update(chunk)
+	return h.hexdigest()
+
+# Token matrix (+ its labels file for .npy) identifies the dataset
+def DatasetFingerprint(sDataFile):
+	h = hashlib.sha1(FileHash(sDataFile).encode())
+	sLabels = os.path.splitext(sDataFile)[0] + '_labels.npy'
+	if sDataFile.endswith('.npy') and os.path.exists(sLabels):
+		h.update(FileHash(sLabels).encode())
+	return h.hexdigest()
+
+def CpuModel():
+	try:
+		with open('/proc/cpuinfo') as f:
+			for sLine in f:
+				if sLine.startswith('model name'):
+					return sLine.split(':', 1)[1].strip()
+	except OSError:
+		pass
+	return platform.processor() or platform.machine()
+
+def LibraryVersions():
+	from importlib import metadata
+	dictVersions = {}
+	for sLib in arrLibraries:
+		try:
+			dictVersions[sLib] = metadata.version(sLib)
+		except metadata.PackageNotFoundError:
+			dictVersions[sLib] = None
+	return dictVersions
+
+def GitCommit():
+	# Dans le conteneur, /app n'a pas de .git : commit transmis par main.py
+	if os.environ.get('SIR_GIT_COMMIT'):
+		return os.environ['SIR_GIT_COMMIT']
+	try:
+		return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+			stderr=subprocess.DEVNULL).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return ''
+
+def HostName():
+	# Dans le conteneur, platform.node() est l'id aléatoire du conteneur
+	return os.environ.get('SIR_HOST') or platform.node()
+
+def RecordRun(sDbName, nRunId, sDataFile, sConfig, arrTimeFit, arrTimePredict, arrTestSize):
+	row = (nRunId, DatasetFingerprint(sDataFile), hashlib.sha1(sConfig.encode()).hexdigest(), GitCommit(),
+		HostName(), CpuModel(), os.cpu_count(), platform.python_version(), json.dumps(LibraryVersions()),
+		json.dumps([float(t) for t in arrTimeFit]), json.dumps([float(t) for t in arrTimePredict]),
+		json.dumps([int(n) for n in arrTestSize]), strftime("%Y-%m-%d %H:%M:%S", gmtime()))
+	con = sqlite3.connect(sDbName)
+	try:
+		CreateTable(con)
+		con.execute("INSERT INTO bench VALUES(" + ",".join("?" * len(row)) + ")", row)
+		con.commit()
+	finally:
+		con.close()
+
+def LoadRuns(sDbName):
+	con = sqlite3.connect(sDbName)
+	con.row_factory = sqlite3.Row
+	try:
+		CreateTable(con)
+		arrRows = con.execute("""
+		    SELECT b.*, r.Comment, r.Epochs, r.BatchSize, r.Acc, r.Time, r.TimeTrain, r.PredictingOneTime
+		    FROM bench b JOIN results r ON r.rowid = b.RunId ORDER BY b.RunId
+		""").fetchall()
+	finally:
+		con.close()
+	return [dict(row) for row in arrRows]
+
+# Selector fields, tried in this order when the selector has no "field:" prefix
+dictSelectors = {
+	'run': lambda run, s: str(run['RunId']) == s,
+	'comment': lambda run, s: run['Comment'] == s,
+	'commit': lambda run, s: bool(run['GitCommit']) and run['GitCommit'].startswith(s),
+	'config': lambda run, s: run['ConfigHash'].startswith(s),
+}
+
+# "run:3", "comment:AWSCTD-CNN-S", "commit:abc123" or "config:9f2e": only that field is matched.
+# Without prefix, the first field with matches wins: a RunId never pools runs whose
+# commit or config hash happens to start with the same digits.
+def SelectRuns(arrRuns, sSelector):
+	sField, _, sValue = sSelector.partition(':')
+	if sValue and sField in dictSelectors:
+		return [run for run in arrRuns if dictSelectors[sField](run, sValue)]
+	for fnMatch in dictSelectors.values():
+		arrSelected = [run for run in arrRuns if fnMatch(run, sSelector)]
+		if arrSelected:
+			return arrSelected
+	return []
+
+# Per-fold samples of each metric: fit seconds, predict latency per sequence, predict throughput
+def FoldSamples(arrRuns):
+	dictSamples = {'fit_s': [], 'predict_ms_per_seq': [], 'predict_seq_per_s': []}
+	for run in arrRuns:
+		for dFit, dPredict, nTest in zip(json.loads(run['FoldTimeFit']), json.loads(run['FoldTimePredict']), json.loads(run['FoldTestSize'])):
+			dictSamples['fit_s'].append(dFit)
+			dictSamples['predict_ms_per_seq'].append(1000.0 * dPredict / max(nTest, 1))
+			dictSamples['predict_seq_per_s'].append(nTest / dPredict if dPredict > 0 else np.nan)
+	return dictSamples
+
+# Welch t-test, one-sided: is the candidate worse than the baseline?
+def SlowdownPValue(arrBase, arrCand, bHigherIsBetter):
+	from scipy import stats
+	if len(arrBase) < 2 or len(arrCand) < 2:
+		return np.nan
+	sAlternative = 'less' if bHigherIsBetter else 'greater'
+	return float(stats.ttest_ind(arrCand, arrBase, equal_var=False, alternative=sAlternative).pvalue)
+
+def WarnMismatch(arrBase, arrCand):
+	for sKey, sLabel in (('DatasetHash', 'jeu de données'), ('Cpu', 'CPU'), ('Libraries', 'versions des librairies')):
+		setBase = set(run[sKey] for run in arrBase)
+		setCand = set(run[sKey] for run in arrCand)
+		if setBase != setCand or len(setBase) > 1:
+			print("ATTENTION : %s différent(s) entre les runs comparés" % sLabel)
+
+def Compare(arrBase, arrCand, dAlpha, dThreshold):
+	WarnMismatch(arrBase, arrCand)
+	dictBase = FoldSamples(arrBase)
+	dictCand = FoldSamples(arrCand)
+	bRegression = False
+	print("%-20s %12s %12s %9s %9s  %s" % ("Métrique", "Baseline", "Candidat", "Écart", "p-value", ""))
+	for sMetric, bHigherIsBetter in (('fit_s', False), ('predict_ms_per_seq', False), ('predict_seq_per_s', True)):
+		arrB = np.asarray(dictBase[sMetric], dtype=float)
+		arrC = np.asarray(dictCand[sMetric], dtype=float)
+		arrB = arrB[~np.isnan(arrB)]
+		arrC = arrC[~np.isnan(arrC)]
+		if len(arrB) == 0 or len(arrC) == 0:
+			continue
+		dBase = np.mean(arrB)
+		dCand = np.mean(arrC)
+		dDelta = (dCand - dBase) / dBase if dBase else np.nan
+		dWorse = -dDelta if bHigherIsBetter else dDelta
+		dP = SlowdownPValue(arrB, arrC, bHigherIsBetter)
+		bSlower = dWorse > dThreshold and dP < dAlpha
+		bRegression = bRegression or bSlower
+		print("%-20s %12.4f %12.4f %+8.1f%% %9.4f  %s" % (sMetric, dBase, dCand, 100 * dDelta, dP, "RÉGRESSION" if bSlower else ""))
+	return bRegression
+
+def PrintRuns(arrRuns):
+	print("%6s %-24s %-9s %-10s %8s %10s %10s  %s" % ("RunId", "Comment", "Commit", "Config", "Acc", "TimeTrain", "Pred/seq", "CPU"))
+	for run in arrRuns:
+		print("%6d %-24s %-9s %-10s %8.2f %10.3f %10.6f  %s" % (run['RunId'], run['Comment'], run['GitCommit'] or '-', run['ConfigHash'][:10],
+			run['Acc'], run['TimeTrain'], run['PredictingOneTime'], run['Cpu']))
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="Ledger de benchmark AWSCTD (results.db)")
+	parser.add_argument('--db', default='results.db')
+	sub = parser.add_subparsers(dest='command', required=True)
+	sub.add_parser('list')
+	cmp = sub.add_parser('compare')
+	cmp.add_argument('baseline')
+	cmp.add_argument('candidate')
+	cmp.add_argument('--alpha', type=float, default=0.05, help="Seuil de significativité (Welch t-test unilatéral)")
+	cmp.add_argument('--threshold', type=float, default=0.05, help="Dégradation relative minimale signalée (0.05 = 5%%)")
+	args = parser.parse_args()
+
+	arrRuns = LoadRuns(args.db)
+	if args.command == 'list':
+		PrintRuns(arrRuns)
+		sys.exit(0)
+
+	arrBase = SelectRuns(arrRuns, args.baseline)
+	arrCand = SelectRuns(arrRuns, args.candidate)
+	if not arrBase or not arrCand:
+		print("ERREUR : Aucun run pour %s" % (args.baseline if not arrBase else args.candidate))
+		sys.exit(2)
+	print("Baseline : %d run(s), candidat : %d run(s)" % (len(arrBase), len(arrCand)))
+	sys.exit(1 if Compare(arrBase, arrCand, args.alpha, args.threshold) else 0)
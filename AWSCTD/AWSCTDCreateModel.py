@@ -27,14 +27,30 @@ from keras.models import Model
 from keras.layers import ReLU
 from keras.layers import concatenate
 	
+def CreateInputs(nWordCount, nParametersCount, nEmbeddingDim):
+	# nEmbeddingDim == 0 : one-hot input (nParametersCount, nWordCount)
+	# nEmbeddingDim  > 0 : integer tokens (nParametersCount,) fed to an Embedding layer
+	if nEmbeddingDim > 0:
+		inputs = Input(shape=(nParametersCount,), dtype='int32')
+		embedded = Embedding(input_dim=nWordCount, output_dim=nEmbeddingDim)(inputs)
+		return inputs, embedded
+	inputs = Input(shape=(nParametersCount, nWordCount))
+	return inputs, inputs
+
+def SetPrecisionPolicy(bMixedPrecision):
+	# bfloat16 compute / float32 variables for every layer created afterwards
+	from keras import mixed_precision
+	mixed_precision.set_global_policy('mixed_bfloat16' if bMixedPrecision else 'float32')
+
 def AddLastDenseLayer(merged, bCategorical, nClassCount):
-	outputs = Dense(nClassCount if bCategorical else 1, activation='softmax' if bCategorical else 'sigmoid')(merged)
+	# Output kept in float32 so that softmax/sigmoid and the loss stay stable under mixed precision
+	outputs = Dense(nClassCount if bCategorical else 1, activation='softmax' if bCategorical else 'sigmoid', dtype='float32')(merged)
 	return outputs
 	
-def CreateNewGRU(nWordCount, nClassCount, nParametersCount, bCategorical):
+def CreateNewGRU(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim=0):
 	print ("GRU-FCN")
-	inputs = Input(shape=(nParametersCount, nWordCount))
-	conv1 = Conv1D(filters=128, kernel_size=8, padding='same',activation='tanh', kernel_initializer='he_uniform')(inputs)
+	inputs, x = CreateInputs(nWordCount, nParametersCount, nEmbeddingDim)
+	conv1 = Conv1D(filters=128, kernel_size=8, padding='same',activation='tanh', kernel_initializer='he_uniform')(x)
 	BN1 = BatchNormalization(epsilon=0.01)(conv1)
 	relu1 = ReLU()(BN1)
 	conv2 = Conv1D(filters=256, kernel_size=5, padding='same',activation='tanh', kernel_initializer='he_uniform')(relu1)
@@ -44,7 +60,7 @@ def CreateNewGRU(nWordCount, nClassCount, nParametersCount, bCategorical):
 	BN3 = BatchNormalization(epsilon=0.01)(conv3)
 	relu3 = ReLU()(BN3)
 	pool1 = GlobalAveragePooling1D()(relu3)
-	gru2 = GRU(units=8)(inputs)
+	gru2 = GRU(units=8)(x)
 	dropout = Dropout(0.8)(gru2)
 	merged = concatenate([pool1, dropout])
 	outputs = AddLastDenseLayer(merged, bCategorical, nClassCount)
@@ -52,10 +68,10 @@ def CreateNewGRU(nWordCount, nClassCount, nParametersCount, bCategorical):
 	
 	return model
 	
-def CreateNew(nWordCount, nClassCount, nParametersCount, bCategorical):
+def CreateNew(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim=0):
 	print ("FCN")
-	inputs = Input(shape=(nParametersCount, nWordCount))
-	conv1 = Conv1D(filters=128, kernel_size=8, padding='same',activation='tanh')(inputs)
+	inputs, x = CreateInputs(nWordCount, nParametersCount, nEmbeddingDim)
+	conv1 = Conv1D(filters=128, kernel_size=8, padding='same',activation='tanh')(x)
 	BN1 = BatchNormalization(epsilon=0.01)(conv1)
 	relu1 = ReLU()(BN1)
 	conv2 = Conv1D(filters=256, kernel_size=5, padding='same',activation='tanh')(relu1)
@@ -70,10 +86,10 @@ def CreateNew(nWordCount, nClassCount, nParametersCount, bCategorical):
 	
 	return model
 	
-def CreateNewLSTM(nWordCount, nClassCount, nParametersCount, bCategorical):
+def CreateNewLSTM(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim=0):
 	print ("LSTM-FCN")
-	inputs = Input(shape=(nParametersCount, nWordCount))
-	conv1 = Conv1D(filters=128, kernel_size=8, padding='same',activation='tanh')(inputs)
+	inputs, x = CreateInputs(nWordCount, nParametersCount, nEmbeddingDim)
+	conv1 = Conv1D(filters=128, kernel_size=8, padding='same',activation='tanh')(x)
 	BN1 = BatchNormalization(epsilon=0.01)(conv1)
 	relu1 = ReLU()(BN1)
 	conv2 = Conv1D(filters=256, kernel_size=5, padding='same',activation='tanh')(relu1)
@@ -83,7 +99,7 @@ def CreateNewLSTM(nWordCount, nClassCount, nParametersCount, bCategorical):
 	BN3 = BatchNormalization(epsilon=0.01)(conv3)
 	relu3 = ReLU()(BN3)
 	pool1 = GlobalAveragePooling1D()(relu3)
-	lstm3 = LSTM(units=nParametersCount)(inputs)
+	lstm3 = LSTM(units=nParametersCount)(x)
 	dropout = Dropout(0.8)(lstm3)
 	merged = concatenate([pool1, dropout])
 	outputs = AddLastDenseLayer(merged, bCategorical, nClassCount)
@@ -91,13 +107,13 @@ def CreateNewLSTM(nWordCount, nClassCount, nParametersCount, bCategorical):
 	
 	return model
 	
-def CreateOLDGRU(nWordCount, nClassCount, nParametersCount, bCategorical):
+def CreateOLDGRU(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim=0):
 	print ("AWSCTD-CNN-GRU")
 	nSlidingWindow = 6
-	inputs = Input(shape=(nParametersCount, nWordCount))
-	conv1OLD = Conv1D(filters=nParametersCount, kernel_size=nSlidingWindow, padding='same',activation='tanh')(inputs)
+	inputs, x = CreateInputs(nWordCount, nParametersCount, nEmbeddingDim)
+	conv1OLD = Conv1D(filters=nParametersCount, kernel_size=nSlidingWindow, padding='same',activation='tanh')(x)
 	poolOLD  = GlobalMaxPooling1D()(conv1OLD)
-	gru2 = GRU(units=8)(inputs)
+	gru2 = GRU(units=8)(x)
 	dropout = Dropout(0.8)(gru2)
 	merged = concatenate([poolOLD, dropout])
 	outputs = AddLastDenseLayer(merged, bCategorical, nClassCount)
@@ -105,13 +121,13 @@ def CreateOLDGRU(nWordCount, nClassCount, nParametersCount, bCategorical):
 	
 	return model
 	
-def CreateOLDLSTM(nWordCount, nClassCount, nParametersCount, bCategorical):
+def CreateOLDLSTM(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim=0):
 	print ("AWSCTD-CNN-LSTM")
 	nSlidingWindow = 6
-	inputs = Input(shape=(nParametersCount, nWordCount))
-	conv1OLD = Conv1D(filters=nParametersCount, kernel_size=nSlidingWindow, padding='same',activation='tanh')(inputs)
+	inputs, x = CreateInputs(nWordCount, nParametersCount, nEmbeddingDim)
+	conv1OLD = Conv1D(filters=nParametersCount, kernel_size=nSlidingWindow, padding='same',activation='tanh')(x)
 	poolOLD  = GlobalMaxPooling1D()(conv1OLD)
-	lstm3 = LSTM(units=nParametersCount)(inputs)
+	lstm3 = LSTM(units=nParametersCount)(x)
 	dropout = Dropout(0.8)(lstm3)
 	merged = concatenate([poolOLD, dropout])
 	outputs = AddLastDenseLayer(merged, bCategorical, nClassCount)
@@ -120,51 +136,53 @@ def CreateOLDLSTM(nWordCount, nClassCount, nParametersCount, bCategorical):
 	
 	return model
 	
-def CreateCNN(nWordCount, nClassCount, nParametersCount, bCategorical):
+def CreateCNN(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim=0):
 	print ("AWSCTD-CNN-D")
 	nSlidingWindow = 6
-	inputs = Input(shape=(nParametersCount, nWordCount))
-	CNN = Conv1D(filters=nParametersCount, kernel_size=nSlidingWindow, padding='same',activation='tanh')(inputs)
+	inputs, x = CreateInputs(nWordCount, nParametersCount, nEmbeddingDim)
+	CNN = Conv1D(filters=nParametersCount, kernel_size=nSlidingWindow, padding='same',activation='tanh')(x)
 	poolOLD  = GlobalMaxPooling1D()(CNN)
 	outputs = AddLastDenseLayer(poolOLD, bCategorical, nClassCount)
 	model = Model(inputs=[inputs], outputs=outputs)
 	
 	return model
 	
-def CreateCNNS(nWordCount, nClassCount, nParametersCount, bCategorical):
+def CreateCNNS(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim=0):
 	print ("AWSCTD-CNN-S")
 	nSlidingWindow = 6
-	inputs = Input(shape=(nParametersCount, nWordCount))
-	CNN = Conv1D(filters=256, kernel_size=nSlidingWindow, padding='same',activation='tanh')(inputs)
+	inputs, x = CreateInputs(nWordCount, nParametersCount, nEmbeddingDim)
+	CNN = Conv1D(filters=256, kernel_size=nSlidingWindow, padding='same',activation='tanh')(x)
 	poolOLD  = GlobalMaxPooling1D()(CNN)
 	outputs = AddLastDenseLayer(poolOLD, bCategorical, nClassCount)
 	model = Model(inputs=[inputs], outputs=outputs)
 	
 	return model
 	
-def CreateModelImpl(sModel, nWordCount, nClassCount, nParametersCount, bCategorical):
+def CreateModelImpl(sModel, nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim=0, bJitCompile=False):
 	print ("nWordCount: ", nWordCount)
 	print ("nClassCount: ", nClassCount)
 	print ("nParametersCount: ", nParametersCount)
+	print ("nEmbeddingDim: ", nEmbeddingDim)
+	print ("bJitCompile: ", bJitCompile)
 	model = Sequential()
 	if sModel == "AWSCTD-CNN-LSTM":
-		model = CreateOLDLSTM(nWordCount, nClassCount, nParametersCount, bCategorical)
+		model = CreateOLDLSTM(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim)
 	elif sModel == "AWSCTD-CNN-GRU":
-		model = CreateOLDGRU(nWordCount, nClassCount, nParametersCount, bCategorical)
+		model = CreateOLDGRU(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim)
 	elif sModel == "FCN":
-		model = CreateNew(nWordCount, nClassCount, nParametersCount, bCategorical)
+		model = CreateNew(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim)
 	elif sModel == "GRU-FCN":
-		model = CreateNewGRU(nWordCount, nClassCount, nParametersCount, bCategorical)
+		model = CreateNewGRU(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim)
 	elif sModel == "LSTM-FCN":
-		model = CreateNewLSTM(nWordCount, nClassCount, nParametersCount, bCategorical)
-	elif sModel == "CNN":
-		model = CreateCNN(nWordCount, nClassCount, nParametersCount, bCategorical)
+		model = CreateNewLSTM(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim)
+	elif sModel == "CNN" or sModel == "AWSCTD-CNN-D":
+		model = CreateCNN(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim)
 	elif sModel == "AWSCTD-CNN-S":
-		model = CreateCNNS(nWordCount, nClassCount, nParametersCount, bCategorical)
+		model = CreateCNNS(nWordCount, nClassCount, nParametersCount, bCategorical, nEmbeddingDim)
 
 	if bCategorical:
-		model.compile(loss='categorical_crossentropy', optimizer="Adam", metrics=['categorical_accuracy'])
+		model.compile(loss='categorical_crossentropy', optimizer="Adam", metrics=['categorical_accuracy'], jit_compile=bJitCompile)
 	else:
-		model.compile(loss='binary_crossentropy', optimizer="Adam", metrics=['accuracy']) 
+		model.compile(loss='binary_crossentropy', optimizer="Adam", metrics=['accuracy'], jit_compile=bJitCompile) 
 		
 	return model
\ No newline at end of file
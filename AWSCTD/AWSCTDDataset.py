@@ -0,0 +1,37 @@
+import numpy as np
+import tensorflow as tf
+
+
+# Streaming input pipeline over the token matrix (memmap .npy or in-memory array).
+# Folds are selected through index arrays: nothing is copied beyond the current batch.
+def MakeDataset(Xtr, Ytr, arrIndices, nBatchSize, nWordCount, bOneHot, bShuffle):
+	xType = tf.as_dtype(Xtr.dtype)
+	yType = tf.as_dtype(Ytr.dtype)
+	nParametersCount = Xtr.shape[1]
+	yShape = (None,) + tuple(Ytr.shape[1:])
+
+	def GatherBatch(idx):
+		if bShuffle:
+			# Sorted reads are sequential on the memmap; order inside a shuffled batch does not matter
+			idx = np.sort(idx)
+		return np.asarray(Xtr[idx]), np.asarray(Ytr[idx])
+
+	def Gather(idx):
+		x, y = tf.numpy_function(GatherBatch, [idx], [xType, yType])
+		x.set_shape((None, nParametersCount))
+		y.set_shape(yShape)
+		return x, y
+
+	def OneHot(x, y):
+		return tf.one_hot(tf.cast(x, tf.int32), nWordCount), y
+
+	def Tokens(x, y):
+		return tf.cast(x, tf.int32), y
+
+	dataset = tf.data.Dataset.from_tensor_slices(np.asarray(arrIndices, dtype=np.int64))
+	if bShuffle:
+		dataset = dataset.shuffle(len(arrIndices), reshuffle_each_iteration=True)
+	dataset = dataset.batch(nBatchSize)
+	dataset = dataset.map(Gather, num_parallel_calls=tf.data.AUTOTUNE)
+	dataset = dataset.map(OneHot if bOneHot else Tokens, num_parallel_calls=tf.data.AUTOTUNE)
+	return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,148 @@
+import os
+import sys
+import time
+import pickle
+import subprocess
+from types import SimpleNamespace
+
+import numpy as np
+
+
+# Fit / evaluate / predict one K-fold split. Shared by the serial loop of AWSCTD.py
+# and by the fold worker processes below.
+def FitFold(model, Xtr, Ytr, train, test, nEpochs, nBatchSize, callbacks_list, nWordCount, bOneHot, bStreaming):
+	if bStreaming:
+		import AWSCTDDataset
+		# tf.data over the token matrix: fold rows are gathered batch by batch, one-hot done on the fly
+		dsTrain = AWSCTDDataset.MakeDataset(Xtr, Ytr, train, nBatchSize, nWordCount, bOneHot, True)
+		dsTest = AWSCTDDataset.MakeDataset(Xtr, Ytr, test, nBatchSize, nWordCount, bOneHot, False)
+	startFit = time.time()
+	# Train
+	if bStreaming:
+		history = model.fit(dsTrain,epochs=nEpochs, callbacks=callbacks_list, verbose=1)
+	else:
+		history = model.fit([Xtr[train]],Ytr[train],epochs=nEpochs,batch_size=nBatchSize, callbacks=callbacks_list, verbose=1)
+	endFit = time.time()
+	startTest = time.time()
+	if bStreaming:
+		scores = model.evaluate(dsTest)
+	else:
+		scores = model.evaluate([Xtr[test]], Ytr[test])
+	endTest = time.time()
+
+	startPredict = time.time()
+	if bStreaming:
+		y_pred=model.predict(dsTest)
+	else:
+		y_pred=model.predict([Xtr[test]])
+	endPredict = time.time()
+
+	return {
+		'history': SimpleNamespace(history=history.history),
+		'scores': scores,
+		'y_pred': y_pred,
+		'metrics_names': model.metrics_names,
+		'tmExecFit': endFit - startFit,
+		'tmExecTest': endTest - startTest,
+		'tmExecPredict': endPredict - startPredict,
+	}
+
+# Worker process entry point: python AWSCTDFold.py job.pkl
+def RunWorker(sJobFile):
+	with open(sJobFile, 'rb') as f:
+		job = pickle.load(f)
+
+	# Pin the worker to its CPU subset before TensorFlow creates its thread pools
+	arrCores = job['arrCores']
+	if hasattr(os, 'sched_setaffinity'):
+		os.sched_setaffinity(0, arrCores)
+	os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+	import tensorflow as tf
+	tf.config.threading.set_intra_op_parallelism_threads(len(arrCores))
+	tf.config.threading.set_inter_op_parallelism_threads(min(2, len(arrCores)))
+	np.random.seed(0)
+
+	import AWSCTDReadData
+	import AWSCTDCreateModel
+	from keras.callbacks import EarlyStopping
+
+	bOneHot = job['nEmbeddingDim'] == 0
+	Xtr, Ytr, nParametersCount, nClassCount, nWordCount = AWSCTDReadData.ReadDataImpl(job['sDataFile'], job['bCategorical'], bOneHot and not job['bStreaming'])
+	AWSCTDCreateModel.SetPrecisionPolicy(job['bMixedPrecision'])
+	model = AWSCTDCreateModel.CreateModelImpl(job['sModel'], nWordCount, nClassCount, nParametersCount, job['bCategorical'], job['nEmbeddingDim'], job['bJitCompile'])
+	callbacks_list = [EarlyStopping(monitor=job['sMonitor'], patience=job['nPatience'], mode='auto',verbose=1)]
+
+	result = FitFold(model, Xtr, Ytr, job['train'], job['test'], job['nEpochs'], job['nBatchSize'], callbacks_list, nWordCount, bOneHot, job['bStreaming'])
+
+	if job['sSaveModel'] and nClassCount == 2:
+		model.save(job['sSaveModel'])
+		print(f"Modèle sauvegardé : {job['sSaveModel']}")
+
+	with open(job['sResultFile'], 'wb') as f:
+		pickle.dump(result, f)
+
+# CPU ids this process may run on (taskset, docker --cpuset-cpus), not all the host cores
+def AllowedCores():
+	if hasattr(os, 'sched_getaffinity'):
+		return sorted(os.sched_getaffinity(0))
+	return list(range(os.cpu_count() or 1))
+
+# Run the K-fold splits in nParallel worker processes, each on its own slice of the allowed CPU cores.
+# dictJob holds the settings shared by every fold; the results come back in fold order.
+def RunFoldsParallel(arrSplits, dictJob, nParallel, sWorkingDir):
+	sFoldDir = os.path.join(sWorkingDir, 'FOLDS')
+	os.makedirs(sFoldDir, exist_ok=True)
+	arrAllowed = AllowedCores()
+	nCores = len(arrAllowed)
+	nParallel = max(1, min(nParallel, len(arrSplits), nCores))
+	nCoresPerFold = nCores // nParallel
+	sScript = os.path.abspath(__file__)
+
+	arrPending = list(range(len(arrSplits)))
+	dictRunning = {}
+	arrFreeSlots = list(range(nParallel))
+	print(f"Parallel K-fold : {len(arrSplits)} folds, {nParallel} workers, {nCoresPerFold} cores/worker")
+
+	while arrPending or dictRunning:
+		while arrPending and arrFreeSlots:
+			nFold = arrPending.pop(0)
+			nSlot = arrFreeSlots.pop(0)
+			train, test = arrSplits[nFold]
+			job = dict(dictJob)
+			job['train'] = train
+			job['test'] = test
+			job['arrCores'] = arrAllowed[nSlot * nCoresPerFold:(nSlot + 1) * nCoresPerFold]
+			job['sResultFile'] = os.path.join(sFoldDir, 'fold_%d.pkl' % (nFold + 1))
+			# Same behaviour as the serial loop: the model of the last fold is the one kept
+			job['sSaveModel'] = dictJob['sSaveModel'] if nFold == len(arrSplits) - 1 else ''
+			sJobFile = os.path.join(sFoldDir, 'job_%d.pkl' % (nFold + 1))
+			with open(sJobFile, 'wb') as f:
+				pickle.dump(job, f)
+			sLogFile = os.path.join(sFoldDir, 'fold_%d.log' % (nFold + 1))
+			fLog = open(sLogFile, 'w')
+			proc = subprocess.Popen([sys.executable, sScript, sJobFile], cwd=os.getcwd(), stdout=fLog, stderr=subprocess.STDOUT)
+			dictRunning[nFold] = (proc, nSlot, fLog, sLogFile)
+			print("KFold number: %d lancé (cores %s, log %s)" % (nFold + 1, job['arrCores'], sLogFile))
+
+		time.sleep(1)
+		for nFold, (proc, nSlot, fLog, sLogFile) in list(dictRunning.items()):
+			if proc.poll() is None:
+				continue
+			fLog.close()
+			del dictRunning[nFold]
+			arrFreeSlots.append(nSlot)
+			if proc.returncode != 0:
+				for other in dictRunning.values():
+					other[0].kill()
+				raise RuntimeError("KFold %d en échec (code %d), voir %s" % (nFold + 1, proc.returncode, sLogFile))
+			print("KFold number: %d terminé" % (nFold + 1))
+
+	arrResults = []
+	for nFold in range(len(arrSplits)):
+		with open(os.path.join(sFoldDir, 'fold_%d.pkl' % (nFold + 1)), 'rb') as f:
+			arrResults.append(pickle.load(f))
+	return arrResults
+
+if __name__ == "__main__":
+	sys.path.insert(1, 'Utils')
+	RunWorker(sys.argv[1])
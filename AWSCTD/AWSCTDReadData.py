@@ -2,9 +2,19 @@
 from keras.utils import to_categorical
 import numpy as np
 import gc
+import os
 
 
-def ReadDataImpl(sDataFile, bCategorical):
+def LabelsFile(sDataFile):
+	# Labels of a binary token matrix are stored next to it (see convert_netmob_awsctd.py)
+	return os.path.splitext(sDataFile)[0] + '_labels.npy'
+
+def ReadTokens(sDataFile):
+	# Binary .npy token matrix: memory-mapped, no parsing nor copy
+	if sDataFile.endswith('.npy'):
+		xtr = np.load(sDataFile, mmap_mode='r')
+		ytr = np.load(LabelsFile(sDataFile), mmap_mode='r')
+		return xtr, ytr
 	#Used when all data is in numbers
 	#dbTrain = np.loadtxt(sDataFile, delimiter=",", dtype=np.int16)
 	dbTrain = np.genfromtxt(sDataFile, delimiter=",", dtype=np.bytes_)
@@ -18,8 +28,18 @@ def ReadDataImpl(sDataFile, bCategorical):
 	# split into input (X) and output (Y) variables
 	xtr = dbTrain[:,0:nParametersCount]
 	#xtr = dbTrain[:,600:nParametersCount] <-jei darom nuo kazkur
-	Xtr = xtr.astype(dtype=np.int16)
+	xtr = xtr.astype(dtype=np.int16)
 	ytr = dbTrain[:,nParametersCount]
+	del dbTrain
+	return xtr, ytr
+
+def ReadDataImpl(sDataFile, bCategorical, bOneHot=True):
+	Xtr, ytr = ReadTokens(sDataFile)
+	return PrepareData(Xtr, ytr, bCategorical, bOneHot)
+
+# Label encoding (+ optional one-hot of the tokens) of an already loaded token matrix
+def PrepareData(Xtr, ytr, bCategorical, bOneHot=True):
+	nParametersCount = Xtr.shape[1]
 	arrClassNames = np.unique(ytr)
 	print (arrClassNames)
 	#arrClassNames = ["AdWare", "Trojan", "WebToolbar", "Downloader", "DangerousObject"]
@@ -31,8 +51,9 @@ def ReadDataImpl(sDataFile, bCategorical):
 	nWordCount = nMaxSysCallValue + 1
 	
 	
-	#Hot One encoding
-	Xtr = to_categorical(Xtr)
+	#Hot One encoding (skipped for Embedding models, which take the tokens as is)
+	if bOneHot:
+		Xtr = to_categorical(Xtr)
 	
 	# from sklearn.preprocessing import LabelEncoder
 	# encoder = LabelEncoder()
@@ -46,9 +67,7 @@ def ReadDataImpl(sDataFile, bCategorical):
 	if bCategorical :
 		Ytr = to_categorical(Ytr)#[0, 1]
 	
-	del dbTrain
 	del encoder
-	del xtr
 	del ytr
 	gc.collect()
 	
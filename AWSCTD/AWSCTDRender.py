@@ -0,0 +1,103 @@
+import sys
+# insert at 1, 0 is the script path (or '' in REPL)
+sys.path.insert(1, 'Utils')
+
+import os
+import glob
+import ntpath
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+# Training figures are decoupled from AWSCTD.py: the run only stores the raw arrays
+# (accuracy/loss curves, confusion matrix, ROC curves) in REPORTS/<model>_<data>.npz.
+# This module draws the SVG figures from those artifacts, one figure per task in a
+# process pool, and is the only place importing matplotlib.
+#
+# Usage: python AWSCTDRender.py [artifact.npz ...]   (default: REPORTS/*.npz)
+
+REPORTS_DIR = 'REPORTS'
+arrClassNames = ("Benign", "Malware")
+
+def ArtifactFile(sWorkingDir, sModel, sDataFile):
+	return os.path.join(sWorkingDir, REPORTS_DIR, sModel + '_' + ntpath.basename(sDataFile) + '.npz')
+
+# Pad per-fold curves of different lengths into a (folds, max epochs) array, NaN after early stopping
+def PadCurves(arrCurves):
+	nLen = max([len(c) for c in arrCurves] + [0])
+	arrOut = np.full((len(arrCurves), nLen), np.nan)
+	for x, c in enumerate(arrCurves):
+		arrOut[x, :len(c)] = c
+	return arrOut
+
+def SaveArtifact(sWorkingDir, sModel, sDataFile, bCategorical, nClassCount, model_history, cm, dictRocCurves, tprs, aucs, mean_fpr):
+	sAccuracy = "categorical_accuracy" if bCategorical else "accuracy"
+	dictArrays = {
+		'sModel': np.array(sModel), 'sDataFile': np.array(sDataFile),
+		'bCategorical': np.array(bCategorical), 'nClassCount': np.array(nClassCount),
+		'acc': PadCurves([h.history[sAccuracy] for h in model_history]),
+		'loss': PadCurves([h.history['loss'] for h in model_history]),
+		'cm': np.asarray(cm), 'mean_fpr': np.asarray(mean_fpr)}
+	for x in dictRocCurves:
+		dictArrays['tprs_%d' % x] = np.asarray(tprs[x])
+		dictArrays['aucs_%d' % x] = np.asarray(aucs[x])
+		for nFold, (fpr, tpr) in enumerate(dictRocCurves[x]):
+			dictArrays['fpr_%d_%d' % (x, nFold)] = fpr
+			dictArrays['tpr_%d_%d' % (x, nFold)] = tpr
+	sFile = ArtifactFile(sWorkingDir, sModel, sDataFile)
+	os.makedirs(os.path.dirname(sFile), exist_ok=True)
+	np.savez_compressed(sFile, **dictArrays)
+	return sFile
+
+# Figure tasks of one artifact: (kind, artifact file, class index)
+def ListTasks(sFile):
+	with np.load(sFile) as data:
+		arrTasks = [('ACCLOSS', sFile, None), ('CM', sFile, None)]
+		if bool(data['bCategorical']):
+			arrTasks += [('ROC', sFile, x) for x in range(int(data['nClassCount'])) if 'tprs_%d' % x in data]
+	return arrTasks
+
+def RenderTask(task):
+	sKind, sFile, nClass = task
+	sWorkingDir = os.path.dirname(os.path.dirname(os.path.abspath(sFile))) + '/'
+	os.makedirs(os.path.join(sWorkingDir, sKind), exist_ok=True)
+	with np.load(sFile) as data:
+		sModel = str(data['sModel'])
+		sDataFile = str(data['sDataFile'])
+		bCategorical = bool(data['bCategorical'])
+		if sKind == 'ACCLOSS':
+			import AWSCTDPlotAcc
+			sAccuracy = "categorical_accuracy" if bCategorical else "accuracy"
+			model_history = [SimpleNamespace(history={sAccuracy: acc[~np.isnan(acc)], 'loss': loss[~np.isnan(loss)]})
+				for acc, loss in zip(data['acc'], data['loss'])]
+			AWSCTDPlotAcc.plot_acc_loss(model_history, sModel, sDataFile, bCategorical, sWorkingDir)
+		elif sKind == 'CM':
+			import AWSCTDPlotCM
+			AWSCTDPlotCM.plot_cm(data['cm'], sModel, int(data['nClassCount']), sDataFile, sWorkingDir)
+		else:
+			import AWSCTDPlotROC
+			tprs = data['tprs_%d' % nClass]
+			arrFoldCurves = [(data['fpr_%d_%d' % (nClass, f)], data['tpr_%d_%d' % (nClass, f)]) for f in range(len(tprs))]
+			AWSCTDPlotROC.plot_roc(arrFoldCurves, tprs, data['aucs_%d' % nClass], data['mean_fpr'], arrClassNames[nClass], sModel, sDataFile, sWorkingDir)
+	# Pool workers are reused: named figures ("ACC", "LOSS", ...) must not carry over to the next task
+	import matplotlib.pyplot as plt
+	plt.close('all')
+	return sKind + ' ' + sModel
+
+def RenderAll(arrFiles, nWorkers=None):
+	arrTasks = [task for sFile in arrFiles for task in ListTasks(sFile)]
+	if not arrTasks:
+		print("Aucun artefact à dessiner.")
+		return
+	nWorkers = max(1, min(nWorkers or os.cpu_count() or 1, len(arrTasks)))
+	print("Rendu de %d figures (%d processus)..." % (len(arrTasks), nWorkers))
+	# spawn : TensorFlow ne supporte pas le fork d'un processus déjà initialisé
+	with ProcessPoolExecutor(max_workers=nWorkers, mp_context=get_context('spawn')) as pool:
+		for sDone in pool.map(RenderTask, arrTasks):
+			print("   " + sDone)
+
+if __name__ == "__main__":
+	arrFiles = sys.argv[1:] or sorted(glob.glob(os.path.join(os.getcwd(), REPORTS_DIR, '*.npz')))
+	RenderAll(arrFiles)
@@ -0,0 +1,34 @@
+import sqlite3
+
+
+RESULTS_COLUMNS = ('File', 'ParamCount', 'ClassCount', 'Epochs', 'BatchSize', 'Model', 'Time', 'Acc', 'Loss', 'TimeTrain', 'TimeTest', 'Comment',
+	'AccStd', 'LossStd', 'ExecutionTime', 'PredictingOneTime', 'Acc1', 'Acc2', 'Acc3', 'Acc4', 'Acc5', 'Config')
+
+def CreateTable(con):
+	cur = con.cursor()
+	cur.execute("""
+	    CREATE TABLE IF NOT EXISTS results (
+	        File TEXT, ParamCount INTEGER, ClassCount INTEGER, Epochs INTEGER,
+	        BatchSize INTEGER, Model TEXT, Time REAL, Acc REAL, Loss REAL,
+	        TimeTrain REAL, TimeTest REAL, Comment TEXT, AccStd REAL, LossStd REAL,
+	        ExecutionTime TEXT, PredictingOneTime REAL, Acc1 REAL, Acc2 REAL,
+	        Acc3 REAL, Acc4 REAL, Acc5 REAL, Config TEXT
+	    )
+	""")
+	con.commit()
+
+# Per-fold accuracies go to Acc1..Acc5 (None when there are fewer than 5 folds)
+def FoldAccuracies(arrAcc):
+	return tuple(float(arrAcc[i]) if i < len(arrAcc) else None for i in range(5))
+
+# result: one value per RESULTS_COLUMNS entry, in that order. Returns the rowid of the new row
+def InsertResult(sDbName, result):
+	con = sqlite3.connect(sDbName)
+	try:
+		CreateTable(con)
+		sql = "INSERT INTO results (" + ", ".join(RESULTS_COLUMNS) + ") VALUES(" + ",".join("?" * len(RESULTS_COLUMNS)) + ")"
+		nRunId = con.execute(sql, result).lastrowid
+		con.commit()
+	finally:
+		con.close()
+	return nRunId
@@ -0,0 +1,174 @@
+import sys
+# insert at 1, 0 is the script path (or '' in REPL)
+sys.path.insert(1, 'Utils')
+if len(sys.argv) != 2 :
+	print("Parameters example: AWSCTDSweep.py file_to_data.npy")
+	quit()
+
+import os
+import time
+import itertools
+import configparser
+from time import gmtime, strftime
+from multiprocessing import get_context, shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import AWSCTDReadData
+import AWSCTDResults
+import AWSCTDBench
+
+# Sweep over model / epochs / batch size combinations ([SWEEP] section of config.ini).
+# The token matrix is read once and placed in shared memory: every worker process
+# maps the same buffer and streams its folds from it (AWSCTDDataset), so nothing is
+# re-converted nor re-read per combination.
+
+g_arrShared = []
+g_Xtr = None
+g_ytr = None
+
+def ToSharedMemory(arr):
+	shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+	view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)
+	view[:] = arr
+	return shm, (shm.name, arr.shape, arr.dtype.str)
+
+def FromSharedMemory(desc):
+	sName, shape, sDtype = desc
+	# Spawned workers share the parent's resource tracker: the segment is unlinked once, by the parent
+	shm = shared_memory.SharedMemory(name=sName)
+	g_arrShared.append(shm)
+	return np.ndarray(shape, dtype=np.dtype(sDtype), buffer=shm.buf)
+
+def InitWorker(descX, descY, nThreads):
+	global g_Xtr, g_ytr
+	os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
+	import tensorflow as tf
+	tf.config.threading.set_intra_op_parallelism_threads(nThreads)
+	tf.config.threading.set_inter_op_parallelism_threads(min(2, nThreads))
+	np.random.seed(0)
+	g_Xtr = FromSharedMemory(descX)
+	g_ytr = FromSharedMemory(descY)
+
+# Full K-fold run of one combination, returns the row for the results table and the per-fold timings
+def RunCombination(job):
+	import tensorflow as tf
+	import AWSCTDCreateModel
+	import AWSCTDFold
+	from keras.callbacks import EarlyStopping
+
+	sModel = job['sModel']
+	nEpochs = job['nEpochs']
+	nBatchSize = job['nBatchSize']
+	bOneHot = job['nEmbeddingDim'] == 0
+	Xtr, Ytr, nParametersCount, nClassCount, nWordCount = AWSCTDReadData.PrepareData(g_Xtr, g_ytr, job['bCategorical'], False)
+	AWSCTDCreateModel.SetPrecisionPolicy(job['bMixedPrecision'])
+
+	arrAcc = []
+	arrLoss = []
+	arrTimeFit = []
+	arrTimeTest = []
+	arrTimePredict = []
+	arrTestSize = []
+	nAllSize = 0
+	sModelJson = ''
+	start = time.time()
+	for train, test in job['arrSplits']:
+		model = AWSCTDCreateModel.CreateModelImpl(sModel, nWordCount, nClassCount, nParametersCount, job['bCategorical'], job['nEmbeddingDim'], job['bJitCompile'])
+		callbacks_list = [EarlyStopping(monitor='accuracy', patience=job['nPatience'], mode='auto', verbose=1)]
+		result = AWSCTDFold.FitFold(model, Xtr, Ytr, train, test, nEpochs, nBatchSize, callbacks_list, nWordCount, bOneHot, True)
+		arrAcc.append(result['scores'][1] * 100)
+		arrLoss.append(result['scores'][0])
+		arrTimeFit.append(result['tmExecFit'])
+		arrTimeTest.append(result['tmExecTest'])
+		arrTimePredict.append(result['tmExecPredict'])
+		nAllSize += len(test)
+		arrTestSize.append(len(test))
+		sModelJson = str(model.to_json())
+		del model
+		tf.keras.backend.clear_session()
+	tmExec = time.time() - start
+
+	sTestTag = sModel + " sweep"
+	if job['bJitCompile']:
+		sTestTag += " XLA"
+	if job['bMixedPrecision']:
+		sTestTag += " bf16"
+	row = (job['sDataFile'], nParametersCount, nClassCount, nEpochs, nBatchSize, sModelJson, tmExec,
+		float(np.mean(arrAcc)), float(np.mean(arrLoss)), float(np.mean(arrTimeFit)), float(np.mean(arrTimeTest)), sTestTag,
+		float(np.std(arrAcc)), float(np.std(arrLoss)), job['sTime'], float(np.sum(arrTimePredict)) / nAllSize) + AWSCTDResults.FoldAccuracies(arrAcc) + (job['sConfig'],)
+	return row, (arrTimeFit, arrTimePredict, arrTestSize)
+
+def ParseList(sValue, fnType=str):
+	return [fnType(s.strip()) for s in sValue.split(',') if s.strip()]
+
+if __name__ == "__main__":
+	m_sDataFile = sys.argv[1]
+	m_sWorkingDir = os.getcwd() + '/'
+
+	config = configparser.ConfigParser()
+	config.read(m_sWorkingDir + 'config.ini')
+	with open(m_sWorkingDir + 'config.ini', "r") as fIniFile:
+		sConfig = fIniFile.read()
+	arrModels = ParseList(config.get('SWEEP', 'sModels', fallback=config.get('MAIN', 'sModelName')))
+	arrEpochs = ParseList(config.get('SWEEP', 'sEpochs', fallback=config.get('MAIN', 'nEpochs')), int)
+	arrBatchSizes = ParseList(config.get('SWEEP', 'sBatchSizes', fallback=config.get('MAIN', 'nBatchSize')), int)
+	nWorkers = config.getint('SWEEP', 'nWorkers', fallback=2)
+	sDbName = config.get('FILES', 'sDatabase', fallback='results.db')
+
+	# Token matrix read once (memmap for .npy), then copied to shared memory
+	print("Lecture de la matrice de tokens : " + m_sDataFile)
+	Xtr, ytr = AWSCTDReadData.ReadTokens(m_sDataFile)
+	shmX, descX = ToSharedMemory(Xtr)
+	shmY, descY = ToSharedMemory(np.asarray(ytr))
+	nRows = len(Xtr)
+	del Xtr, ytr
+
+	# Same folds for every combination so that the results are comparable
+	from sklearn.model_selection import KFold
+	kfold = KFold(n_splits=config.getint('MAIN', 'nKFolds'), shuffle=True, random_state=0)
+	arrSplits = list(kfold.split(np.zeros(nRows)))
+
+	dictJob = {'sDataFile': m_sDataFile, 'arrSplits': arrSplits, 'sConfig': sConfig,
+		'sTime': strftime("%Y-%m-%d %H:%M:%S", gmtime()),
+		'bCategorical': config.getboolean('MAIN', 'bCategorical'),
+		'nPatience': config.getint('MAIN', 'nPatience'),
+		'nEmbeddingDim': config.getint('MAIN', 'nEmbeddingDim', fallback=0),
+		'bJitCompile': config.getboolean('MAIN', 'bJitCompile', fallback=False),
+		'bMixedPrecision': config.getboolean('MAIN', 'bMixedPrecision', fallback=False)}
+	arrJobs = []
+	for sModel, nEpochs, nBatchSize in itertools.product(arrModels, arrEpochs, arrBatchSizes):
+		job = dict(dictJob)
+		job['sModel'] = sModel
+		job['nEpochs'] = nEpochs
+		job['nBatchSize'] = nBatchSize
+		arrJobs.append(job)
+
+	nWorkers = max(1, min(nWorkers, len(arrJobs)))
+	nThreads = max(1, (os.cpu_count() or 1) // nWorkers)
+	print("Sweep : %d combinaisons, %d workers, %d threads/worker, %d séquences en mémoire partagée" % (len(arrJobs), nWorkers, nThreads, nRows))
+
+	nFailed = 0
+	try:
+		# spawn : TensorFlow ne supporte pas le fork d'un processus déjà initialisé
+		with ProcessPoolExecutor(max_workers=nWorkers, mp_context=get_context('spawn'), initializer=InitWorker, initargs=(descX, descY, nThreads)) as pool:
+			dictFutures = {pool.submit(RunCombination, job): job for job in arrJobs}
+			for future in as_completed(dictFutures):
+				job = dictFutures[future]
+				sName = "%s epochs=%d batch=%d" % (job['sModel'], job['nEpochs'], job['nBatchSize'])
+				try:
+					result, arrFoldTimes = future.result()
+				except Exception as e:
+					nFailed += 1
+					print("ERREUR : %s : %s" % (sName, e))
+					continue
+				nRunId = AWSCTDResults.InsertResult(sDbName, result)
+				AWSCTDBench.RecordRun(sDbName, nRunId, m_sDataFile, sConfig, *arrFoldTimes)
+				print("%s -> Acc: %.2f%% (+/- %.2f), temps: %.1f s" % (sName, result[7], result[12], result[6]))
+	finally:
+		for shm in (shmX, shmY):
+			shm.close()
+			shm.unlink()
+
+	print("Sweep terminé : %d/%d combinaisons enregistrées dans %s" % (len(arrJobs) - nFailed, len(arrJobs), sDbName))
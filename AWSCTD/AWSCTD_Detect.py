@@ -16,6 +16,37 @@ ALERTRCA_FILE = os.path.join(BASE_DIR, 'faults_AWSCTD.csv')
 
 # Paramètres 
 VOCAB_SIZE = 100 
+# Séquences chargées / one-hot / prédites à la fois
+CHUNK_ROWS = 16384
+PREDICT_BATCH_SIZE = 1024
+
+def iter_token_blocks(chunk_rows):
+    """Itère (début, bloc de tokens) sur DATA_FILE par blocs de chunk_rows lignes."""
+    if DATA_FILE.endswith('.npy'):
+        # Matrice de tokens binaire (sans colonne Label), lue en memmap
+        X = np.load(DATA_FILE, mmap_mode='r')
+        for start in range(0, len(X), chunk_rows):
+            yield start, np.asarray(X[start:start + chunk_rows])
+    else:
+        start = 0
+        for data in pd.read_csv(DATA_FILE, header=None, chunksize=chunk_rows):
+            yield start, data.iloc[:, :-1].values
+            start += len(data)
+
+def encode_tokens(model, X):
+    """Entrée du modèle : one-hot, sauf modèle à Embedding (tokens entiers, entrée (n, longueur))"""
+    if len(model.input_shape) == 3:
+        return to_categorical(X, num_classes=VOCAB_SIZE).astype('float16')
+    return X
+
+def prediction_scores(predictions):
+    """(score de confiance, anomalie ?) par séquence"""
+    if predictions.shape[1] == 1:
+        # Sortie binaire
+        scores = predictions[:, 0]
+        return scores, scores > 0.5
+    # Si categorical (2 neurones softmax), l'anomalie est la classe 1
+    return predictions[:, 1], np.argmax(predictions, axis=1) == 1
 
 def generate_report():
     if not os.path.exists(MODEL_FILE):
@@ -27,94 +58,68 @@ def generate_report():
     except Exception as e:
         print(f"Erreur chargement modèle: {e}")
         return
-    data = pd.read_csv(DATA_FILE, header=None)
-    
-    X = data.iloc[:, :-1].values 
-    
-    X = to_categorical(X, num_classes=VOCAB_SIZE).astype('float16')
-    
 
-    meta = pd.read_csv(META_FILE)
-    
-    if len(meta) != len(X):
-        print(f"ATTENTION : Le nombre de lignes Data ({len(X)}) diffère des Métadonnées ({len(meta)}) !")
-    
-
-    print("Analyse des anomalies en cours...")
-    predictions = model.predict(X, verbose=1)
-    
+    print(f"Analyse des anomalies en cours (blocs de {CHUNK_ROWS} séquences)...")
+    n_total = 0
+    score_min = np.inf
+    score_max = -np.inf
+    score_sum = 0.0
+    anomalies_indices = []
+    anomalies_scores = []
+    for start, X in iter_token_blocks(CHUNK_ROWS):
+        predictions = model.predict(encode_tokens(model, X), batch_size=PREDICT_BATCH_SIZE, verbose=0)
+        del X
+
+        score_min = min(score_min, predictions.min())
+        score_max = max(score_max, predictions.max())
+        score_sum += float(predictions.sum())
+        n_total += len(predictions)
+
+        scores, is_anomaly = prediction_scores(predictions)
+        idx = np.flatnonzero(is_anomaly)
+        anomalies_indices.append(idx + start)
+        anomalies_scores.append(scores[idx])
+        print(f"   ... {n_total} séquences analysées", end='\r')
+
+    anomalies_indices = np.concatenate(anomalies_indices) if anomalies_indices else np.empty(0, dtype=np.int64)
+    anomalies_scores = np.concatenate(anomalies_scores) if anomalies_scores else np.empty(0, dtype=np.float32)
 
     print(f"\n[DEBUG STATS]")
-    print(f"Min score : {predictions.min():.4f}")
-    print(f"Max score : {predictions.max():.4f}")
-    print(f"Moyenne   : {predictions.mean():.4f}")
-
-    if predictions.shape[1] == 1:
-        # Sortie binaire
-        anomalies_indices = np.where(predictions > 0.5)[0]
-        scores = predictions
-    else:
-        # Sortie catégorielle
-        anomalies_indices = np.where(np.argmax(predictions, axis=1) == 1)[0]
-        scores = predictions[:, 1]
-
-    if predictions.shape[1] == 1:
-
-        anomalies_indices = np.where(predictions > 0.5)[0]
-        scores = predictions
-    else:
-        # Si categorical (2 neurones softmax), l'anomalie est la classe 1
-        anomalies_indices = np.where(np.argmax(predictions, axis=1) == 1)[0]
-        scores = predictions[:, 1] # Score de la classe 1
+    print(f"Min score : {score_min:.4f}")
+    print(f"Max score : {score_max:.4f}")
+    print(f"Moyenne   : {score_sum / max(n_total, 1):.4f}")
 
+    meta = pd.read_csv(META_FILE, usecols=['Date', 'Tile'], dtype=str)
+    
+    if len(meta) != n_total:
+        print(f"ATTENTION : Le nombre de lignes Data ({n_total}) diffère des Métadonnées ({len(meta)}) !")
 
     print(f"\nANOMALIES TROUVÉES : {len(anomalies_indices)}")
+
+    # Jointure vectorisée anomalies <-> métadonnées
+    in_range = anomalies_indices < len(meta)
+    anom = meta.iloc[anomalies_indices[in_range]].reset_index(drop=True)
+    anom['Score'] = anomalies_scores[in_range]
     
     with open(REPORT_FILE, 'w') as f:
         f.write(f"Fichier analysé : {DATA_FILE}\n")
-        f.write(f"Total séquences : {len(X)}\n")
+        f.write(f"Total séquences : {n_total}\n")
         f.write(f"Anomalies détectées : {len(anomalies_indices)}\n")
 
-        
-        for idx in anomalies_indices:
-            if idx < len(meta):
-                row = meta.iloc[idx]
-                tile = row['Tile']
-                date = row['Date']
-                score = scores[idx] if isinstance(scores[idx], float) else scores[idx][0]
-                
-                line = f"Date: {date} | Tile: {tile} | Confiance: {score:.4f}\n"
-                f.write(line)
-            else:
-                f.write(f"ERREUR: Index {idx} hors limites des métadonnées.\n")
+        lines = "Date: " + anom['Date'] + " | Tile: " + anom['Tile'] + " | Confiance: " + anom['Score'].map('{:.4f}'.format) + "\n"
+        f.writelines(lines.tolist())
+        for idx in anomalies_indices[~in_range]:
+            f.write(f"ERREUR: Index {idx} hors limites des métadonnées.\n")
 
     print(f"Génération du CSV compatible AlertRCA : {ALERTRCA_FILE}")
-    
-    with open(ALERTRCA_FILE, 'w') as f_csv:
-        f_csv.write("id,score\n")
-        
-        for idx in anomalies_indices:
-            if idx < len(meta):
-                row = meta.iloc[idx]
-                
-                tile_full = str(row['Tile'])
-                date_val = str(row['Date'])
-                score = scores[idx] if isinstance(scores[idx], float) else scores[idx][0]
-                
-                try:
-
-                    parts = tile_full.split('_')
-                    
-                    app_name = parts[0]
-                    
-                    tile_id = parts[-1].replace('.txt', '')
-                    
-                    formatted_id = f"{app_name}_{tile_id}_{date_val}"
-                    
-                    f_csv.write(f"{formatted_id},{score:.6f}\n")
-                    
-                except Exception as e:
-                    print(f"Erreur de formatage sur {tile_full}: {e}")
+
+    # id = App_TileId_Date, ex: Facebook_DL_Tile_100006.txt -> Facebook_100006_20190501
+    tile_parts = anom['Tile'].str.split('_')
+    alert = pd.DataFrame({
+        'id': tile_parts.str[0] + "_" + tile_parts.str[-1].str.replace('.txt', '', regex=False) + "_" + anom['Date'],
+        'score': anom['Score'].map('{:.6f}'.format),
+    })
+    alert.to_csv(ALERTRCA_FILE, index=False)
 
     print(f"Rapports générés avec succès.")
 
@@ -0,0 +1,171 @@
+"""
+Service de scoring AWSCTD : le modèle entraîné reste chargé en mémoire.
+
+Le chargement de TensorFlow et du modèle n'est payé qu'une fois, au démarrage.
+Les lignes brutes de tuiles (une journée = 96 valeurs) sont discrétisées avec
+la calibration du modèle (log1p, min/max, vocabulaire, longueur, écrite par
+convert_netmob_awsctd.py et copiée à côté du modèle par AWSCTD.py) puis scorées.
+
+Usage : python AWSCTD_Serve.py [--port 8765] [--host 127.0.0.1]
+                               [--model trained_model.keras] [--calibration fichier.json]
+
+    GET  /health  -> modèle, calibration
+    POST /score   {"rows": [{"tile": "Facebook_DL_Tile_100006.txt",
+                             "date": "20190501", "values": [v1, ..., v96]},
+                            ...]}
+                  -> {"results": [{"id": "Facebook_100006_20190501",
+                                   "tile": ..., "date": ..., "score": 0.97,
+                                   "anomaly": true}, ...]}
+
+Une ligne peut aussi être envoyée au format texte NetMob :
+{"tile": ..., "line": "20190501 v1 ... v96"}.
+"""
+import os
+import sys
+import json
+import argparse
+import configparser
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+import convert_netmob_awsctd as convert
+import AWSCTD_Detect
+from keras.models import load_model
+
+# Valeurs par défaut
+HOST = '127.0.0.1'
+PORT = 8765
+MODEL_FILE = os.path.join(BASE_DIR, 'trained_model.keras')
+
+config_path = os.path.join(BASE_DIR, 'config.ini')
+if os.path.exists(config_path):
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    HOST = config.get('SERVE', 'sHost', fallback=HOST)
+    PORT = config.getint('SERVE', 'nPort', fallback=PORT)
+    MODEL_FILE = os.path.join(BASE_DIR, config.get('FILES', 'sSavedModel', fallback='trained_model.keras'))
+
+# Calibration copiée à côté du modèle par AWSCTD.py, sinon celle de la dernière conversion
+CALIBRATION_FILE = convert.calibration_file(MODEL_FILE)
+if not os.path.exists(CALIBRATION_FILE):
+    CALIBRATION_FILE = convert.calibration_file(convert.OUTPUT_FILE)
+
+
+class Scorer:
+    """Modèle + calibration chargés une seule fois."""
+
+    def __init__(self, model_file, calibration_file):
+        self.model_file = model_file
+        self.calibration_file = calibration_file
+        self.calibration = convert.load_calibration(calibration_file)
+        AWSCTD_Detect.VOCAB_SIZE = self.calibration['vocab_size']
+        self.model = load_model(model_file)
+        # Premier predict à vide : graphe construit avant la première requête
+        self.score(np.zeros((1, self.calibration['seq_len'])))
+
+    def parse_rows(self, rows):
+        """Lignes JSON -> (matrice brute à longueur fixe, métadonnées)"""
+        seqs = []
+        meta = []
+        for row in rows:
+            if 'line' in row:
+                parts = row['line'].split()
+                date, values = parts[0], parts[1:]
+            else:
+                date, values = row.get('date', ''), row['values']
+            seqs.append([float(v) for v in values])
+            meta.append((str(row.get('tile', '')), str(date)))
+        return convert.to_fixed_length(seqs, self.calibration['seq_len']), meta
+
+    def score(self, matrix):
+        """Matrice brute (n, longueur) -> (scores, anomalies)"""
+        cal = self.calibration
+        tokens = convert.apply_calibration(matrix, cal['min'], cal['max'], cal['vocab_size'])
+        predictions = self.model.predict(AWSCTD_Detect.encode_tokens(self.model, tokens),
+                                         batch_size=AWSCTD_Detect.PREDICT_BATCH_SIZE, verbose=0)
+        return AWSCTD_Detect.prediction_scores(predictions)
+
+    def score_rows(self, rows):
+        matrix, meta = self.parse_rows(rows)
+        scores, is_anomaly = self.score(matrix)
+        results = []
+        for (tile, date), score, anomaly in zip(meta, scores, is_anomaly):
+            # Même identifiant que le CSV AlertRCA de AWSCTD_Detect
+            parts = tile.split('_')
+            results.append({
+                'id': f"{parts[0]}_{parts[-1].replace('.txt', '')}_{date}",
+                'tile': tile,
+                'date': date,
+                'score': float(score),
+                'anomaly': bool(anomaly),
+            })
+        return results
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    scorer = None
+
+    def send_json(self, code, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self.send_json(404, {'error': f"Route inconnue : {self.path}"})
+            return
+        self.send_json(200, {'model': self.scorer.model_file,
+                             'calibration': self.scorer.calibration})
+
+    def do_POST(self):
+        if self.path != '/score':
+            self.send_json(404, {'error': f"Route inconnue : {self.path}"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            rows = request['rows']
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {'error': f"Requête invalide : {e}"})
+            return
+        try:
+            results = self.scorer.score_rows(rows)
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            self.send_json(400, {'error': f"Lignes invalides : {e}"})
+            return
+        self.send_json(200, {'results': results})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service de scoring AWSCTD (modèle gardé en mémoire)")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--model', default=MODEL_FILE)
+    parser.add_argument('--calibration', default=CALIBRATION_FILE)
+    args = parser.parse_args()
+
+    for path in (args.model, args.calibration):
+        if not os.path.exists(path):
+            print(f"Erreur: Fichier introuvable ({path}). Lancez la conversion et l'entraînement d'abord.")
+            sys.exit(1)
+
+    print(f"Chargement du modèle : {args.model}")
+    ScoringHandler.scorer = Scorer(args.model, args.calibration)
+    server = HTTPServer((args.host, args.port), ScoringHandler)
+    print(f"Service de scoring prêt sur http://{args.host}:{args.port} (POST /score, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
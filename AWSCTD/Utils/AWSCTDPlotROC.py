@@ -0,0 +1,47 @@
+import matplotlib
+matplotlib.use('Agg')
+
+import ntpath
+import numpy as np
+import matplotlib.pyplot as plt
+from sklearn.metrics import auc
+
+plt.rcParams['svg.fonttype'] = 'none'
+
+# arrFoldCurves: (fpr, tpr) of each fold, tprs: fold tpr interpolated on mean_fpr, aucs: fold AUCs
+def plot_roc(arrFoldCurves, tprs, aucs, mean_fpr, sClassName, sModel, sDataFile, sWorkingDir):
+	plt.figure(sClassName)
+	for x, (fpr, tpr) in enumerate(arrFoldCurves):
+		plt.plot(fpr, tpr, lw=1, alpha=0.5, label='ROC fold %d (AUC = %0.2f)' % (x + 1, aucs[x]))
+
+	#plt.plot([0, 1], [0, 1], linestyle='--', lw=1, color='r', label='Chance', alpha=.3)
+	plt.plot([0, 1], [0, 1], linestyle='--', lw=1, color='r', alpha=.3)
+
+	mean_tpr = np.mean(tprs, axis=0)
+	mean_tpr[-1] = 1.0
+	mean_auc = auc(mean_fpr, mean_tpr)
+	std_auc = np.std(aucs)
+	plt.plot(mean_fpr, mean_tpr, color='b', label=r'Mean ROC (AUC = %0.2f $\pm$ %0.2f)' % (mean_auc, std_auc), lw=2, alpha=.8)
+
+	std_tpr = np.std(tprs, axis=0)
+	tprs_upper = np.minimum(mean_tpr + std_tpr, 1)
+	tprs_lower = np.maximum(mean_tpr - std_tpr, 0)
+	plt.fill_between(mean_fpr, tprs_lower, tprs_upper, color='grey', alpha=.2,
+					 label=r'$\pm$ 1 std. dev.')
+
+	plt.xlim([-0.05, 1.05])
+	plt.ylim([-0.05, 1.05])
+	plt.xlabel('False Positive Rate')
+	plt.ylabel('True Positive Rate')
+	sTitle = 'ROC of ' + sClassName
+	plt.title(sTitle)
+	plt.grid(True)
+	plt.legend(loc="lower right")
+
+	fileROC=sWorkingDir+'ROC/ROC_'+sModel+'_'
+	fileROC+=ntpath.basename(sDataFile)+'_'
+	fileROC+=sClassName
+	fileROC+='.svg'
+
+	plt.savefig(fileROC, dpi=300, format='svg')
+	plt.close(sClassName)
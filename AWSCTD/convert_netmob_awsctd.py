@@ -3,12 +3,20 @@ import numpy as np
 import glob
 import os
 import sys
+import json
 import configparser
 import random
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(1, os.path.abspath(os.path.join(BASE_DIR, '..')))
+try:
+    import netmob_store
+except ImportError:
+    netmob_store = None
+
 config_path = os.path.join(BASE_DIR, 'config.ini')
 
 # Valeurs par défaut
@@ -16,9 +24,12 @@ MAX_FILES = 500
 VOCAB_SIZE = 100
 SEQ_LEN_DEFAULT = 96
 OUTPUT_CSV_NAME = 'netmob_for_awsctd.csv'
+OUTPUT_FORMAT = 'csv'
 OUTPUT_META_NAME = 'netmob_metadata.csv'
 ANOMALIES_NAME = 'anomalies.txt'
 LOCAL_DATA_PATH = '../../NetMob23/'
+N_WORKERS = 1
+INCREMENTAL = False
 
 if os.path.exists(config_path):
     try:
@@ -40,9 +51,12 @@ if os.path.exists(config_path):
         VOCAB_SIZE = config.getint('DATA', 'nVocabSize', fallback=VOCAB_SIZE)
         SEQ_LEN_DEFAULT = config.getint('DATA', 'nSequenceLength', fallback=SEQ_LEN_DEFAULT)
         LOCAL_DATA_PATH = config.get('DATA', 'sLocalDataPath', fallback=LOCAL_DATA_PATH)
+        N_WORKERS = config.getint('DATA', 'nWorkers', fallback=N_WORKERS)
+        INCREMENTAL = config.getboolean('DATA', 'bIncremental', fallback=INCREMENTAL)
 
         # Lecture FILES 
         OUTPUT_CSV_NAME = config.get('FILES', 'sOutputCSV', fallback=OUTPUT_CSV_NAME)
+        OUTPUT_FORMAT = config.get('FILES', 'sOutputFormat', fallback=OUTPUT_FORMAT).lower()
         OUTPUT_META_NAME = config.get('FILES', 'sOutputMeta', fallback=OUTPUT_META_NAME)
         ANOMALIES_NAME = config.get('FILES', 'sAnomalies', fallback=ANOMALIES_NAME)
         
@@ -57,6 +71,8 @@ else:
     INPUT_PATH = os.path.abspath(os.path.join(BASE_DIR, LOCAL_DATA_PATH))
 
 OUTPUT_FILE = os.path.join(BASE_DIR, OUTPUT_CSV_NAME)
+if OUTPUT_FORMAT == 'npy':
+    OUTPUT_FILE = os.path.splitext(OUTPUT_FILE)[0] + '.npy'
 OUTPUT_META_FILE = os.path.join(BASE_DIR, OUTPUT_META_NAME)
 ANOMALY_FILE = os.path.join(BASE_DIR, ANOMALIES_NAME)
 
@@ -113,8 +129,8 @@ def load_anomalies(file_path):
     with open(file_path, 'r') as f:
         return {line.strip(): 1 for line in f if line.strip()}
 
-def load_data(path):
-    """Charge les données depuis les fichiers texte dans le répertoire spécifié."""
+def list_input_files(path):
+    """Fichiers .txt du dataset, triés et limités à MAX_FILES."""
     print(f"Recherche dans : {path}")
     if not os.path.exists(path):
         print(f"ERREUR : Dossier introuvable.")
@@ -132,91 +148,357 @@ def load_data(path):
         files = files[:MAX_FILES]
     else:
         print(f"Traitement de tous les fichiers ({len(files)}).")
+    return files
+
+def load_data(path, fixed_len=None, files=None):
+    """
+    Charge les données du répertoire spécifié (ou de la liste files) : matrice float32
+    (n, fixed_len) et métadonnées DataFrame (Date, Tile), depuis le store NetMob s'il existe.
+    """
+    if files is None:
+        files = list_input_files(path)
+    if not files:
+        return np.empty((0, fixed_len or SEQ_LEN_DEFAULT), dtype=np.float32), pd.DataFrame(columns=['Date', 'Tile'])
+
+    store = netmob_store.open_store(path) if netmob_store else None
+    if store is not None:
+        # Déjà vectorisé : nWorkers ne sert qu'à la lecture texte
+        return load_data_from_store(store, files, fixed_len or SEQ_LEN_DEFAULT)
+
+    if N_WORKERS != 1:
+        return load_data_parallel(files, fixed_len or SEQ_LEN_DEFAULT)
 
     print(f"Lecture en cours...")
-    sequences = []
-    metadata = []
+    sequences, dates, tiles = parse_shard((files, fixed_len or SEQ_LEN_DEFAULT))
+    print(f"{len(sequences)} séquences extraites.")
+    return sequences, pd.DataFrame({'Date': dates, 'Tile': tiles})
 
+def load_data_from_store(store, files, fixed_len):
+    """
+    Même sortie que load_data_parallel, lue depuis le store NetMob (voir netmob_store.py) :
+    matrice float32 (n, fixed_len) remplie série par série depuis store.values, sans
+    liste Python intermédiaire. Mêmes règles que parse_file_block : > 10 valeurs, ligne
+    ignorée si un token est illisible (store.invalid_mask), 'nan' gardé (NaN), lignes
+    dans l'ordre du fichier, troncature/padding à 0 à fixed_len.
+    """
+    print(f"Lecture depuis le store : {store.store_dir}")
+    selected = []
+    for file in files:
+        s = store.series_index(os.path.abspath(file))
+        if s is not None:
+            selected.append((s, os.path.basename(file)))
+
+    # Borne haute (avant filtre des lignes illisibles), la matrice est tronquée en fin de lecture
+    n_rows = sum(int((store.lengths[s] > 10).sum()) for s, _ in selected)
+    width = min(fixed_len, store.n_slots)
+    sequences = np.zeros((n_rows, fixed_len), dtype=np.float32)
+    slots = np.arange(store.n_slots)
+    invalid = store.invalid_mask
+    dates = []
+    tiles = []
+    pos = 0
+    for s, filename in selected:
+        lengths = np.asarray(store.lengths[s])
+        rows = store.rows(s)
+        rows = rows[(lengths[rows] > 10) & ~invalid[s, rows]]
+        if len(rows) == 0:
+            continue
+        values = np.asarray(store.values[s, rows])
+        in_row = slots < lengths[rows, None]
+        block = np.where(in_row, values, 0)[:, :width]
+        sequences[pos:pos + len(block), :width] = block
+        dates.extend(store.dates[d] for d in rows)
+        tiles.extend([filename] * len(block))
+        pos += len(block)
 
-    for i, file in enumerate(files):
-        filename = os.path.basename(file)
+    print(f"{pos} séquences extraites.")
+    return sequences[:pos], pd.DataFrame({'Date': dates, 'Tile': tiles})
+
+def parse_file_block(file, fixed_len):
+    """
+    Parse un fichier directement dans un bloc NumPy (lignes, fixed_len) préalloué.
+    > 10 valeurs, ligne ignorée si un token est illisible ; un 'nan' est gardé (NaN,
+    ignoré par la calibration puis mis à 0), troncature/padding à 0 à fixed_len.
+    """
+    try:
+        with open(file, 'r') as f:
+            lines = f.read().splitlines()
+    except Exception:
+        return np.empty((0, fixed_len), dtype=np.float32), []
+
+    block = np.zeros((len(lines), fixed_len), dtype=np.float32)
+    dates = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) <= 11:
+            continue
         try:
-            with open(file, 'r') as f:
-                lines = f.readlines()
-            for line in lines:
-                parts = line.strip().split()
-                if len(parts) > 2: 
-                    date_str = parts[0]
-                    try:
-                        traffic_seq = [float(x) for x in parts[1:]]
-                        if len(traffic_seq) > 10: 
-                            sequences.append(traffic_seq)
-                            metadata.append({'Date': date_str, 'Tile': filename})
-                    except ValueError:
-                        continue 
-        except Exception:
-            pass
-        
-        if i % 50 == 0:
-            print(f"   ... {i}/{len(files)} traités", end='\r')
+            vals = np.array(parts[1:], dtype=np.float32)
+        except ValueError:
+            continue
+        vals = vals[:fixed_len]
+        block[len(dates), :len(vals)] = vals
+        dates.append(parts[0])
+    return block[:len(dates)], dates
 
+def parse_shard(args):
+    """Worker : parse une liste de fichiers et renvoie un seul bloc concaténé."""
+    files, fixed_len = args
+    blocks = []
+    dates = []
+    tiles = []
+    for file in files:
+        block, file_dates = parse_file_block(file, fixed_len)
+        blocks.append(block)
+        dates.extend(file_dates)
+        tiles.extend([os.path.basename(file)] * len(file_dates))
+    if not blocks:
+        return np.empty((0, fixed_len), dtype=np.float32), dates, tiles
+    return np.concatenate(blocks), dates, tiles
+
+def load_data_parallel(files, fixed_len):
+    """
+    Variante multi-processus de load_data : la liste de fichiers est découpée en
+    shards contigus (ordre conservé), chaque worker renvoie un bloc float32 déjà à
+    longueur fixe. Retourne (matrice (n, fixed_len), métadonnées DataFrame).
+    """
+    n_workers = N_WORKERS if N_WORKERS > 0 else os.cpu_count()
+    n_shards = min(len(files), n_workers * 4)
+    shard_size = -(-len(files) // n_shards)
+    shards = [(files[i:i + shard_size], fixed_len) for i in range(0, len(files), shard_size)]
+    print(f"Lecture parallèle : {len(files)} fichiers, {n_workers} workers, {len(shards)} shards")
+
+    blocks = []
+    dates = []
+    tiles = []
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        for i, (block, shard_dates, shard_tiles) in enumerate(pool.map(parse_shard, shards)):
+            blocks.append(block)
+            dates.extend(shard_dates)
+            tiles.extend(shard_tiles)
+            print(f"   ... {i + 1}/{len(shards)} shards traités", end='\r')
+
+    sequences = np.concatenate(blocks)
+    del blocks
     print(f"\n{len(sequences)} séquences extraites.")
-    return sequences, metadata
+    return sequences, pd.DataFrame({'Date': dates, 'Tile': tiles})
+
+def calibrate(matrix, calibration_ratio=0.5, chunk_rows=65536):
+    """min/max de log1p sur la première moitié des lignes (NaN si rien de lisible)"""
+    split_index = int(len(matrix) * calibration_ratio)
+    min_val = np.nan
+    max_val = np.nan
+    for start in range(0, split_index, chunk_rows):
+        block = np.log1p(matrix[start:min(start + chunk_rows, split_index)], dtype=np.float64)
+        if np.isnan(block).all():
+            continue
+        min_val = np.nanmin([min_val, np.nanmin(block)])
+        max_val = np.nanmax([max_val, np.nanmax(block)])
+
+    print(f" Min: {min_val:.4f}, Max: {max_val:.4f} (sur {split_index} séquences)")
+    return min_val, max_val
+
+def apply_calibration(matrix, min_val, max_val, vocab_size, chunk_rows=65536):
+    """
+    Tokens d'une matrice (n, longueur) avec un min/max déjà calibré : log1p, mise à
+    l'échelle (vocab_size - 1), clip et troncature. Utilisé aussi par AWSCTD_Serve.py.
+    """
+    tokens = np.zeros(matrix.shape, dtype=np.uint8 if vocab_size <= 256 else np.uint16)
+
+    # Normalisation du dataset (constante ou calibration vide -> tokens à 0)
+    if max_val == min_val or np.isnan(min_val):
+        return tokens
+
+    with np.errstate(invalid='ignore'):
+        for start in range(0, len(matrix), chunk_rows):
+            block = np.log1p(matrix[start:start + chunk_rows], dtype=np.float64)
+            block -= min_val
+            block /= (max_val - min_val)
+            block *= (vocab_size - 1)
+            np.clip(block, 0, vocab_size - 1, out=block)
+            np.nan_to_num(block, copy=False, nan=0.0)
+            tokens[start:start + chunk_rows] = block
+    return tokens
+
+def discretize(matrix, vocab_size, calibration_ratio=0.5, chunk_rows=65536):
+    """
+    log1p, min/max calibré sur la première moitié des lignes, mise à l'échelle
+    (vocab_size - 1), clip et troncature, directement en tokens uint8 (uint16 si
+    vocab_size > 256). Traitement par blocs de lignes en float64 : mêmes valeurs
+    que l'ancien pipeline pandas sans matérialiser de DataFrame complet.
+    """
+    # Determination du min/max sur la première moitié des données
+    min_val, max_val = calibrate(matrix, calibration_ratio, chunk_rows)
+    return apply_calibration(matrix, min_val, max_val, vocab_size, chunk_rows), min_val, max_val
+
+def to_fixed_length(sequences, fixed_len):
+    """Mise en forme à longueur fixe (troncature / padding à 0) de quelques séquences (AWSCTD_Serve.py)"""
+    matrix = np.zeros((len(sequences), fixed_len), dtype=np.float64)
+    for i, seq in enumerate(sequences):
+        n = min(len(seq), fixed_len)
+        matrix[i, :n] = seq[:n]
+    return matrix
 
 def process_sequences(sequences, vocab_size, fixed_len):
-    """Nettoie, normalise et discrétise les séquences"""
-    print(" Discrétisation (0-99)")
-    if not sequences:
+    """Nettoie, normalise et discrétise les séquences -> matrice de tokens (n, fixed_len)"""
+    print(f" Discrétisation (0-{vocab_size - 1})")
+    if len(sequences) == 0:
         print("Erreur: Aucune séquence à traiter.")
         sys.exit()
 
-    processed_seqs = []
-    
-    # Mise en forme à longueur fixe
-    for seq in sequences:
-        if len(seq) >= fixed_len:
-            processed_seqs.append(seq[:fixed_len])
+    # Matrice de load_data, déjà à longueur fixe : discrétisation en une passe vectorisée
+    matrix = sequences[:, :fixed_len]
+    tokens, min_val, max_val = discretize(matrix, vocab_size)
+    calibration = {'min': float(min_val), 'max': float(max_val), 'vocab_size': vocab_size, 'seq_len': fixed_len}
+    return tokens, calibration
+
+def labels_file(data_file):
+    """Fichier des labels associé à une matrice .npy (voir AWSCTDReadData)"""
+    return os.path.splitext(data_file)[0] + '_labels.npy'
+
+def calibration_file(data_file):
+    """Calibration (min/max, vocabulaire, longueur) associée à une matrice de tokens"""
+    return os.path.splitext(data_file)[0] + '_calibration.json'
+
+def save_calibration(calibration, path):
+    with open(path, 'w') as f:
+        json.dump(calibration, f, indent=2)
+    print(f"Calibration : {path}")
+
+def load_calibration(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def sources_file(data_file):
+    """Empreinte (taille, mtime) des fichiers déjà ingérés, pour le mode incrémental"""
+    return os.path.splitext(data_file)[0] + '_sources.json'
+
+def file_fingerprint(files):
+    fingerprint = {}
+    for file in files:
+        st = os.stat(file)
+        fingerprint[os.path.abspath(file)] = [st.st_size, st.st_mtime_ns]
+    return fingerprint
+
+def save_sources(fingerprint, path):
+    with open(path, 'w') as f:
+        json.dump(fingerprint, f)
+
+def append_npy(path, rows):
+    """
+    Ajoute des lignes (axe 0) à un .npy existant sans le réécrire : l'en-tête est
+    mis à jour sur place (numpy réserve de la place pour la croissance de la
+    forme), les données sont écrites en fin de fichier.
+    """
+    rows = np.ascontiguousarray(rows)
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
         else:
-            processed_seqs.append(seq + [0] * (fixed_len - len(seq)))
-            
-    df = pd.DataFrame(processed_seqs)
-    
-    df_log = np.log1p(df)
-    
-    # Determination du min/max sur la première moitié des données
-    calibration_ratio = 0.5 
-    split_index = int(len(df_log) * calibration_ratio)
-    
-    calibration_data = df_log.iloc[:split_index]
-    
-    min_val = calibration_data.min().min()
-    max_val = calibration_data.max().max()
-    
-    print(f" Min: {min_val:.4f}, Max: {max_val:.4f} (sur {split_index} séquences)")
-    
-    # Normalisation du dataset
-    if max_val == min_val:
-        df_discrete = df_log * 0
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        data_offset = f.tell()
+        if fortran_order or dtype != rows.dtype or tuple(shape[1:]) != rows.shape[1:]:
+            raise ValueError(f"{path} : format incompatible ({dtype}, {shape}) avec les nouvelles lignes ({rows.dtype}, {rows.shape})")
+
+        header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False,
+                  'shape': (shape[0] + len(rows),) + tuple(shape[1:])}
+        header_start = 8 + (2 if version == (1, 0) else 4)
+        header_len = data_offset - header_start
+        header_str = repr(header)
+        if len(header_str) + 1 > header_len:
+            raise ValueError(f"{path} : en-tête .npy trop court pour la nouvelle forme")
+        f.seek(header_start)
+        f.write((header_str.ljust(header_len - 1) + '\n').encode('latin1'))
+
+        f.seek(0, os.SEEK_END)
+        f.write(rows.tobytes())
+
+def append_labels_and_save(tokens, dates_list, metadata, ANOMALY_DATES):
+    """Mode incrémental : ajoute les nouvelles séquences à la matrice, aux labels et aux métadonnées."""
+    print(" Ajout des Labels...")
+    labels = [ANOMALY_DATES.get(d, 0) for d in dates_list]
+    print(f"   -> Anomalies : {sum(labels)} / {len(tokens)} nouvelles séquences")
+
+    print(f"Ajout à : {OUTPUT_FILE}")
+    if OUTPUT_FORMAT == 'npy':
+        append_npy(OUTPUT_FILE, tokens)
+        append_npy(labels_file(OUTPUT_FILE), np.asarray(labels, dtype=np.uint8))
     else:
-        df_normalized = (df_log - min_val) / (max_val - min_val)
-        
-        df_scaled = df_normalized * (vocab_size - 1)
-        
-        df_discrete = df_scaled.clip(0, vocab_size - 1)
-    
-    return df_discrete.fillna(0).astype(int)
+        df = pd.DataFrame(tokens)
+        df['Label'] = labels
+        df.to_csv(OUTPUT_FILE, mode='a', index=False, header=False, sep=',')
+
+    # Les index des métadonnées continuent ceux des lignes existantes
+    n_existing = len(pd.read_csv(OUTPUT_META_FILE, usecols=['Index']))
+    df_meta = pd.DataFrame(metadata).reset_index(drop=True)
+    df_meta['Label'] = labels
+    df_meta.index += n_existing
+    df_meta.to_csv(OUTPUT_META_FILE, mode='a', index=True, header=False)
+
+    print("Terminé.")
+
+def run_incremental(ANOMALY_DATES):
+    """
+    Ingestion des seules nouvelles journées de tuiles : fichiers nouveaux ou
+    modifiés depuis la dernière conversion, lignes (Tile, Date) absentes des
+    métadonnées. La calibration existante est réutilisée telle quelle, les
+    tokens sont ajoutés à la fin de la matrice : coût proportionnel aux
+    nouvelles données.
+    """
+    calibration_path = calibration_file(OUTPUT_FILE)
+    for path in (OUTPUT_FILE, OUTPUT_META_FILE, calibration_path, sources_file(OUTPUT_FILE)):
+        if not os.path.exists(path):
+            print(f"ERREUR : {path} introuvable. Lancez d'abord une conversion complète.")
+            sys.exit(1)
+
+    calibration = load_calibration(calibration_path)
+    with open(sources_file(OUTPUT_FILE), 'r') as f:
+        known_sources = json.load(f)
+
+    files = list_input_files(INPUT_PATH)
+    fingerprint = file_fingerprint(files)
+    changed = [file for file in files if known_sources.get(os.path.abspath(file)) != fingerprint[os.path.abspath(file)]]
+    print(f"Mode incrémental : {len(changed)}/{len(files)} fichiers nouveaux ou modifiés")
+
+    seqs, metadata = load_data(INPUT_PATH, calibration['seq_len'], changed)
+    df_meta = pd.DataFrame(metadata, columns=['Date', 'Tile'])
+    if len(df_meta):
+        # Journées déjà présentes dans la matrice (fichier modifié = nouvelles lignes ajoutées)
+        known = pd.read_csv(OUTPUT_META_FILE, usecols=['Date', 'Tile'], dtype=str)
+        known_keys = set(known['Tile'] + '|' + known['Date'])
+        is_new = ~(df_meta['Tile'] + '|' + df_meta['Date'].astype(str)).isin(known_keys).values
+        df_meta = df_meta[is_new]
+        seqs = seqs[is_new]
 
-def add_labels_and_save(df,dates_list, metadata,ANOMALY_DATES):
+    if len(df_meta) == 0:
+        print("Aucune nouvelle journée à ajouter.")
+    else:
+        print(f" Discrétisation de {len(df_meta)} nouvelles séquences (calibration : {calibration_path})")
+        matrix = seqs[:, :calibration['seq_len']]
+        tokens = apply_calibration(matrix, calibration['min'], calibration['max'], calibration['vocab_size'])
+        append_labels_and_save(tokens, list(df_meta['Date']), df_meta, ANOMALY_DATES)
+
+    known_sources.update(fingerprint)
+    save_sources(known_sources, sources_file(OUTPUT_FILE))
+
+def add_labels_and_save(tokens,dates_list, metadata,ANOMALY_DATES):
     """Ajoute les labels et sauvegarde les données."""
     print(" Ajout des Labels...")
     labels = [ANOMALY_DATES.get(d, 0) for d in dates_list]
-    df['Label'] = labels
     
     count_anom = sum(labels)
-    print(f"   -> Anomalies : {count_anom} / {len(df)} ({(count_anom/len(df))*100:.2f}%)")
+    print(f"   -> Anomalies : {count_anom} / {len(tokens)} ({(count_anom/len(tokens))*100:.2f}%)")
     
     print(f"Sauvegarde : {OUTPUT_FILE}")
-    df.to_csv(OUTPUT_FILE, index=False, header=False, sep=',')
+    if OUTPUT_FORMAT == 'npy':
+        # Matrice binaire uint8 (lecture memmap) + labels dans un fichier séparé
+        np.save(OUTPUT_FILE, tokens)
+        np.save(labels_file(OUTPUT_FILE), np.asarray(labels, dtype=np.uint8))
+    else:
+        df = pd.DataFrame(tokens)
+        df['Label'] = labels
+        df.to_csv(OUTPUT_FILE, index=False, header=False, sep=',')
 
     # Sauvegarde des métadonnées
     df_meta = pd.DataFrame(metadata)
@@ -227,10 +509,18 @@ def add_labels_and_save(df,dates_list, metadata,ANOMALY_DATES):
 
 if __name__ == "__main__":
     ANOMALY_DATES = load_anomalies(ANOMALY_FILE)
+    if INCREMENTAL or '--incremental' in sys.argv:
+        run_incremental(ANOMALY_DATES)
+        sys.exit(0)
+
     files = glob.glob(os.path.join(INPUT_PATH, '**/*.txt'), recursive=True)
     DYNAMIC_LENGTH = detect_sequence_length(files)
 
-    seqs, metadata = load_data(INPUT_PATH)
-    df_clean = process_sequences(seqs, VOCAB_SIZE, DYNAMIC_LENGTH)
-    dates_list = [m['Date'] for m in metadata]
-    add_labels_and_save(df_clean,dates_list, metadata,ANOMALY_DATES)
\ No newline at end of file
+    input_files = list_input_files(INPUT_PATH)
+    seqs, metadata = load_data(INPUT_PATH, DYNAMIC_LENGTH, input_files)
+    tokens, calibration = process_sequences(seqs, VOCAB_SIZE, DYNAMIC_LENGTH)
+    dates_list = list(pd.DataFrame(metadata)['Date'])
+    add_labels_and_save(tokens,dates_list, metadata,ANOMALY_DATES)
+    # Même normalisation pour les nouvelles données (AWSCTD_Serve.py, mode incrémental)
+    save_calibration(calibration, calibration_file(OUTPUT_FILE))
+    save_sources(file_fingerprint(input_files), sources_file(OUTPUT_FILE))
\ No newline at end of file
@@ -3,11 +3,24 @@
 # Arrêter le script si une commande échoue
 set -e 
 
-echo ">>> Conversion des données NetMob..."
-python3 convert_netmob_awsctd.py
+# Scripts Python : exécutés par le worker chaud du conteneur si main.py --warm (sir_worker.py)
+run_py() {
+    if [ -n "$SIR_WORKER_SOCKET" ]; then
+        python3 /opt/sir/sir_worker.py run "$@"
+    else
+        python3 "$@"
+    fi
+}
+
+if [ "$SIR_STAGE_CACHED" = "1" ]; then
+    echo ">>> Conversion des données NetMob restaurée depuis le cache (main.py), étape sautée."
+else
+    echo ">>> Conversion des données NetMob..."
+    run_py convert_netmob_awsctd.py
+fi
 
 echo ">>> Lecture de la configuration..."
-MODEL_INFO=$(python3 -c "import configparser; c=configparser.ConfigParser(); c.read('config.ini'); print(c.get('MAIN', 'sModelName', fallback='AWSCTD-CNN-S') + '|' + c.get('FILES', 'sOutputCSV', fallback='netmob_for_awsctd.csv'))")
+MODEL_INFO=$(python3 -c "import configparser, os; c=configparser.ConfigParser(); c.read('config.ini'); f=c.get('FILES', 'sOutputCSV', fallback='netmob_for_awsctd.csv'); f=os.path.splitext(f)[0] + '.npy' if c.get('FILES', 'sOutputFormat', fallback='csv').lower() == 'npy' else f; print(c.get('MAIN', 'sModelName', fallback='AWSCTD-CNN-S') + '|' + f)")
 
 MODEL_NAME=$(echo $MODEL_INFO | cut -d'|' -f1)
 CSV_NAME=$(echo $MODEL_INFO | cut -d'|' -f2)
@@ -15,6 +28,6 @@ CSV_NAME=$(echo $MODEL_INFO | cut -d'|' -f2)
 echo ">>> Modèle : $MODEL_NAME | Fichier Data : $CSV_NAME"
 
 echo ">>> Entraînement et Détection..."
-python3 AWSCTD.py "$CSV_NAME" "$MODEL_NAME"
+run_py AWSCTD.py "$CSV_NAME" "$MODEL_NAME"
 
 echo ">>> Terminé."
\ No newline at end of file
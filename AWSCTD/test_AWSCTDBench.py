@@ -0,0 +1,64 @@
+import json
+import subprocess
+
+import AWSCTDBench
+
+
+def MakeRun(nRunId, sComment, sCommit, sConfig):
+	return {'RunId': nRunId, 'Comment': sComment, 'GitCommit': sCommit, 'ConfigHash': sConfig}
+
+arrRuns = [
+	MakeRun(3, 'AWSCTD-CNN-S', '3f2a9c1e', '42aa'),
+	MakeRun(42, 'AWSCTD-CNN-S', '3f2a9c1e', '9f2e'),
+	MakeRun(7, 'AWSCTD-LSTM', '42b0d7', '42cc'),
+	MakeRun(8, 'AWSCTD-LSTM', '', '77aa'),
+]
+
+def RunIds(arrSelected):
+	return [run['RunId'] for run in arrSelected]
+
+
+class TestClass:
+	def test_select_field(self):
+		assert RunIds(AWSCTDBench.SelectRuns(arrRuns, 'run:42')) == [42]
+		assert RunIds(AWSCTDBench.SelectRuns(arrRuns, 'comment:AWSCTD-LSTM')) == [7, 8]
+		assert RunIds(AWSCTDBench.SelectRuns(arrRuns, 'commit:3f2a')) == [3, 42]
+		assert RunIds(AWSCTDBench.SelectRuns(arrRuns, 'config:42')) == [3, 7]
+		assert AWSCTDBench.SelectRuns(arrRuns, 'run:9') == []
+
+	def test_select_without_prefix(self):
+		# RunId 42 : ni le commit 42b0d7 ni la config 42cc ne sont ajoutés
+		assert RunIds(AWSCTDBench.SelectRuns(arrRuns, '42')) == [42]
+		assert RunIds(AWSCTDBench.SelectRuns(arrRuns, 'AWSCTD-CNN-S')) == [3, 42]
+		assert RunIds(AWSCTDBench.SelectRuns(arrRuns, '42b')) == [7]
+		assert RunIds(AWSCTDBench.SelectRuns(arrRuns, '77')) == [8]
+		assert AWSCTDBench.SelectRuns(arrRuns, 'ffff') == []
+
+	def test_select_value_with_colon(self):
+		# Préfixe inconnu : le sélecteur complet est un commentaire
+		arrColon = arrRuns + [MakeRun(9, 'test:bf16', 'aa', 'bb')]
+		assert RunIds(AWSCTDBench.SelectRuns(arrColon, 'test:bf16')) == [9]
+
+	def test_fold_samples(self):
+		run = {'FoldTimeFit': json.dumps([10.0, 12.0]), 'FoldTimePredict': json.dumps([2.0, 0.0]), 'FoldTestSize': json.dumps([1000, 500])}
+		dictSamples = AWSCTDBench.FoldSamples([run, run])
+		assert dictSamples['fit_s'] == [10.0, 12.0, 10.0, 12.0]
+		assert dictSamples['predict_ms_per_seq'][0] == 2.0
+		assert dictSamples['predict_seq_per_s'][0] == 500.0
+
+	def test_git_commit(self, monkeypatch):
+		monkeypatch.setenv('SIR_GIT_COMMIT', 'abc1234')
+		assert AWSCTDBench.GitCommit() == 'abc1234'
+
+		# Pas de commit transmis et pas de dépôt git (/app dans le conteneur) : vide
+		def NoGit(*args, **kwargs):
+			raise subprocess.CalledProcessError(128, args[0])
+		monkeypatch.delenv('SIR_GIT_COMMIT')
+		monkeypatch.setattr(AWSCTDBench.subprocess, 'check_output', NoGit)
+		assert AWSCTDBench.GitCommit() == ''
+
+	def test_host_name(self, monkeypatch):
+		monkeypatch.setenv('SIR_HOST', 'bench-host')
+		assert AWSCTDBench.HostName() == 'bench-host'
+		monkeypatch.delenv('SIR_HOST')
+		assert AWSCTDBench.HostName() == AWSCTDBench.platform.node()
@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+import convert_netmob_awsctd as convert
+import netmob_store
+
+VALUES = ' '.join(str(v) for v in range(1, 13))
+
+
+def make_tiles(root):
+    """NetMob23/ : tuile 1 sur 4 jours (une ligne 'nan', une ligne illisible), tuile 2 non triée"""
+    data = root / 'NetMob23'
+    data.joinpath('Facebook').mkdir(parents=True)
+    data.joinpath('Facebook', 'Facebook_DL_Tile_1.txt').write_text(
+        '20190316 0.5 ' + VALUES + '\n'
+        '20190317 nan ' + VALUES + '\n'
+        '20190318 abc ' + VALUES + '\n'
+        '20190319 123456789 ' + VALUES + '\n')
+    data.joinpath('Facebook', 'Facebook_DL_Tile_2.txt').write_text(
+        '20190317 7 ' + VALUES + '\n'
+        '20190316 3 ' + VALUES + '\n'
+        '20190318 1 2 3\n')
+    return data
+
+
+def reference_tokens(matrix, min_val, max_val, vocab_size):
+    scaled = (np.log1p(matrix.astype(np.float64)) - min_val) / (max_val - min_val) * (vocab_size - 1)
+    return np.nan_to_num(np.clip(scaled, 0, vocab_size - 1), nan=0.0).astype(np.int64)
+
+
+class TestClass:
+    def test_discretize(self):
+        matrix = np.array([[0, 1, 3], [7, 15, 31], [63, 127, 255], [511, 1023, 2047]], dtype=np.float32)
+        tokens, min_val, max_val = convert.discretize(matrix, 100)
+
+        # min / max calibrés sur la première moitié des lignes
+        assert min_val == np.log1p(0)
+        assert max_val == np.log1p(np.float64(31))
+        assert tokens.dtype == np.uint8
+        assert tokens.shape == matrix.shape
+        assert (tokens == reference_tokens(matrix, min_val, max_val, 100)).all()
+        # au-delà de la calibration : dernier token
+        assert (tokens[2:] == 99).all()
+
+    def test_discretize_dtype(self):
+        matrix = np.arange(12, dtype=np.float32).reshape(4, 3)
+        assert convert.discretize(matrix, 256)[0].dtype == np.uint8
+        assert convert.discretize(matrix, 1000)[0].dtype == np.uint16
+
+    def test_discretize_nan_and_constant(self):
+        matrix = np.array([[1, np.nan], [3, 4], [5, np.nan], [7, 8]], dtype=np.float32)
+        tokens, _, _ = convert.discretize(matrix, 100)
+        assert tokens[0, 1] == 0
+        assert tokens[2, 1] == 0
+
+        tokens, min_val, max_val = convert.discretize(np.full((4, 3), 5, dtype=np.float32), 100)
+        assert min_val == max_val
+        assert (tokens == 0).all()
+
+    def test_discretize_chunks(self):
+        rng = np.random.RandomState(0)
+        matrix = rng.exponential(100, size=(1000, 96)).astype(np.float32)
+        tokens, _, _ = convert.discretize(matrix, 100)
+        chunked, _, _ = convert.discretize(matrix, 100, chunk_rows=7)
+        assert (tokens == chunked).all()
+
+    def test_apply_calibration(self):
+        rng = np.random.RandomState(1)
+        matrix = rng.exponential(100, size=(200, 96)).astype(np.float32)
+        tokens, min_val, max_val = convert.discretize(matrix, 100)
+
+        # Même calibration (AWSCTD_Serve.py) : mêmes tokens, y compris par blocs de lignes
+        assert (convert.apply_calibration(matrix, min_val, max_val, 100) == tokens).all()
+        assert (convert.apply_calibration(matrix[150:], min_val, max_val, 100) == tokens[150:]).all()
+
+        new = np.array([[0, np.expm1(max_val) * 10, np.nan]], dtype=np.float32)
+        assert convert.apply_calibration(new, min_val, max_val, 100).tolist() == [[0, 99, 0]]
+
+        # Calibration vide (NaN) ou constante : tokens à 0
+        assert (convert.apply_calibration(matrix, np.nan, np.nan, 100) == 0).all()
+        assert (convert.apply_calibration(matrix, 1.0, 1.0, 100) == 0).all()
+
+    def test_append_npy(self, tmp_path):
+        path = str(tmp_path / 'tokens.npy')
+        first = np.arange(12, dtype=np.uint8).reshape(4, 3)
+        np.save(path, first)
+
+        rows = [np.full((2, 3), 7, dtype=np.uint8), np.full((1000, 3), 9, dtype=np.uint8)]
+        for block in rows:
+            convert.append_npy(path, block)
+
+        expected = np.concatenate([first] + rows)
+        assert (np.load(path) == expected).all()
+        assert np.load(path, mmap_mode='r').shape == expected.shape
+
+    def test_append_npy_incompatible(self, tmp_path):
+        path = str(tmp_path / 'tokens.npy')
+        np.save(path, np.zeros((4, 3), dtype=np.uint8))
+        for rows in (np.zeros((2, 3), dtype=np.uint16), np.zeros((2, 4), dtype=np.uint8)):
+            with pytest.raises(ValueError):
+                convert.append_npy(path, rows)
+        # fichier inchangé
+        assert np.load(path).shape == (4, 3)
+
+    def test_load_data_store_parity(self, tmp_path):
+        data = make_tiles(tmp_path)
+        files = convert.list_input_files(str(data))
+        text, text_meta = convert.load_data(str(data), 16, files)
+
+        # Ligne 'nan' gardée (NaN), ligne illisible et ligne courte écartées
+        assert text_meta['Date'].tolist() == ['20190316', '20190317', '20190319', '20190317', '20190316']
+        assert text_meta['Tile'].tolist() == ['Facebook_DL_Tile_1.txt'] * 3 + ['Facebook_DL_Tile_2.txt'] * 2
+        assert np.isnan(text[1, 0])
+        assert (text[:, 13:] == 0).all()
+
+        netmob_store.build_store(str(data))
+        store, store_meta = convert.load_data(str(data), 16, files)
+        assert store_meta.equals(text_meta)
+        assert store.dtype == text.dtype
+        assert np.array_equal(store, text, equal_nan=True)
+
+    def test_load_data_parallel(self, tmp_path, monkeypatch):
+        data = make_tiles(tmp_path)
+        for i in range(3, 8):
+            data.joinpath('Facebook', 'Facebook_DL_Tile_%d.txt' % i).write_text(
+                ''.join('201903%02d %d %s\n' % (16 + d, i * d, VALUES) for d in range(i % 4 + 1)))
+        files = convert.list_input_files(str(data))
+
+        monkeypatch.setattr(convert, 'N_WORKERS', 1)
+        sequences, meta = convert.load_data(str(data), 16, files)
+        # 2 workers, un shard par fichier : l'ordre des fichiers doit être conservé
+        monkeypatch.setattr(convert, 'N_WORKERS', 2)
+        parallel, parallel_meta = convert.load_data(str(data), 16, files)
+
+        assert len(sequences) == 5 + sum(i % 4 + 1 for i in range(3, 8))
+        assert parallel_meta.equals(meta)
+        assert parallel.dtype == sequences.dtype
+        assert np.array_equal(parallel, sequences, equal_nan=True)
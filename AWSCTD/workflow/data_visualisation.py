@@ -5,13 +5,22 @@ import glob
 import os
 import sys
 import numpy as np
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
 #CONFIGURATION
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(1, os.path.abspath(os.path.join(BASE_DIR, '../..')))
+try:
+    import netmob_store
+except ImportError:
+    netmob_store = None
 
 # Chemins
 TXT_DIR_PATH = os.path.abspath(os.path.join(BASE_DIR, '../../netmob23/'))
 CSV_FILE_PATH = os.path.join(BASE_DIR, 'netmob_for_awsctd.csv') 
+CACHE_DIR = os.path.join(BASE_DIR, '.cache')
+AGGREGATE_VERSION = 2  # À incrémenter si l'agrégation change (invalide les caches .npz)
 
 def get_user_choice():
     print("\n--- MENU VISUALISATION ---")
@@ -20,44 +29,135 @@ def get_user_choice():
     print("3. Quitter")
     return input("\nChoix : ").strip()
 
+def list_txt_files():
+    """Fichiers de trafic, triés : ni anomalies, ni rapports, ni geojson, ni store colonnaire"""
+    if netmob_store is not None:
+        return [os.path.join(TXT_DIR_PATH, *rel.split('/')) for rel in netmob_store.list_source_files(TXT_DIR_PATH)]
+    files = glob.glob(os.path.join(TXT_DIR_PATH, '**/*.txt'), recursive=True)
+    ignored = ('anomal', 'report', 'geojson')
+    files = [f for f in files if not any(part in os.path.basename(f).lower() for part in ignored)
+             and '_store' not in os.path.relpath(f, TXT_DIR_PATH).split(os.sep)]
+    files.sort()
+    return files
+
+def cache_path(files):
+    """Cache de l'agrégation, identifié par l'ensemble des fichiers (chemin, taille, mtime)"""
+    h = hashlib.sha1(f"v{AGGREGATE_VERSION}\n".encode())
+    for file in files:
+        st = os.stat(file)
+        h.update(f"{os.path.relpath(file, TXT_DIR_PATH)}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return os.path.join(CACHE_DIR, f"txt_aggregate_{h.hexdigest()[:16]}.npz")
+
+class DateAccumulator:
+    """Somme par date dans un tableau préalloué (dates x quarts d'heure), agrandi par doublement"""
+
+    def __init__(self, n_dates=128, n_slots=96):
+        self.date_pos = {}
+        self.values = np.zeros((n_dates, n_slots), dtype=np.float64)
+
+    def reserve(self, n_dates, n_slots):
+        rows, cols = self.values.shape
+        if n_dates <= rows and n_slots <= cols:
+            return
+        grown = np.zeros((max(rows * 2, n_dates), max(cols, n_slots)), dtype=np.float64)
+        grown[:rows, :cols] = self.values
+        self.values = grown
+
+    def add(self, dates, block):
+        pos = []
+        for d in dates:
+            p = self.date_pos.get(d)
+            if p is None:
+                p = self.date_pos[d] = len(self.date_pos)
+            pos.append(p)
+        self.reserve(len(self.date_pos), block.shape[1])
+        pos = np.asarray(pos)
+        if len(np.unique(pos)) == len(pos):
+            self.values[pos, :block.shape[1]] += block
+        else:
+            # Date répétée dans le bloc : accumulation non bufferisée
+            np.add.at(self.values, (pos[:, None], np.arange(block.shape[1])), block)
+
+    def result(self):
+        n = len(self.date_pos)
+        return list(self.date_pos), self.values[:n]
+
+def parse_txt_file(file):
+    """Fichier tuile -> (dates, bloc (lignes, valeurs)) ; valeurs illisibles ou absentes = 0"""
+    with open(file, 'r', encoding='utf-8', errors='ignore') as f:
+        rows = [line.split() for line in f]
+    rows = [r for r in rows if len(r) >= 2]
+    width = max((len(r) - 1 for r in rows), default=0)
+    block = np.zeros((len(rows), width), dtype=np.float64)
+    for i, r in enumerate(rows):
+        try:
+            # float() accepte 'nan' : sans nan_to_num, un seul 'nan' fausserait le total de la date
+            block[i, :len(r) - 1] = np.nan_to_num(np.array(r[1:], dtype=np.float64), nan=0.0)
+        except ValueError:
+            block[i, :len(r) - 1] = np.nan_to_num(pd.to_numeric(pd.Series(r[1:]), errors='coerce').values, nan=0.0)
+    return [r[0] for r in rows], block
+
+def aggregate_shard(files):
+    acc = DateAccumulator()
+    for file in files:
+        try:
+            dates, block = parse_txt_file(file)
+        except Exception:
+            continue # On ignore les fichiers illisibles
+        if len(dates):
+            acc.add(dates, block)
+    return acc.result()
+
+def aggregate_store(store):
+    """Même agrégation depuis le store NetMob (séries x dates x slots) : une somme sur l'axe des séries"""
+    values = np.zeros((len(store.dates), store.n_slots), dtype=np.float64)
+    for s in range(len(store)):
+        values += np.nan_to_num(store.values[s], nan=0.0)
+    present = np.asarray(store.mask).any(axis=0)
+    return [d for d, p in zip(store.dates, present) if p], values[present]
+
 def load_txt_data():
     print(f"\n Recherche .txt dans {TXT_DIR_PATH}...")
-    files = glob.glob(os.path.join(TXT_DIR_PATH, '**/*.txt'), recursive=True)
+    files = list_txt_files()
     
     if not files:
         print(" Erreur : Aucun fichier .txt trouvé.")
         return None
 
-    # Limite pour éviter d'attendre trop longtemps pendant le test
-    MAX_FILES_TEST = 10000
-    if len(files) > MAX_FILES_TEST:
-        print(f"  Mode Test : Chargement des {MAX_FILES_TEST} premiers fichiers seulement.")
-        files = files[:MAX_FILES_TEST]
+    cache_file = cache_path(files)
+    if os.path.exists(cache_file):
+        print(f" Cache : {cache_file}")
+        cached = np.load(cache_file)
+        dates, values = list(cached['dates']), cached['values']
+    else:
+        store = netmob_store.open_store(TXT_DIR_PATH) if netmob_store else None
+        if store is not None:
+            print(f" Agrégation depuis le store : {store.store_dir}")
+            dates, values = aggregate_store(store)
+        else:
+            n_workers = os.cpu_count() or 1
+            n_shards = min(len(files), n_workers * 4)
+            shard_size = -(-len(files) // n_shards)
+            shards = [files[i:i + shard_size] for i in range(0, len(files), shard_size)]
+            print(f" Agrégation de {len(files)} fichiers ({n_workers} processus)...")
 
-    aggregated_df = None
-    print(f" Fusion de {len(files)} fichiers...")
+            acc = DateAccumulator()
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                for i, (shard_dates, shard_values) in enumerate(pool.map(aggregate_shard, shards)):
+                    if shard_dates:
+                        acc.add(shard_dates, shard_values)
+                    print(f"   ... {i + 1}/{len(shards)} lots traités", end='\r')
+            print()
+            dates, values = acc.result()
 
-    for i, file in enumerate(files):
-        try:
-            # Lecture flexible (sépare par espace ou tabulation)
-            df_temp = pd.read_csv(file, sep=r'\s+', header=None, engine='python')
-            
-            # On suppose: Col 0 = Date (YYYYMMDD), Col 1+ = Trafic
-            df_temp.rename(columns={0: 'Date'}, inplace=True)
-            df_temp['Date'] = df_temp['Date'].astype(str)
-            
-            # Agrégation par date
-            df_grouped = df_temp.groupby('Date').sum()
-
-            if aggregated_df is None:
-                aggregated_df = df_grouped
-            else:
-                aggregated_df = aggregated_df.add(df_grouped, fill_value=0)
-                
-        except Exception:
-            pass # On ignore les fichiers illisibles
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.savez(cache_file, dates=np.asarray(dates), values=values)
 
+    # Col 0 = Date (YYYYMMDD), Col 1+ = Trafic
+    aggregated_df = pd.DataFrame(values, index=pd.Index(dates, name='Date'), columns=range(1, values.shape[1] + 1))
+    totals = aggregated_df.sum(axis=1)
     print(f" Terminé. Forme : {aggregated_df.shape}")
+    print(f" Trafic total par date : min {totals.min():.0f} ({totals.idxmin()}), max {totals.max():.0f} ({totals.idxmax()})")
     return aggregated_df
 
 def load_csv_data():
@@ -0,0 +1,58 @@
+import numpy as np
+
+import data_visualisation as dv
+
+
+class TestClass:
+    def test_date_accumulator(self):
+        acc = dv.DateAccumulator(n_dates=2, n_slots=2)
+        acc.add(['d1', 'd2'], np.array([[1, 2], [3, 4]], dtype=np.float64))
+        # nouvelles dates et bloc plus large : le tableau est agrandi
+        acc.add(['d3', 'd1', 'd4'], np.array([[1, 1, 1], [10, 10, 10], [5, 5, 5]], dtype=np.float64))
+
+        dates, values = acc.result()
+        assert dates == ['d1', 'd2', 'd3', 'd4']
+        assert values.tolist() == [[11, 12, 10], [3, 4, 0], [1, 1, 1], [5, 5, 5]]
+
+    def test_date_accumulator_repeated_dates(self):
+        acc = dv.DateAccumulator()
+        acc.add(['d1', 'd1', 'd2', 'd1'], np.ones((4, 3)))
+
+        dates, values = acc.result()
+        assert dates == ['d1', 'd2']
+        # 96 quarts d'heure par défaut, non remplis ici
+        assert values.shape == (2, 96)
+        assert values[:, :3].tolist() == [[3, 3, 3], [1, 1, 1]]
+        assert (values[:, 3:] == 0).all()
+
+    def test_parse_txt_file(self, tmp_path):
+        path = tmp_path / 'Tile_1.txt'
+        path.write_text('2019-03-16 1 2 nan\n2019-03-17 4 abc 6 7\n\nseul\n')
+
+        dates, block = dv.parse_txt_file(str(path))
+        assert dates == ['2019-03-16', '2019-03-17']
+        # 'nan' et valeurs illisibles comptent pour 0, lignes courtes complétées par 0
+        assert block.tolist() == [[1, 2, 0, 0], [4, 0, 6, 7]]
+
+    def test_aggregate_shard(self, tmp_path):
+        (tmp_path / 'Tile_1.txt').write_text('2019-03-16 1 2 nan\n')
+        (tmp_path / 'Tile_2.txt').write_text('2019-03-16 1 1 1\n2019-03-17 2 2 2\n')
+
+        dates, values = dv.aggregate_shard([str(tmp_path / 'Tile_1.txt'), str(tmp_path / 'Tile_2.txt'),
+                                            str(tmp_path / 'absent.txt')])
+        assert dates == ['2019-03-16', '2019-03-17']
+        assert values[:, :3].tolist() == [[2, 3, 1], [2, 2, 2]]
+        assert (values[:, 3:] == 0).all()
+
+    def test_list_txt_files(self, tmp_path, monkeypatch):
+        for rel in ('Facebook/Facebook_DL_Tile_2.txt', 'Netflix/Tile_1.txt', 'Anomalies_NetMob23.txt',
+                    'report.txt', 'Lyon.geojson.txt', '_store/notes.txt'):
+            tmp_path.joinpath(*rel.split('/')).parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.joinpath(*rel.split('/')).write_text('2019-03-16 1 2 3\n')
+        monkeypatch.setattr(dv, 'TXT_DIR_PATH', str(tmp_path))
+        expected = [str(tmp_path / 'Facebook' / 'Facebook_DL_Tile_2.txt'), str(tmp_path / 'Netflix' / 'Tile_1.txt')]
+
+        # Anomalies et rapports ne sont pas agrégés comme des tuiles, avec ou sans netmob_store
+        assert dv.list_txt_files() == expected
+        monkeypatch.setattr(dv, 'netmob_store', None)
+        assert dv.list_txt_files() == expected
@@ -5,25 +5,66 @@ import datetime
 from collections import defaultdict
 import math
 import json
+try:
+    import netmob_store
+except ImportError:
+    netmob_store = None
 # À modifier si necessaire
 input_file = os.path.join(os.getcwd(), "faults_TraceAnomaly.csv")
 input_dirs = [
     "/data/facebook",
     "/data/netflix"
 ]
+# Racine NetMob23 complète (store colonnaire, voir netmob_store.py)
+netmob_dir = "/data/netmob23"
+# Surcharges (tests) : SIR_FLOW_DIRS (dossiers séparés par os.pathsep), SIR_NETMOB_DIR
+if os.environ.get("SIR_FLOW_DIRS"):
+    input_dirs = os.environ["SIR_FLOW_DIRS"].split(os.pathsep)
+netmob_dir = os.environ.get("SIR_NETMOB_DIR", netmob_dir)
 output_file = os.path.join(os.getcwd(), "merged_flows")
 
-with open(output_file, "w", encoding="utf-8") as fout:
-    for input_dir in input_dirs:  
-        for filename in os.listdir(input_dir):
-            if not filename.endswith(".txt"):
-                continue
 
+def list_flow_files():
+    """(dossier, fichier .txt) lus par la conversion, dans un ordre stable."""
+    return [(input_dir, filename)
+            for input_dir in input_dirs
+            for filename in sorted(os.listdir(input_dir))
+            if filename.endswith(".txt")]
+
+
+def flow_prefix(filename):
+    # Lấy phần số cuối cùng làm region_id
+    region_id = os.path.splitext(filename)[0].split("_")[-1]
+    application = os.path.splitext(filename)[0].split("_")[0]
+    return f"{application}_{region_id}"
+
+
+def store_series(store, flow_files):
+    """Série du store de chaque fichier (même sélection que la lecture texte), None s'il en manque une."""
+    # /data/facebook est monté depuis NetMob23/Facebook : "facebook/x.txt" -> "Facebook/x.txt"
+    by_file = {s['file'].lower(): i for i, s in enumerate(store.series)}
+    series = [by_file.get(f"{os.path.basename(d)}/{filename}".lower()) for d, filename in flow_files]
+    return None if None in series else series
+
+
+flow_files = list_flow_files()
+store = netmob_store.open_store(netmob_dir) if netmob_store and os.path.isdir(netmob_dir) else None
+series = store_series(store, flow_files) if store is not None else None
+
+with open(output_file, "w", encoding="utf-8") as fout:
+    if series is not None:
+        print("Lecture depuis le store :", store.store_dir)
+        for (_, filename), s in zip(flow_files, series):
+            prefix = flow_prefix(filename)
+            for _, date, vals in store.iter_rows([s]):
+                # Tokens du fichier source (float64 du store), comme la lecture texte
+                numbers = ['0' if x.lower() == 'nan' else x for x in store.tokens(s, date, vals)]
+                fout.write(f"{prefix}_{date}:" + ",".join(numbers) + "\n")
+    else:
+        for input_dir, filename in flow_files:
             input_path = os.path.join(input_dir, filename)
 
-            # Lấy phần số cuối cùng làm region_id
-            region_id = os.path.splitext(filename)[0].split("_")[-1]
-            application = os.path.splitext(filename)[0].split("_")[0]
+            prefix = flow_prefix(filename)
             with open(input_path, "r", encoding="utf-8") as f:
                 for line in f:
                     parts = line.strip().split()
@@ -32,7 +73,7 @@ with open(output_file, "w", encoding="utf-8") as fout:
                     date = parts[0]
                     parts = ['0' if x.lower() == 'nan' else x for x in parts]
                     numbers = parts[1:]
-                    flow_id = f"{application}_{region_id}_{date}"
+                    flow_id = f"{prefix}_{date}"
                     formatted = flow_id + ":" + ",".join(numbers)
                     fout.write(formatted + "\n")
 
@@ -10,6 +10,12 @@ import re
 import argparse
 import sys
 
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+try:
+    import netmob_store
+except ImportError:
+    netmob_store = None
+
 # CONFIGURATION
 config = configparser.ConfigParser()
 if os.path.exists('config.ini'):
@@ -138,7 +144,7 @@ def map_files_to_ids():
         print("="*50 + "\n")
     return mapping
 
-def process_anomaly(task, centroids, file_mapping):
+def process_anomaly(task, centroids, file_mapping, store=None):
     target_tile = task['tile_id']
     target_date = task['date']
     
@@ -162,7 +168,15 @@ def process_anomaly(task, centroids, file_mapping):
     for tid in neighbor_ids:
         if tid not in file_mapping: continue
         fpath = file_mapping[tid]
-        
+
+        if store is not None:
+            s = store.series_index(fpath)
+            row = store.row(s, target_date) if s is not None else None
+            if row is not None and len(row) > 0:
+                raw_data[f"tile_{tid}"] = np.nan_to_num(row, nan=0.0).tolist()
+                points_per_day = max(points_per_day, len(row))
+            continue
+
         try:
             with open(fpath, 'r', encoding='utf-8', errors='ignore') as f:
                 for line in f:
@@ -232,10 +246,14 @@ if __name__ == "__main__":
                 print(f"[STOP] Le fichier {target_file} est vide ou mal formaté (0 anomalies trouvées).")
                 sys.exit(0)
                 
+            store = netmob_store.open_store(INPUT_PATH) if netmob_store else None
+            if store is not None:
+                print(f"   > Lecture depuis le store : {store.store_dir}")
+
             count = 0
             print(f"   > Démarrage de la génération des matrices...")
             for task in tasks:
-                df = process_anomaly(task, centroids, file_mapping)
+                df = process_anomaly(task, centroids, file_mapping, store)
                 if df is not None:
                     save_output(df, task['date'], task['tile_id'])
                     count += 1
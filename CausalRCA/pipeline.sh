@@ -5,6 +5,15 @@ get_config() {
     python -c "import configparser; c=configparser.ConfigParser(); c.read('config.ini'); val=c.get('$1', '$2', fallback='$3'); print(val.lower())"
 }
 
+# Scripts Python : exécutés par le worker chaud du conteneur si main.py --warm (sir_worker.py)
+run_py() {
+    if [ -n "$SIR_WORKER_SOCKET" ]; then
+        python /opt/sir/sir_worker.py run "$@"
+    else
+        python "$@"
+    fi
+}
+
 echo "   STARTING CAUSAL RCA PIPELINE    "
 
 ANOMALY_FILENAME=$(get_config 'PATHS' 'anomalies_file' 'ANOMALY_REPORT.txt')
@@ -15,8 +24,13 @@ FORCE_CLEAN=$(get_config 'PIPELINE' 'force_clean' 'true')
 
 if [ "$FORCE_CLEAN" = "true" ]; then
     echo ">>> Mode nettoyage activé (via config.ini)."
-    echo "    Suppression des anciens fichiers .pkl, .json et .png..."
-    rm -f $DATA_DIR/anomaly_*.pkl
+    if [ "$SIR_STAGE_CACHED" = "1" ]; then
+        echo "    Datasets .pkl restaurés depuis le cache (main.py) : conservés."
+        echo "    Suppression des anciens fichiers .json et .png..."
+    else
+        echo "    Suppression des anciens fichiers .pkl, .json et .png..."
+        rm -f $DATA_DIR/anomaly_*.pkl
+    fi
     rm -f $DATA_DIR/anomaly_*.json
     rm -f $DATA_DIR/anomaly_*.png
     echo "    Dossier nettoyé."
@@ -34,7 +48,7 @@ if [ "$count_pkl" -gt 0 ]; then
 else
     echo ">>> Aucun dataset trouvé. Lancement de la conversion (génération des datasets)"
     if [ -f "$ANOMALY_FILE" ]; then
-        python convert_netmob_causalrca.py --anomalies_file "$ANOMALY_FILE"
+        run_py convert_netmob_causalrca.py --anomalies_file "$ANOMALY_FILE"
     else
         echo "ERREUR CRITIQUE: Fichier d'anomalies introuvable : $ANOMALY_FILE"
         exit 1
@@ -56,7 +70,7 @@ for pkl_file in $DATA_DIR/anomaly_*.pkl; do
     echo "------------------------------------------------"
     echo "Traitement de : $(basename "$pkl_file")"
     
-    python train_all_services.py \
+    run_py train_all_services.py \
         --data_file "$pkl_file" \
         --epochs $EPOCHS \
         --eta $ETA \
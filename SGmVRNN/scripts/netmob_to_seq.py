@@ -1,33 +1,45 @@
-import os, glob, argparse
+import os, sys, glob, argparse
 import numpy as np
 import torch
 
-def read_tile_txt(path: str):
+sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")))
+try:
+    import netmob_store
+except ImportError:
+    netmob_store = None
+
+def read_tile_txt(path: str, store=None):
     # Each line: YYYYMMDD v1 v2 ... v96 (97 fields total)
     # Some lines may end with 'nan'
-    dates = []
-    rows = []
-    with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split()  # space-separated
-            if len(parts) < 2:
-                continue
-            dates.append(parts[0])
-            vals = []
-            for x in parts[1:]:
-                if x.lower() == "nan":
-                    vals.append(np.nan)
-                else:
-                    try:
-                        vals.append(float(x))
-                    except:
+    s = store.series_index(path) if store is not None else None
+    if s is not None:
+        # columnar store (netmob_store.py): rows already parsed, NaN kept
+        _, values, lengths = store.tile(s)
+        X = np.array(values[:, :lengths.max(initial=0)], dtype=np.float32)
+    else:
+        dates = []
+        rows = []
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                parts = line.split()  # space-separated
+                if len(parts) < 2:
+                    continue
+                dates.append(parts[0])
+                vals = []
+                for x in parts[1:]:
+                    if x.lower() == "nan":
                         vals.append(np.nan)
-            rows.append(vals)
-
-    X = np.array(rows, dtype=np.float32)  # shape (T, n)
+                    else:
+                        try:
+                            vals.append(float(x))
+                        except:
+                            vals.append(np.nan)
+                rows.append(vals)
+
+        X = np.array(rows, dtype=np.float32)  # shape (T, n)
     # Fix NaNs: forward fill per feature, then 0
     # forward-fill
     for j in range(X.shape[1]):
@@ -103,8 +115,15 @@ def main():
     ap.add_argument("--l", type=int, default=10)
     ap.add_argument("--T", type=int, default=20)
     ap.add_argument("--start_id", type=int, default=1)
+    ap.add_argument("--data_dir", default="", help="NetMob23 root holding the _store/ built by netmob_store.py (optional)")
     args = ap.parse_args()
 
+    store = None
+    if args.data_dir and netmob_store is not None:
+        store = netmob_store.open_store(args.data_dir)
+        if store is not None:
+            print(f"Reading from store: {store.store_dir}")
+
     files = sorted(glob.glob(args.input_glob))
     if args.max_files and args.max_files > 0:
         files = files[:args.max_files]
@@ -113,7 +132,7 @@ def main():
     total_samples = 0
 
     for idx, fp in enumerate(files, 1):
-        ts, lab, X = read_tile_txt(fp)
+        ts, lab, X = read_tile_txt(fp, store)
 
         # Sanity: expect 97 fields -> 96 features
         if X.shape[1] != 96:
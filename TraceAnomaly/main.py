@@ -1,5 +1,7 @@
-import subprocess
+import os
 import sys
+import argparse
+import subprocess
 
 def run_command(command, description):
     print(f"--- En cours: {description} ---")
@@ -11,13 +13,43 @@ def run_command(command, description):
         print(f"Error at '{description}': {e}")
         sys.exit(1) # Dừng toàn bộ nếu một bước bị lỗi
 
+# Modèle sauvegardé par l'entraînement (-c flow_type=rnvp, --outputpath result)
+MODEL_DIR = os.path.join("webankdata", "md_rnvp_result.model")
+SCORE_COMMAND = ("python -m traceanomaly.score --inputpath ./merged_flows "
+                 f"--modelpath {MODEL_DIR} --outputpath result")
+# Graphe figé par traceanomaly.export (sans tfsnippet), utilisé s'il est plus récent que le checkpoint
+FROZEN_GRAPH = os.path.join(MODEL_DIR, "frozen")
+FROZEN_SCORE_COMMAND = ("python -m traceanomaly.frozen_score --inputpath ./merged_flows "
+                        f"--graphpath {FROZEN_GRAPH} --outputpath result")
+
+
+def frozen_graph_is_current():
+    graph_file = FROZEN_GRAPH + ".pb"
+    checkpoint = os.path.join(MODEL_DIR, "latest")
+    return os.path.exists(graph_file) and os.path.exists(FROZEN_GRAPH + ".json") and \
+        (not os.path.exists(checkpoint) or os.path.getmtime(graph_file) >= os.path.getmtime(checkpoint))
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Pipeline TraceAnomaly")
+    parser.add_argument("--score", action="store_true",
+                        help="Scoring seul avec le modèle sauvegardé (pas de réentraînement)")
+    args = parser.parse_args()
+    if args.score and not os.path.exists(os.path.join(MODEL_DIR, "config.json")):
+        print(f"Aucun modèle sauvegardé dans {MODEL_DIR} : entraînement complet.")
+        args.score = False
+
     # Bước 1: Chạy file a.py
-    run_command("python traitementdata.py", "Execution traitementdata.py")
+    # merged_flows binaire (merged_flows.npy + merged_flows.ids.npy), relu en memmap par le conteneur
+    run_command("python traitementdata.py --format npy", "Execution traitementdata.py")
 
     # Bước 2: Chạy Docker Compose
     # Lệnh này sẽ chạy container và đợi nó kết thúc (run)
-    run_command("docker compose run --rm --build traceanomaly", "Execution Docker Compose")
+    if args.score:
+        command = FROZEN_SCORE_COMMAND if frozen_graph_is_current() else SCORE_COMMAND
+        run_command(f"docker compose run --rm --build traceanomaly {command}", "Scoring Docker Compose")
+    else:
+        run_command("docker compose run --rm --build traceanomaly", "Execution Docker Compose")
 
     # Bước 3: Chạy file detection_anomaly.py
     run_command("python detection_anomaly.py", "Execution file detectionanomaly.py")
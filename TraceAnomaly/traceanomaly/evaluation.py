@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Batched scoring with a batch size derived from the available memory.
+
+The scoring graphs take batches of any size, and the `test_n_z` samples of
+every flow of a batch are evaluated by one `session.run`.  Feeding many
+`test_batch_size` batches at once thus removes most of the per-run overhead;
+the scores are written into a preallocated array instead of concatenating
+per-batch lists (`collect_outputs`).
+
+Only numpy is imported, so that `frozen_score` stays free of tfsnippet.
+"""
+import numpy as np
+
+HIDDEN_UNITS = 500       # dense layers of q_net / p_net / coupling layers
+ACTIVATION_COPIES = 3    # activations kept alive by the runtime (outputs, temporaries)
+MAX_SCORING_BATCH = 65536
+
+
+def available_memory():
+    """Available RAM (bytes), None if unknown."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def flow_hidden_units(flow_type, n_rnvp_layers, n_rnvp_hidden_layers):
+    """Hidden units evaluated per z sample by the posterior flow."""
+    if flow_type == 'rnvp':
+        return n_rnvp_layers * n_rnvp_hidden_layers * HIDDEN_UNITS
+    return 0
+
+
+def scoring_batch_size(n_z, x_dim, z_dim, flow_units=0, min_batch=1,
+                       memory_fraction=0.25):
+    """
+    Number of flows scored per session run.
+
+    The float32 activations of one flow are its q_net features plus, for each
+    of the `n_z` samples, the p_net features, the mean / std of x and the flow
+    layers.  `memory_fraction` of the available RAM is used; a fraction of 0
+    (or an unknown RAM) keeps `min_batch`.
+    """
+    memory = available_memory()
+    if not memory_fraction or not memory:
+        return min_batch
+    per_sample = 2 * HIDDEN_UNITS + 4 * x_dim + 4 * z_dim + flow_units
+    per_flow = 4 * ACTIVATION_COPIES * (2 * HIDDEN_UNITS + x_dim + n_z * per_sample)
+    batch = int(memory * memory_fraction // per_flow)
+    return int(min(MAX_SCORING_BATCH, max(min_batch, batch)))
+
+
+def collect_scores(session, output, input_x, x, batch_size):
+    """Run `output` over `x` by batches of `batch_size`, into one float32 array."""
+    scores = np.empty(len(x), dtype=np.float32)
+    for start in range(0, len(x), batch_size):
+        scores[start:start + batch_size] = session.run(
+            output, {input_x: x[start:start + batch_size]})
+    return scores
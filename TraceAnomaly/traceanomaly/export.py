@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Export a saved model as a frozen GraphDef for `traceanomaly.frozen_score`.
+
+Only the scoring graph is kept (`input_x` -> `scores`, the log-likelihood
+divided by `x_dim`), with the variables folded into constants.  The number
+of z samples is fixed at export time by `-c test_n_z=...`::
+
+    python -m traceanomaly.export --modelpath webankdata/md_rnvp_result.model \
+        -c test_n_z=10
+
+writes `frozen.pb` and `frozen.json` (tensor names, normalization statistics
+and config) in the model directory.
+"""
+import os, json
+import click
+import tensorflow as tf
+
+import tfsnippet as spt
+from .readdata import load_normalization
+from .evaluation import flow_hidden_units
+from .MLConfig import global_config as config, config_options
+from .main import ExpConfig
+from .score import load_model_config, build_scoring_graph, restore_model
+
+
+def frozen_files(path):
+    """GraphDef and its metadata: `frozen.pb` / `frozen.json`"""
+    return path + '.pb', path + '.json'
+
+
+@click.command()
+@click.option('--modelpath', help='The model directory saved by the training',
+              metavar='PATH', required=True, type=str)
+@click.option('--exportpath', help='Frozen graph path, without extension '
+              '(default: <modelpath>/frozen)', metavar='PATH', default=None,
+              type=str)
+@config_options(ExpConfig)
+def main(modelpath, exportpath):
+    spt.utils.set_assertion_enabled(False)
+    load_model_config(modelpath)
+    graph_file, meta_file = frozen_files(
+        exportpath or os.path.join(modelpath, 'frozen'))
+
+    input_x, scores = build_scoring_graph()
+    with spt.utils.create_session().as_default() as session:
+        restore_model(modelpath)
+        # keeps only the nodes `scores` depends on, variables as constants
+        graph_def = tf.graph_util.convert_variables_to_constants(
+            session, session.graph.as_graph_def(), [scores.op.name])
+
+    tmp = graph_file + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(graph_def.SerializeToString())
+    os.replace(tmp, graph_file)
+
+    valid_columns, mean, std = load_normalization(
+        os.path.join(modelpath, 'normalization.json'))
+    with open(meta_file, 'w') as f:
+        json.dump({
+            'input': input_x.name,
+            'output': scores.name,
+            'x_dim': config.x_dim,
+            'z_dim': config.z_dim,
+            'test_n_z': config.test_n_z,
+            'flow_units': flow_hidden_units(config.flow_type,
+                                            config.n_rnvp_layers,
+                                            config.n_rnvp_hidden_layers),
+            'flow_type': config.flow_type,
+            'valid_columns': valid_columns,
+            'mean': mean,
+            'std': std,
+        }, f)
+    print('frozen graph: %s (%d nodes, test_n_z=%d)' %
+          (graph_file, len(graph_def.node), config.test_n_z))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Score flows with a graph frozen by `traceanomaly.export`.
+
+No graph is built and tfsnippet is not imported: the GraphDef is loaded as
+is and fed batch by batch::
+
+    python -m traceanomaly.frozen_score --inputpath ./merged_flows \
+        --graphpath webankdata/md_rnvp_result.model/frozen --outputpath result
+"""
+import os, time, json
+import click
+import pandas as pd
+import tensorflow as tf
+
+from .readdata import read_raw_vector, normalization
+from .evaluation import scoring_batch_size, collect_scores
+
+
+def load_frozen_graph(graph_file):
+    graph_def = tf.GraphDef()
+    with open(graph_file, 'rb') as f:
+        graph_def.ParseFromString(f.read())
+    graph = tf.Graph()
+    with graph.as_default():
+        tf.import_graph_def(graph_def, name='')
+    return graph
+
+
+@click.command()
+@click.option('--inputpath', help='The path of the flows to score',
+              metavar='PATH', required=True, type=str)
+@click.option('--graphpath', help='Frozen graph path, without extension',
+              metavar='PATH', required=True, type=str)
+@click.option('--outputpath',
+              help='The name of answers. it is relative to webankdata. just name',
+              metavar='PATH',
+              required=True, type=str)
+@click.option('--batchsize', help='Flows per session run '
+              '(default: sized from the available RAM)', default=0, type=int)
+def main(inputpath, graphpath, outputpath, batchsize):
+    with open(graphpath + '.json', 'r') as f:
+        meta = json.load(f)
+    output_file = os.path.join('webankdata',
+                               '{}_{}.csv'.format(meta['flow_type'] or 'vae',
+                                                  outputpath))
+
+    flows, raw, _ = read_raw_vector(inputpath, meta['valid_columns'],
+                                    shuffle=False)
+    x = normalization(raw, meta['mean'], meta['std'])
+    print('%s for test, test_n_z=%s' % (x.shape[0], meta['test_n_z']))
+
+    graph = load_frozen_graph(graphpath + '.pb')
+    input_x = graph.get_tensor_by_name(meta['input'])
+    scores = graph.get_tensor_by_name(meta['output'])
+
+    if batchsize <= 0:
+        batchsize = scoring_batch_size(meta['test_n_z'], meta['x_dim'],
+                                       meta.get('z_dim', 10),
+                                       meta.get('flow_units', 0), 256)
+    print('scoring batch size: %s' % batchsize)
+
+    with tf.Session(graph=graph) as session:
+        start = time.time()
+        ans = collect_scores(session, scores, input_x, x, batchsize)
+        print("test time: ", time.time() - start)
+
+    pd.DataFrame({'id': flows, 'score': ans}).to_csv(output_file, index=False)
+
+
+if __name__ == '__main__':
+    main()
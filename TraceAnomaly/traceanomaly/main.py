@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import functools
 
-import os, time
+import os, time, json
 import click
 import tensorflow as tf
 import pandas as pd
@@ -9,9 +9,10 @@ from tensorflow.contrib.framework import arg_scope, add_arg_scope
 from sklearn.model_selection import train_test_split
 
 import tfsnippet as spt
-from tfsnippet.examples.utils import (print_with_title,
-                                      collect_outputs)
-from .readdata import get_data_vae, get_z_dim
+from tfsnippet.examples.utils import print_with_title
+from .readdata import (get_data_vae, get_z_dim, pending_normalization,
+                       commit_normalization)
+from .evaluation import scoring_batch_size, flow_hidden_units, collect_scores
 from .MLConfig import (MLConfig,
                        global_config as config,
                        config_options)
@@ -51,6 +52,8 @@ class ExpConfig(MLConfig):
     # evaluation parameters
     test_n_z = 2
     test_batch_size = 15
+    test_memory_fraction = 0.25  # part of the available RAM used by a scoring
+                                 # batch (0: batches of test_batch_size)
 
     norm_clip = 10
 
@@ -126,6 +129,57 @@ def coupling_layer_shift_and_scale(x1, n2):
     return shift, scale
 
 
+def build_posterior_flow(initialized=False):
+    """
+    Build the posterior flow selected by `config.flow_type`.
+
+    With `initialized=True` the ActNorm layers use their (restored) variables
+    instead of being initialized from the first batch, as in `score.py`.
+    """
+    if config.flow_type is None:
+        return None
+    elif config.flow_type == 'planar_nf':
+        return spt.layers.planar_normalizing_flows(config.n_planar_nf_layers)
+    else:
+        assert(config.flow_type == 'rnvp')
+        with tf.variable_scope('posterior_flow'):
+            flows = []
+            for i in range(config.n_rnvp_layers):
+                flows.append(spt.layers.ActNorm(initialized=initialized))
+                flows.append(spt.layers.CouplingLayer(
+                    tf.make_template(
+                        'coupling',
+                        coupling_layer_shift_and_scale,
+                        create_scope_now_=True
+                    ),
+                    scale_type='sigmoid'
+                ))
+                flows.append(spt.layers.InvertibleDense(strict_invertible=True))
+            return spt.layers.SequentialFlow(flows=flows)
+
+
+def get_scoring_batch_size():
+    """Flows scored per session run, from the config and the available RAM."""
+    return scoring_batch_size(
+        config.test_n_z, config.x_dim, config.z_dim,
+        flow_hidden_units(config.flow_type, config.n_rnvp_layers,
+                          config.n_rnvp_hidden_layers),
+        config.test_batch_size, config.test_memory_fraction)
+
+
+def model_files(outputpath):
+    """Model directory, with the normalization stats and config saved in it."""
+    model_name = os.path.join(
+        'webankdata',
+        'md_{}_{}.model'.format(
+            config.flow_type or 'vae',
+            outputpath.split('.')[0]
+        )
+    )
+    return (model_name, os.path.join(model_name, 'normalization.json'),
+            os.path.join(model_name, 'config.json'))
+
+
 @click.command()
 @click.option('--trainpath', help='The path of train data', metavar='PATH',
               required=True, type=str)
@@ -137,8 +191,10 @@ def coupling_layer_shift_and_scale(x1, n2):
               help='The name of answers. it is relative to webankdata. just name',
               metavar='PATH',
               required=True, type=str)
+@click.option('--restore', is_flag=True, default=False,
+              help='Restore the saved model (if any) instead of training')
 @config_options(ExpConfig)
-def main(trainpath, normalpath, abnormalpath, outputpath):
+def main(trainpath, normalpath, abnormalpath, outputpath, restore):
     if config.debug_level == -1:
         spt.utils.set_assertion_enabled(False)
     elif config.debug_level == 1:
@@ -159,10 +215,20 @@ def main(trainpath, normalpath, abnormalpath, outputpath):
                               'v{}_{}.csv'.format(config.flow_type or 'vae',
                                                   outputpath))
     # you can change it by yourself
-
-    # read data
+    model_name, stats_file, config_file = model_files(outputpath)
+    # config.json is written once the checkpoint is saved: a model directory
+    # without it holds no complete model
+    restore = restore and os.path.exists(config_file)
+
+    # read data; a restored model is fed with the columns and statistics it
+    # was trained with (a model saved without them gets the current ones).
+    # New statistics stay pending until the model is saved.
+    restore_stats = restore and os.path.exists(stats_file)
     (x_train, y_train), (x_test, y_test), flows_test = \
-        get_data_vae(train_file, normal_file, abnormal_file)
+        get_data_vae(train_file, normal_file, abnormal_file,
+                     stats_file if restore_stats else
+                     pending_normalization(stats_file),
+                     restore=restore_stats)
     config.x_dim = x_train.shape[1]
     #config.z_dim = get_z_dim(x_train.shape[1])
 
@@ -189,27 +255,7 @@ def main(trainpath, normalpath, abnormalpath, outputpath):
         'learning_rate', config.initial_lr, config.lr_anneal_factor)
 
     # build the posterior flow
-    if config.flow_type is None:
-        posterior_flow = None
-    elif config.flow_type == 'planar_nf':
-        posterior_flow = \
-            spt.layers.planar_normalizing_flows(config.n_planar_nf_layers)
-    else:
-        assert(config.flow_type == 'rnvp')
-        with tf.variable_scope('posterior_flow'):
-            flows = []
-            for i in range(config.n_rnvp_layers):
-                flows.append(spt.layers.ActNorm())
-                flows.append(spt.layers.CouplingLayer(
-                    tf.make_template(
-                        'coupling',
-                        coupling_layer_shift_and_scale,
-                        create_scope_now_=True
-                    ),
-                    scale_type='sigmoid'
-                ))
-                flows.append(spt.layers.InvertibleDense(strict_invertible=True))
-            posterior_flow = spt.layers.SequentialFlow(flows=flows)
+    posterior_flow = build_posterior_flow()
 
     # derive the initialization op
     with tf.name_scope('initialization'), \
@@ -260,24 +306,11 @@ def main(trainpath, normalpath, abnormalpath, outputpath):
                                      skip_incomplete=True)
     valid_flow = spt.DataFlow.arrays([x_valid],
                                      config.test_batch_size)
-    test_flow = spt.DataFlow.arrays([x_test],
-                                    config.test_batch_size)
-
-    # model_file
-    #model_name = ''
-    model_name = os.path.join(
-        'webankdata',
-        'md_{}_{}.model'.format(
-            config.flow_type or 'vae',
-            outputpath.split('.')[0]
-        )
-    )
 
     with spt.utils.create_session().as_default() as session:
         var_dict = spt.utils.get_variables_as_dict()
         saver = spt.VariableSaver(var_dict, model_name)
-        #if os.path.exists(model_name):
-        if False:
+        if restore:
             print('%s exists' % model_name)
             saver.restore()
         else:
@@ -319,20 +352,26 @@ def main(trainpath, normalpath, abnormalpath, outputpath):
                 trainer.log_after_epochs(freq=1)
                 trainer.run()
             saver.save()
+            # model config, read back by score.py to rebuild the graph
+            with open(config_file, 'w') as f:
+                json.dump(config.to_dict(), f, indent=2)
+        commit_normalization(stats_file)
 
         # get the answer
         print('start testing')
         start = time.time()
-        test_ans = collect_outputs([test_logp], [input_x], test_flow)[0] \
-            / config.x_dim
+        scoring_batch = get_scoring_batch_size()
+        print('scoring batch size: %s' % scoring_batch)
+        test_ans = collect_scores(session, test_logp, input_x, x_test,
+                                  scoring_batch) / config.x_dim
         end = time.time()
         print("test time: ", end-start)
         
         pd.DataFrame(
             {'id': flows_test, 'label': y_test, 'score': test_ans}) \
             .to_csv(output_file, index=False)
-        valid_ans = collect_outputs([test_logp], [input_x], valid_flow)[0] \
-            / config.x_dim
+        valid_ans = collect_scores(session, test_logp, input_x, x_valid,
+                                   scoring_batch) / config.x_dim
         pd.DataFrame({'score': valid_ans}).to_csv(valid_file, index=False)
 
 
@@ -1,45 +1,77 @@
-import numpy as np
+import os
+import json
 import random
 
+import numpy as np
+
+
+CHUNK_ROWS = 65536  # lignes par bloc pour les réductions par colonne
+
+
+def flow_cache_files(input_file):
+    """Matrice float32 et ids parsés, rangés à côté du fichier texte."""
+    return input_file + '.npy', input_file + '.ids.npy'
+
+
+def parse_flow_file(input_file):
+    """Fichier 'id:v1,v2,...' -> (ids, matrice float32), parsé par le lecteur C de pandas."""
+    import pandas as pd
+    df = pd.read_csv(input_file, header=None, sep=',', dtype={0: str}, skip_blank_lines=True)
+    # La première colonne contient 'id:v1'
+    first = df[0].str.split(':', n=1, expand=True)
+    ids = np.array(first[0].tolist(), dtype=str)
+    matrix = np.empty((len(df), df.shape[1]), dtype=np.float32)
+    matrix[:, 0] = first[1].astype(np.float32).values
+    matrix[:, 1:] = df.iloc[:, 1:].values
+    return ids, matrix
+
+
+def load_binary_flows(matrix_file, ids_file):
+    """Matrice ouverte en memmap (lecture seule) : les fichiers train/normal/abnormal partagent les pages."""
+    return np.load(ids_file).tolist(), np.load(matrix_file, mmap_mode='r')
+
+
+def load_flow_matrix(input_file, use_cache=True):
+    """
+    (flows, matrice float32) d'un fichier de flux, via le cache .npy s'il est à jour.
+
+    input_file peut aussi désigner la sortie binaire de traitementdata.py --format npy :
+    'merged_flows.npy' directement, ou 'merged_flows' quand seul le binaire existe.
+    """
+    if input_file.endswith('.npy'):
+        return load_binary_flows(input_file, input_file[:-len('.npy')] + '.ids.npy')
+    matrix_file, ids_file = flow_cache_files(input_file)
+    if os.path.exists(matrix_file) and os.path.exists(ids_file) and (
+            not os.path.exists(input_file)
+            or use_cache and os.path.getmtime(matrix_file) >= os.path.getmtime(input_file)):
+        return load_binary_flows(matrix_file, ids_file)
+
+    ids, matrix = parse_flow_file(input_file)
+    if use_cache:
+        try:
+            for path, arr in ((ids_file, ids), (matrix_file, matrix)):
+                tmp = path + '.tmp.npy'
+                np.save(tmp, arr)
+                os.replace(tmp, path)
+        except OSError as e:
+            print('cache non écrit pour %s : %s' % (input_file, e))
+    return ids.tolist(), matrix
+
 
 def read_raw_vector(input_file, vc=None, shuffle=True, sample=False):  # flows, vectors, valid_column
-    with open(input_file, 'r') as fin:
-        raw = fin.read().strip().split('\n')
-
-    flows = list()
-    vectors = list()
-    for line in raw:
-        if line.strip() == "":
-            continue
-        flows.append(line.split(':')[0])
-        vectors.append([float(x) for x in line.split(':')[1].split(',')])
-        
+    flows, vectors = load_flow_matrix(input_file)
+
     if shuffle is True:
         arr_index = np.arange(len(vectors))
         np.random.shuffle(arr_index)
-        shuffled_vectors = []
-        for index in arr_index:
-            shuffled_vectors.append(vectors[index])
-        vectors = shuffled_vectors
+        vectors = vectors[arr_index]
 
     if sample is True:
-        vectors = random.sample(vectors, 50000)
-    vectors = np.array(vectors)
-
-    n = len(vectors)
-    m = len(vectors[0])
+        vectors = vectors[random.sample(range(len(vectors)), 50000)]
 
     if vc is None:
-        valid_column = list()
-
-        for i in range(0, m):
-            flag = False
-            for j in range(0, n):
-                if vectors[j, i] > 0:
-                    flag = True
-                    break
-            if flag:
-                valid_column.append(i)
+        # Colonnes ayant au moins une valeur > 0
+        valid_column = np.flatnonzero((vectors > 0).any(axis=0)).tolist()
     else:
         valid_column = vc
 
@@ -48,13 +80,28 @@ def read_raw_vector(input_file, vc=None, shuffle=True, sample=False):  # flows,
 
 
 def get_mean_std(matrix):
-    mean = []
-    std = []
-    for item in np.transpose(matrix):
-        mean.append(np.mean(item[item>0.00001]))
-        std.append(max(1, np.std(item[item>0.00001])))
-    
-    return mean, std
+    """Moyenne / écart-type par colonne des valeurs > 0.00001 (écart-type au moins 1)."""
+    matrix = np.asarray(matrix)
+    m = matrix.shape[1]
+    count = np.zeros(m)
+    total = np.zeros(m)
+    for start in range(0, len(matrix), CHUNK_ROWS):
+        block = matrix[start:start + CHUNK_ROWS].astype(np.float64)
+        mask = block > 0.00001
+        count += mask.sum(axis=0)
+        total += np.where(mask, block, 0).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+    squares = np.zeros(m)
+    for start in range(0, len(matrix), CHUNK_ROWS):
+        block = matrix[start:start + CHUNK_ROWS].astype(np.float64)
+        mask = block > 0.00001
+        squares += (np.where(mask, block - mean, 0) ** 2).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt(squares / count)
+    # Colonne sans valeur : moyenne NaN, écart-type 1 (comme max(1, nan))
+    std = np.fmax(std, 1)
+    return mean.tolist(), std.tolist()
 
 
 def normalization(matrix, mean, std):
@@ -62,12 +109,54 @@ def normalization(matrix, mean, std):
     n_mat = np.where(n_mat<0.00001, -1, (n_mat - mean) / std)
     return n_mat
 
-def get_data_vae(train_file, normal_file, abnormal_file):
-    _, train_raw, valid_columns = read_raw_vector(train_file)
+def save_normalization(path, valid_columns, mean, std):
+    """Colonnes retenues et moyenne / écart-type du train, relus par le scoring (score.py)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'valid_columns': [int(c) for c in valid_columns],
+                   'mean': [float(v) for v in mean],
+                   'std': [float(v) for v in std]}, f)
+    os.replace(tmp, path)
+
+
+def pending_normalization(path):
+    """Statistiques d'un entraînement en cours, publiées par commit_normalization."""
+    return path + '.pending'
+
+
+def commit_normalization(path):
+    """Publie les statistiques en attente une fois le modèle sauvegardé. True si publiées."""
+    pending = pending_normalization(path)
+    if not os.path.exists(pending):
+        return False
+    os.replace(pending, path)
+    return True
+
+
+def load_normalization(path):
+    with open(path, 'r') as f:
+        stats = json.load(f)
+    return stats['valid_columns'], stats['mean'], stats['std']
+
+
+def get_data_vae(train_file, normal_file, abnormal_file, stats_file=None, restore=False):
+    """
+    Train / test normalisés avec les statistiques du train, sauvegardées dans stats_file.
+    restore=True : colonnes et statistiques relues dans stats_file (modèle restauré), comme get_data_score.
+    """
+    if restore:
+        valid_columns, train_mean, train_std = load_normalization(stats_file)
+        _, train_raw, _ = read_raw_vector(train_file, valid_columns)
+    else:
+        _, train_raw, valid_columns = read_raw_vector(train_file)
     flows1, normal_raw, _ = read_raw_vector(normal_file, valid_columns, shuffle=False)
     flows2, abnormal_raw, _ = read_raw_vector(abnormal_file, valid_columns, shuffle=False)
 
-    train_mean, train_std = get_mean_std(train_raw)
+    if not restore:
+        train_mean, train_std = get_mean_std(train_raw)
+        if stats_file is not None:
+            save_normalization(stats_file, valid_columns, train_mean, train_std)
     train_x = normalization(train_raw, train_mean, train_std)
     normal_x = normalization(normal_raw, train_mean, train_std)
     abnormal_x = normalization(abnormal_raw, train_mean, train_std)
@@ -87,6 +176,13 @@ def get_data_vae(train_file, normal_file, abnormal_file):
     return (train_x, train_y), (test_x, test_y), test_flow
 
 
+def get_data_score(input_file, stats_file):
+    """Flux à scorer, normalisés avec les statistiques sauvegardées à l'entraînement."""
+    valid_columns, mean, std = load_normalization(stats_file)
+    flows, raw, _ = read_raw_vector(input_file, valid_columns, shuffle=False)
+    return normalization(raw, mean, std), flows
+
+
 def get_z_dim(x_dim):
     tmp = x_dim
     z_dim = 5
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Score new flows with a model saved by `traceanomaly.main`, without training.
+
+The checkpoint, the normalization statistics and the model config are read
+from the model directory (e.g. `webankdata/md_rnvp_result.model`)::
+
+    python -m traceanomaly.score --inputpath ./merged_flows \
+        --modelpath webankdata/md_rnvp_result.model --outputpath result
+"""
+import os, time, json
+import click
+import tensorflow as tf
+import pandas as pd
+
+import tfsnippet as spt
+from tfsnippet.examples.utils import print_with_title
+from .readdata import get_data_score
+from .evaluation import collect_scores
+from .MLConfig import global_config as config, config_options
+from .main import (ExpConfig, q_net, p_net, build_posterior_flow,
+                   get_scoring_batch_size)
+
+# config keys which define the graph, taken from the saved model
+MODEL_KEYS = ('z_dim', 'x_dim', 'flow_type', 'n_planar_nf_layers',
+              'n_rnvp_layers', 'n_rnvp_hidden_layers')
+
+
+def load_model_config(modelpath):
+    """Apply the graph-defining keys of the saved model config."""
+    with open(os.path.join(modelpath, 'config.json'), 'r') as f:
+        saved = json.load(f)
+    config.parse_dict({k: saved[k] for k in MODEL_KEYS if k in saved})
+
+
+def build_scoring_graph():
+    """
+    Testing graph only, the variables being restored rather than initialized.
+
+    Returns the `input_x` placeholder and the per-flow log-likelihood scores
+    (`is_loglikelihood / x_dim`), with `config.test_n_z` samples of z.
+    """
+    input_x = tf.placeholder(
+        dtype=tf.float32, shape=(None, config.x_dim), name='input_x')
+    posterior_flow = build_posterior_flow(initialized=True)
+    with tf.name_scope('testing'):
+        test_q_net = q_net(input_x, posterior_flow, n_z=config.test_n_z)
+        test_chain = test_q_net.chain(
+            p_net, latent_axis=0, observed={'x': input_x})
+        test_logp = test_chain.vi.evaluation.is_loglikelihood()
+    scores = tf.identity(test_logp / config.x_dim, name='scores')
+    return input_x, scores
+
+
+def restore_model(modelpath):
+    # the checkpoint also holds the optimizer variables, which are not
+    # part of this graph and are ignored
+    saver = spt.VariableSaver(spt.utils.get_variables_as_dict(), modelpath)
+    saver.restore()
+
+
+@click.command()
+@click.option('--inputpath', help='The path of the flows to score',
+              metavar='PATH', required=True, type=str)
+@click.option('--modelpath', help='The model directory saved by the training',
+              metavar='PATH', required=True, type=str)
+@click.option('--outputpath',
+              help='The name of answers. it is relative to webankdata. just name',
+              metavar='PATH',
+              required=True, type=str)
+@config_options(ExpConfig)
+def main(inputpath, modelpath, outputpath):
+    if config.debug_level == -1:
+        spt.utils.set_assertion_enabled(False)
+    elif config.debug_level == 1:
+        spt.utils.set_check_numerics(True)
+
+    load_model_config(modelpath)
+    print_with_title('Configurations', config.format_config(), after='\n')
+
+    output_file = os.path.join('webankdata',
+                               '{}_{}.csv'.format(config.flow_type or 'vae',
+                                                  outputpath))
+
+    # read data, normalized with the training statistics
+    x_test, flows_test = get_data_score(
+        inputpath, os.path.join(modelpath, 'normalization.json'))
+    assert(x_test.shape[1] == config.x_dim)
+    print('%s for test' % x_test.shape[0])
+
+    input_x, scores = build_scoring_graph()
+
+    with spt.utils.create_session().as_default() as session:
+        restore_model(modelpath)
+
+        print('start testing')
+        start = time.time()
+        scoring_batch = get_scoring_batch_size()
+        print('scoring batch size: %s' % scoring_batch)
+        test_ans = collect_scores(session, scores, input_x, x_test,
+                                  scoring_batch)
+        end = time.time()
+        print("test time: ", end-start)
+
+        pd.DataFrame({'id': flows_test, 'score': test_ans}) \
+            .to_csv(output_file, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+from . import evaluation
+import numpy as np
+
+
+class FakeSession:
+    """session.run(output, {input_x: batch}) -> sum of each row"""
+    def __init__(self):
+        self.batches = []
+
+    def run(self, output, feed_dict):
+        batch = feed_dict['x']
+        self.batches.append(len(batch))
+        return batch.sum(axis=1)
+
+
+class TestClass:
+    def test_scoring_batch_size(self, monkeypatch):
+        monkeypatch.setattr(evaluation, 'available_memory', lambda: 8 * 2 ** 30)
+        small = evaluation.scoring_batch_size(10, 100, 10)
+        large_z = evaluation.scoring_batch_size(100, 100, 10)
+        rnvp = evaluation.scoring_batch_size(
+            10, 100, 10, evaluation.flow_hidden_units('rnvp', 10, 1))
+
+        assert large_z < small
+        assert rnvp < small
+        # float32 activations of the whole batch within 1/4 of the RAM
+        per_sample = 2 * 500 + 4 * 100 + 4 * 10
+        per_flow = 4 * 3 * (2 * 500 + 100 + 10 * per_sample)
+        assert small == min(evaluation.MAX_SCORING_BATCH, 8 * 2 ** 30 // 4 // per_flow)
+
+    def test_scoring_batch_size_bounds(self, monkeypatch):
+        monkeypatch.setattr(evaluation, 'available_memory', lambda: 2 ** 40)
+        assert evaluation.scoring_batch_size(1, 10, 5) == evaluation.MAX_SCORING_BATCH
+
+        monkeypatch.setattr(evaluation, 'available_memory', lambda: 2 ** 20)
+        assert evaluation.scoring_batch_size(1000, 1000, 40, min_batch=256) == 256
+
+        # unknown RAM or zero fraction: min_batch
+        monkeypatch.setattr(evaluation, 'available_memory', lambda: None)
+        assert evaluation.scoring_batch_size(10, 100, 10, min_batch=64) == 64
+        monkeypatch.setattr(evaluation, 'available_memory', lambda: 8 * 2 ** 30)
+        assert evaluation.scoring_batch_size(10, 100, 10, min_batch=64,
+                                             memory_fraction=0) == 64
+
+    def test_flow_hidden_units(self):
+        assert evaluation.flow_hidden_units('rnvp', 10, 2) == 10 * 2 * 500
+        assert evaluation.flow_hidden_units('planar_nf', 10, 2) == 0
+        assert evaluation.flow_hidden_units(None, 10, 2) == 0
+
+    def test_collect_scores(self):
+        x = np.arange(21, dtype=np.float32).reshape(7, 3)
+        session = FakeSession()
+        scores = evaluation.collect_scores(session, 'scores', 'x', x, 3)
+
+        assert session.batches == [3, 3, 1]
+        assert scores.dtype == np.float32
+        assert (scores == x.sum(axis=1)).all()
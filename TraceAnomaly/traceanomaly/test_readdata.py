@@ -1,3 +1,5 @@
+import os
+
 from . import readdata
 import numpy as np
 
@@ -130,4 +132,132 @@ class TestClass:
         assert readdata.get_z_dim(x) == 20
 
         x = 500
-        assert readdata.get_z_dim(x) == 20
\ No newline at end of file
+        assert readdata.get_z_dim(x) == 20
+
+def write_flows(path, ids, matrix):
+    with open(path, 'w') as f:
+        for flow, row in zip(ids, matrix):
+            f.write(flow + ':' + ','.join(repr(float(v)) for v in row) + '\n')
+
+
+class TestFlowCache:
+    def test_cache_hit(self, tmp_path):
+        input_file = str(tmp_path / 'merged_flows')
+        write_flows(input_file, ['flow1', 'flow2'], [[1, 0, 2.5], [0, 3, 4]])
+
+        flows, matrix = readdata.load_flow_matrix(input_file)
+        matrix_file, ids_file = readdata.flow_cache_files(input_file)
+        assert flows == ['flow1', 'flow2']
+        assert matrix.dtype == np.float32
+        assert (matrix == [[1, 0, 2.5], [0, 3, 4]]).all()
+        assert os.path.exists(matrix_file) and os.path.exists(ids_file)
+
+        # le cache est plus récent que le texte : le texte n'est pas relu
+        write_flows(input_file, ['flow9'], [[9, 9, 9]])
+        mtime = os.path.getmtime(matrix_file)
+        os.utime(input_file, (mtime - 10, mtime - 10))
+        flows, matrix = readdata.load_flow_matrix(input_file)
+        assert flows == ['flow1', 'flow2']
+        assert isinstance(matrix, np.memmap)
+        assert (matrix == [[1, 0, 2.5], [0, 3, 4]]).all()
+
+    def test_stale_cache(self, tmp_path):
+        input_file = str(tmp_path / 'merged_flows')
+        write_flows(input_file, ['flow1'], [[1, 2]])
+        readdata.load_flow_matrix(input_file)
+        matrix_file, _ = readdata.flow_cache_files(input_file)
+
+        write_flows(input_file, ['flow2', 'flow3'], [[5, 0], [0, 7]])
+        mtime = os.path.getmtime(matrix_file)
+        os.utime(input_file, (mtime + 10, mtime + 10))
+        flows, matrix = readdata.load_flow_matrix(input_file)
+        assert flows == ['flow2', 'flow3']
+        assert (matrix == [[5, 0], [0, 7]]).all()
+        # cache réécrit
+        flows, matrix = readdata.load_binary_flows(*readdata.flow_cache_files(input_file))
+        assert flows == ['flow2', 'flow3']
+
+        # use_cache=False : texte toujours relu, cache non écrit
+        write_flows(input_file, ['flow4'], [[8, 8]])
+        os.utime(input_file, (mtime - 10, mtime - 10))
+        flows, _ = readdata.load_flow_matrix(input_file, use_cache=False)
+        assert flows == ['flow4']
+        assert readdata.load_binary_flows(*readdata.flow_cache_files(input_file))[0] == ['flow2', 'flow3']
+
+    def test_npy_input(self, tmp_path):
+        base = str(tmp_path / 'merged_flows')
+        matrix_file, ids_file = readdata.flow_cache_files(base)
+        np.save(matrix_file, np.array([[1, 0], [0, 2]], dtype=np.float32))
+        np.save(ids_file, np.array(['flow1', 'flow2']))
+
+        # sortie binaire de traitementdata.py : chemin .npy, ou nom seul sans texte
+        for input_file in (matrix_file, base):
+            flows, matrix = readdata.load_flow_matrix(input_file)
+            assert flows == ['flow1', 'flow2']
+            assert (matrix == [[1, 0], [0, 2]]).all()
+
+        flows, vecs, vc = readdata.read_raw_vector(matrix_file, shuffle=False)
+        assert flows == ['flow1', 'flow2']
+        assert vc == [0, 1]
+
+    def test_mean_std_parity(self, monkeypatch):
+        rng = np.random.RandomState(0)
+        matrix = rng.exponential(100, size=(1000, 6))
+        matrix[rng.rand(1000, 6) < 0.3] = 0
+        matrix[:, 4] = 0
+        matrix = matrix.astype(np.float32)
+
+        # calcul colonne par colonne d'origine
+        y_mean, y_std = [], []
+        for item in np.transpose(matrix.astype(np.float64)):
+            y_mean.append(np.mean(item[item > 0.00001]) if (item > 0.00001).any() else np.nan)
+            y_std.append(max(1, np.std(item[item > 0.00001])) if (item > 0.00001).any() else 1)
+
+        monkeypatch.setattr(readdata, 'CHUNK_ROWS', 64)
+        mean, std = readdata.get_mean_std(matrix)
+        assert np.isnan(mean[4]) and std[4] == 1
+        assert np.allclose(mean, y_mean, rtol=1e-9, equal_nan=True)
+        assert np.allclose(std, y_std, rtol=1e-9)
+
+
+class TestSavedNormalization:
+    def test_round_trip(self, tmp_path):
+        stats_file = str(tmp_path / 'model' / 'normalization.json')
+        readdata.save_normalization(stats_file, np.array([0, 2]), [1.5, np.float32(2)], [1, 3.25])
+        assert readdata.load_normalization(stats_file) == ([0, 2], [1.5, 2.0], [1, 3.25])
+
+    def test_pending(self, tmp_path):
+        stats_file = str(tmp_path / 'model' / 'normalization.json')
+        assert readdata.commit_normalization(stats_file) is False
+
+        # Entraînement en cours : rien n'est publié avant la sauvegarde du modèle
+        readdata.save_normalization(readdata.pending_normalization(stats_file), [0], [1.0], [2.0])
+        assert not os.path.exists(stats_file)
+        assert readdata.commit_normalization(stats_file) is True
+        assert readdata.load_normalization(stats_file) == ([0], [1.0], [2.0])
+        assert not os.path.exists(readdata.pending_normalization(stats_file))
+
+    def test_restore(self, tmp_path):
+        rng = np.random.RandomState(0)
+        files = {}
+        for name, n, scale in (('train', 40, 1), ('normal', 40, 1), ('abnormal', 40, 5), ('train2', 40, 10)):
+            matrix = rng.exponential(scale, size=(n, 4))
+            matrix[:, 3] = 0
+            files[name] = str(tmp_path / name)
+            write_flows(files[name], ['%s%d' % (name, i) for i in range(n)], matrix)
+        stats_file = str(tmp_path / 'normalization.json')
+
+        _, (x_test, _), _ = readdata.get_data_vae(
+            files['train'], files['normal'], files['abnormal'], stats_file)
+        saved = readdata.load_normalization(stats_file)
+        assert saved[0] == [0, 1, 2]
+
+        # --restore : statistiques relues, le nouveau train ne les change pas
+        _, (x_restored, _), _ = readdata.get_data_vae(
+            files['train2'], files['normal'], files['abnormal'], stats_file, restore=True)
+        assert (x_restored == x_test).all()
+        assert readdata.load_normalization(stats_file) == saved
+
+        # comme le scoring
+        x_score, _ = readdata.get_data_score(files['normal'], stats_file)
+        assert (x_score == x_test[:40]).all()
@@ -1,11 +1,31 @@
 import os
+import sys
 import glob
+import argparse
 
 # On se situe dans TraceAnomaly/, donc on remonte d'un cran pour trouver NetMob23
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-NETMOB_DIR = os.path.join(BASE_DIR, "..", "NetMob23")
+sys.path.insert(1, os.path.abspath(os.path.join(BASE_DIR, "..")))
+try:
+    import netmob_store
+except ImportError:
+    netmob_store = None
+
+# SIR_NETMOB_DIR : autre racine NetMob23 (tests)
+NETMOB_DIR = os.environ.get("SIR_NETMOB_DIR", os.path.join(BASE_DIR, "..", "NetMob23"))
 OUTPUT_FILE = os.path.join(os.getcwd(), "merged_flows")
 
+# text : merged_flows "App_tuile_date:v1,...,v96" (format d'origine de TraceAnomaly)
+# npy  : merged_flows.npy (float32, flux x slots) + merged_flows.ids.npy, relus en memmap
+#        par traceanomaly/readdata.py sans reparser de texte
+parser = argparse.ArgumentParser(description="Conversion NetMob23 -> merged_flows")
+parser.add_argument("--format", choices=["text", "npy"], default="text", help="Format de merged_flows (défaut: text)")
+args = parser.parse_args()
+
+if args.format == "npy" and netmob_store is None:
+    print("ATTENTION : numpy indisponible, merged_flows sera écrit en texte.")
+    args.format = "text"
+
 print(f"--- DÉBUT TRAITEMENT DATA ---")
 print(f"Recherche des données dans : {os.path.abspath(NETMOB_DIR)}")
 
@@ -16,7 +36,8 @@ if not os.path.exists(NETMOB_DIR):
 
 # Recherche récursive de TOUS les fichiers .txt dans NetMob23 (peu importe le sous-dossier)
 search_pattern = os.path.join(NETMOB_DIR, "**", "*.txt")
-files = glob.glob(search_pattern, recursive=True)
+# Triés : même ordre que les séries du store, sortie identique d'une exécution à l'autre
+files = sorted(glob.glob(search_pattern, recursive=True))
 
 print(f"Fichiers .txt trouvés : {len(files)}")
 
@@ -28,48 +49,124 @@ else:
 
 count_lines = 0
 
-with open(OUTPUT_FILE, "w", encoding="utf-8") as fout:
+store = netmob_store.open_store(NETMOB_DIR) if netmob_store else None
+
+
+def flow_prefix(filename):
+    """'Facebook_DL_Tile_100006.txt' -> 'Facebook_100006' (application, région)"""
+    # Logique d'extraction (basée sur ton code original)
+    # Attention : cela suppose que le nom est formaté type "App_Region_Date.txt"
+    # Si le nom est juste "tile_42.txt", il faudra adapter cette partie.
+    parts_name = os.path.splitext(filename)[0].split("_")
+
+    # Sécurité si le nom du fichier est court
+    if len(parts_name) >= 2:
+        return f"{parts_name[0]}_{parts_name[-1]}"
+    return f"Unknown_{parts_name[0]}"
+
+
+def iter_store_flows():
+    """(flow_id, s, date, valeurs) depuis le store, dans l'ordre des fichiers puis de leurs lignes."""
+    for s, date, vals in store.iter_rows():
+        yield f"{flow_prefix(os.path.basename(store.series[s]['file']))}_{date}", s, date, vals
+
+
+def write_binary(output_file):
+    """merged_flows en binaire, au format du cache de readdata.load_flow_matrix. Retourne le nb de flux."""
+    import numpy as np
+    from traceanomaly.readdata import flow_cache_files
+    matrix_file, ids_file = flow_cache_files(output_file)
+
+    if store is not None:
+        print(f"Lecture depuis le store : {store.store_dir}")
+        n_rows = int(store.mask.sum())
+        tmp_matrix = matrix_file + ".tmp.npy"
+        matrix = np.lib.format.open_memmap(tmp_matrix, mode="w+", dtype=np.float32, shape=(n_rows, store.n_slots))
+        ids = []
+        pos = 0
+        for s in range(len(store)):
+            prefix = flow_prefix(os.path.basename(store.series[s]['file']))
+            dates, values, lengths = store.tile(s)
+            # 'nan' -> 0, comme en texte ; les lignes courtes sont complétées par des 0
+            block = np.where(np.isnan(values), 0, values)
+            block[np.arange(store.n_slots) >= lengths[:, None]] = 0
+            matrix[pos:pos + len(dates)] = block
+            ids.extend(f"{prefix}_{date}" for date in dates)
+            pos += len(dates)
+        matrix.flush()
+        del matrix
+    else:
+        ids = []
+        rows = []
+        for flow_id, vals in iter_text_flows():
+            ids.append(flow_id)
+            # tokens illisibles -> 0, comme depuis le store
+            rows.append(np.nan_to_num(netmob_store.parse_values(vals), nan=0.0))
+        width = max((len(r) for r in rows), default=0)
+        matrix = np.zeros((len(rows), width), dtype=np.float32)
+        for i, r in enumerate(rows):
+            matrix[i, :len(r)] = r
+        tmp_matrix = matrix_file + ".tmp.npy"
+        np.save(tmp_matrix, matrix)
+
+    # Les ids d'abord : la matrice, écrite en dernier, date la sortie
+    tmp_ids = ids_file + ".tmp.npy"
+    np.save(tmp_ids, np.array(ids, dtype=str))
+    os.replace(tmp_ids, ids_file)
+    os.replace(tmp_matrix, matrix_file)
+    # Un merged_flows texte périmé serait relu à la place du binaire s'il était plus récent
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    return len(ids)
+
+
+def iter_text_flows():
+    """(flow_id, valeurs texte) lus directement dans les fichiers .txt, 'nan' -> '0'."""
     for input_path in files:
         filename = os.path.basename(input_path)
-        
+
         # Ignorer les fichiers qui ne sont pas du trafic (ex: anomalies.txt, reports, etc.)
         if "anomal" in filename.lower() or "report" in filename.lower() or "geojson" in filename.lower():
             continue
 
         try:
-            # Logique d'extraction (basée sur ton code original)
-            # Attention : cela suppose que le nom est formaté type "App_Region_Date.txt"
-            # Si le nom est juste "tile_42.txt", il faudra adapter cette partie.
-            parts_name = os.path.splitext(filename)[0].split("_")
-            
-            # Sécurité si le nom du fichier est court
-            if len(parts_name) >= 2:
-                application = parts_name[0]
-                region_id = parts_name[-1]
-            else:
-                application = "Unknown"
-                region_id = parts_name[0]
+            prefix = flow_prefix(filename)
 
             with open(input_path, "r", encoding="utf-8") as f:
                 for line in f:
                     parts = line.strip().split()
                     if len(parts) < 2:
                         continue
-                    
+
                     date = parts[0]
                     # Nettoyage des 'nan'
                     vals = ['0' if x.lower() == 'nan' else x for x in parts[1:]]
-                    
+
                     # Construction de l'ID unique
-                    flow_id = f"{application}_{region_id}_{date}"
-                    
-                    # Format attendu par TraceAnomaly: ID:val1,val2,val3
-                    formatted = flow_id + ":" + ",".join(vals)
-                    fout.write(formatted + "\n")
-                    count_lines += 1
+                    yield f"{prefix}_{date}", vals
         except Exception as e:
             print(f"Erreur sur le fichier {filename}: {e}")
 
+
+if args.format == "npy":
+    count_lines = write_binary(OUTPUT_FILE)
+    OUTPUT_FILE += ".npy"
+else:
+    with open(OUTPUT_FILE, "w", encoding="utf-8") as fout:
+        if store is not None:
+            # Lecture depuis le store colonnaire (voir netmob_store.py), 'nan' -> 0
+            print(f"Lecture depuis le store : {store.store_dir}")
+            for flow_id, s, date, vals in iter_store_flows():
+                # Tokens du fichier source (float64 du store), comme la lecture texte
+                vals = store.tokens(s, date, vals)
+                fout.write(flow_id + ":" + ",".join('0' if v.lower() == 'nan' else v for v in vals) + "\n")
+                count_lines += 1
+        else:
+            for flow_id, vals in iter_text_flows():
+                # Format attendu par TraceAnomaly: ID:val1,val2,val3
+                fout.write(flow_id + ":" + ",".join(vals) + "\n")
+                count_lines += 1
+
 print(f"Conversion terminée.")
 print(f"Lignes écrites dans merged_flows : {count_lines}")
 print(f"Fichier généré : {OUTPUT_FILE}")
@@ -1,10 +1,66 @@
 import os
 import sys
+import glob
+import json
+import shutil
+import platform
+import hashlib
+import argparse
+import threading
 import subprocess
+import stage_cache
+import stage_telemetry
+import resource_planner
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 # Configuration
 DATA_DIR_NAME = "NetMob23"  # Nom du dossier contenant le dataset
 ENTRYPOINT_SCRIPT = "pipeline.sh"
+STATE_DIR_NAME = ".sir_state"  # Empreintes des entrées de chaque étape du mode DAG
+LOG_DIR_NAME = "logs"
+WARM_SOCKET = "/tmp/sir_worker.sock"  # Socket du worker Python dans les conteneurs chauds (sir_worker.py)
+WARM_LABEL = "sir.warm=1"
+
+# Images de base partagées (docker/base.Dockerfile) : tag -> (version Python, dépendances communes)
+BASE_DOCKERFILE = os.path.join("docker", "base.Dockerfile")
+BASE_IMAGES = {
+    "sir-base:py3.10": ("3.10", "base-py3.10.txt"),
+    "sir-base:py3.9-torch": ("3.9", "base-py3.9-torch.txt"),
+}
+# Image de base de chaque framework (ARG BASE_IMAGE de son Dockerfile)
+FRAMEWORK_BASE = {
+    "awsctd": "sir-base:py3.10",
+    "causalrca": "sir-base:py3.9-torch",
+    "alertrca": "sir-base:py3.9-torch",
+}
+INPUTS_LABEL = "sir.inputs"  # Empreinte des fichiers de build, posée en label sur l'image
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+
+# Mesures de chaque étape lancée (logs/telemetry.jsonl, stage_telemetry.py)
+LEDGER = stage_telemetry.Ledger()
+
+# Modules importés une seule fois par le worker d'un conteneur chaud (--warm).
+# Uniquement des modules sûrs après fork : TensorFlow / keras / torch restent importés
+# par chaque job (voir sir_worker.FORK_UNSAFE)
+WARM_PRELOAD = {
+    "awsctd": "numpy,pandas,sklearn",
+    "causalrca": "numpy,pandas,sklearn,networkx",
+}
+
+# Rapports produits par un framework et consommés par un autre : (source, destination)
+# relatifs à la racine du projet. Une arête du DAG "A>B" copie ces fichiers après A.
+REPORT_WIRING = {
+    ("awsctd", "causalrca"): [("AWSCTD/AWSCTD_Anomaly_report_for_CausalRCA.txt", "NetMob23/AWSCTD_Anomaly_report_for_CausalRCA.txt")],
+    ("awsctd", "alertrca"): [("AWSCTD/AWSCTD_Anomaly_report_for_AlertRCA.csv", "AlertRCA/faults_TraceAnomaly.csv")],
+    ("traceanomaly", "alertrca"): [("TraceAnomaly/faults_TraceAnomaly.csv", "AlertRCA/faults_TraceAnomaly.csv")],
+}
+
+# Fichiers d'un framework pris en compte dans l'empreinte de ses entrées (code + configuration)
+SOURCE_EXTENSIONS = (".py", ".sh", ".ini", ".yml", ".yaml")
+SOURCE_NAMES = ("Dockerfile", "dockerfile", "requirements.txt", "anomalies.txt")
+# Modules montés dans tous les conteneurs (/opt/sir) : ils entrent dans la clé de chaque étape
+SHARED_SOURCES = ("netmob_store.py", "sir_worker.py")
 
 def check_data_presence(data_path):
     """Vérification de la présence des données dans le dossier spécifié"""
@@ -21,14 +77,135 @@ def check_data_presence(data_path):
         
     return True
 
-def image_exists(image_name):
+def build_tile_store(data_path):
+    """Ingestion unique de NetMob23 dans le store colonnaire partagé (netmob_store.py)"""
+    try:
+        import netmob_store
+    except ImportError:
+        print("ATTENTION : numpy indisponible, store NetMob non construit (les convertisseurs liront le texte).")
+        return
+    netmob_store.build_store(data_path)
+
+def build_inputs_key(paths, extra=""):
+    """sha1 des fichiers qui déterminent une image (Dockerfile, requirements) + arguments de build"""
+    h = hashlib.sha1(extra.encode())
+    for path in paths:
+        h.update(os.path.basename(path).encode())
+        hash_file(h, path)
+    return h.hexdigest()
+
+def image_label(tag, label):
+    labels = docker_inspect("{{json .Config.Labels}}", tag, "image")
+    return (json.loads(labels) or {}).get(label) if labels else None
+
+def build_image(tag, context, dockerfile, inputs_key, build_args=None, force_rebuild=False, log=None, framework=None):
+    """docker build avec BuildKit, seulement si les fichiers de build ont changé (ou --rebuild).
+    Les couches inchangées viennent du cache BuildKit : seule la couche modifiée est reconstruite.
+    Retourne (ok, construite)."""
+    with _build_locks_guard:
+        lock = _build_locks.setdefault(tag, threading.Lock())
+    with lock:  # Deux étapes du DAG peuvent partager la même image de base
+        if not force_rebuild and image_label(tag, INPUTS_LABEL) == inputs_key:
+            print(f" Image {tag} à jour (Cache)")
+            return True, False
+        print(f" Construction de l'image {tag} (BuildKit)...")
+        args = "".join(f"--build-arg {k}={v} " for k, v in (build_args or {}).items())
+        env = dict(os.environ, DOCKER_BUILDKIT="1")
+        cmd = f"docker build -t {tag} --label {INPUTS_LABEL}={inputs_key} {args}-f \"{dockerfile}\" \"{context}\""
+        return call(cmd, log=log, env=env, framework=framework or tag, stage="build") == 0, True
+
+def build_base_image(tag, force_rebuild=False, log=None, framework=None):
+    python_version, requirements = BASE_IMAGES[tag]
+    context = os.path.dirname(os.path.abspath(BASE_DOCKERFILE))
+    inputs_key = build_inputs_key([BASE_DOCKERFILE, os.path.join(context, requirements)], python_version)
+    ok, _ = build_image(tag, context, BASE_DOCKERFILE, inputs_key,
+                        {"PYTHON_VERSION": python_version, "BASE_REQUIREMENTS": requirements}, force_rebuild, log, framework)
+    return ok, inputs_key
+
+def framework_dockerfile(framework_dir):
+    for name in ("Dockerfile", "dockerfile"):
+        if os.path.exists(os.path.join(framework_dir, name)):
+            return os.path.join(framework_dir, name)
+    return None
+
+def build_framework_image(framework_name, framework_dir, image_name, force_rebuild=False, log=None):
+    """Image de base partagée puis couche du framework. Retourne (ok, construite)."""
+    fw_lower = framework_name.lower()
+    dockerfile = framework_dockerfile(framework_dir)
+    if dockerfile is None:
+        print(f"ERREUR : Pas de Dockerfile dans {framework_dir}")
+        return False, False
+    base_key = ""
+    if fw_lower in FRAMEWORK_BASE:
+        ok, base_key = build_base_image(FRAMEWORK_BASE[fw_lower], force_rebuild, log, framework_name)
+        if not ok:
+            return False, False
+    inputs = [dockerfile] + [p for p in (os.path.join(framework_dir, "requirements.txt"),) if os.path.exists(p)]
+    return build_image(image_name, framework_dir, dockerfile, build_inputs_key(inputs, base_key), None,
+                       force_rebuild, log, framework_name)
+
+def docker_inspect(fmt, target, kind="container"):
     try:
-        output = subprocess.check_output(f"docker images -q {image_name}", shell=True)
-        return len(output.strip()) > 0
+        output = subprocess.check_output(f"docker {kind} inspect -f \"{fmt}\" {target}", shell=True, stderr=subprocess.DEVNULL)
+        return output.decode().strip()
     except subprocess.CalledProcessError:
-        return False
+        return None
 
-def run_framework(framework_name, force_rebuild=False):
+def ensure_warm_container(container_name, image_name, mounts, cpus=None, preload="numpy,pandas", log=None):
+    """Démarre (ou réutilise) le conteneur longue durée d'un framework, avec son worker Python chaud."""
+    running = docker_inspect("{{.State.Running}}", container_name) == "true"
+    if running and docker_inspect("{{.Image}}", container_name) == docker_inspect("{{.Id}}", image_name, "image"):
+        if cpus:
+            call(f"docker update --cpus={cpus} {container_name}", log=log)
+        print(f" Conteneur chaud {container_name} réutilisé")
+        return True
+
+    # Absent, arrêté ou basé sur une ancienne image : recréé
+    call(f"docker rm -f {container_name}", log=subprocess.DEVNULL)
+    cpus_option = f"--cpus={cpus} " if cpus else ""
+    print(f" Démarrage du conteneur chaud {container_name} (import de {preload})...")
+    cmd = (
+        f"docker run -d --name {container_name} --label {WARM_LABEL} "
+        f"{cpus_option}{mounts}"
+        f"{image_name} "
+        f"python3 /opt/sir/sir_worker.py serve --socket {WARM_SOCKET} --preload {preload}"
+    )
+    return call(cmd, log=log) == 0
+
+def stop_warm_containers():
+    output = subprocess.check_output(f"docker ps -aq --filter label={WARM_LABEL}", shell=True).decode().split()
+    for container_id in output:
+        call(f"docker rm -f {container_id}")
+    print(f"{len(output)} conteneur(s) chaud(s) arrêté(s)")
+
+def call(cmd, cwd=None, log=None, env=None, framework=None, stage=None, containers=None, baseline=False):
+    """subprocess.call, sortie redirigée vers log (fichier ouvert) en mode DAG.
+    Avec stage, la commande est mesurée (durée, CPU, mémoire, I/O, cgroups des conteneurs) dans le ledger."""
+    if stage is not None:
+        return LEDGER.run(framework, stage, cmd, cwd, log, env, containers, baseline)
+    return subprocess.call(cmd, shell=True, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT if log else None,
+                           stdin=subprocess.DEVNULL if log else None)
+
+def plan_resources(framework_name, framework_dir, data_dir, auto_shard=False):
+    """Estimation mémoire/durée avant lancement. Retourne True si le mode à mémoire bornée doit être activé."""
+    stats = resource_planner.dataset_stats(data_dir)
+    steps = resource_planner.plan_framework(framework_name, framework_dir, data_dir, stats)
+    over = resource_planner.print_plan(framework_name, steps, stats)
+    shard = False
+    for step in over:
+        if step['shard'] and auto_shard:
+            print(f" --auto-shard : {step['step']} -> {step['shard']}")
+            shard = True
+        elif step['shard']:
+            print(f" ATTENTION : {step['step']} risque un OOM. Relancez avec --auto-shard ({step['shard']}).")
+        else:
+            print(f" ATTENTION : {step['step']} risque un OOM et n'a pas de mode à mémoire bornée : "
+                  f"réduisez le dataset (nMaxFiles...) ou la concurrence (--jobs).")
+    return shard
+
+def run_framework(framework_name, force_rebuild=False, cpus=None, log=None, prepare_data=True, use_cache=True, warm=False,
+                  auto_shard=False):
+    """Lance le pipeline d'un framework. Retourne True si toutes les commandes ont réussi."""
     root_dir = os.getcwd()
     framework_dir = os.path.join(root_dir, framework_name)
     data_dir = os.path.join(root_dir, DATA_DIR_NAME)
@@ -37,56 +214,361 @@ def run_framework(framework_name, force_rebuild=False):
 
     if not os.path.isdir(framework_dir):
         print(f"ERREUR: Le dossier du framework '{framework_name}' n'existe pas.")
-        return
+        return False
 
-    if not check_data_presence(data_dir):
-        return 
+    if prepare_data:
+        if not check_data_presence(data_dir):
+            return False
+        with LEDGER.measure(DATA_DIR_NAME, "store"):
+            build_tile_store(data_dir)
+
+    # Budget CPU du conteneur (docker run --cpus, ou "cpus: ${SIR_CPUS}" des docker-compose.yml)
+    env = dict(os.environ)
+    if cpus:
+        env["SIR_CPUS"] = str(cpus)
+
+    # Plan de ressources : SIR_AUTO_SHARD=1 demande au framework son mode à mémoire bornée
+    shard = plan_resources(framework_name, framework_dir, data_dir, auto_shard)
+    if shard:
+        env["SIR_AUTO_SHARD"] = "1"
 
     if fw_lower == "alertrca":
         print(f"\n>>> Lancement de AlertRCA via Docker-Compose...")
-        subprocess.call("docker-compose run --rm --build app", shell=True, cwd=framework_dir)
+        # docker-compose --build part de l'image de base partagée : elle doit exister localement
+        if not build_base_image(FRAMEWORK_BASE[fw_lower], force_rebuild, log, framework_name)[0]:
+            print("ERREUR : Le build de l'image de base a échoué.")
+            return False
+        env["DOCKER_BUILDKIT"] = "1"
+        env["COMPOSE_DOCKER_CLI_BUILD"] = "1"
+        ok = call("docker-compose run --rm --build app", cwd=framework_dir, log=log, env=env, framework=framework_name,
+                  stage="pipeline", containers=stage_telemetry.containers_from_label(f"com.docker.compose.project={fw_lower}")) == 0
         print(f"\nFIN {framework_name.upper()}")
-        return
+        return ok
 
     if fw_lower == "traceanomaly":
         print(f"\n>>> Lancement de TraceAnomaly via script Python...")
-        subprocess.call(f"{sys.executable} main.py", shell=True, cwd=framework_dir)
+        ok = call(f"{sys.executable} main.py", cwd=framework_dir, log=log, env=env, framework=framework_name,
+                  stage="pipeline", containers=stage_telemetry.containers_from_label(f"com.docker.compose.project={fw_lower}")) == 0
         print(f"\nFIN {framework_name.upper()}")
-        return
+        return ok
 
     image_name = f"{fw_lower}_img"
     
 
-    should_build = force_rebuild or not image_exists(image_name)
-    if should_build:
-        print(f"\n 1/3 Construction de l'image Docker ({image_name})...")
-        build_cmd = f"docker build -t {image_name} ./{framework_name}"
-        if subprocess.call(build_cmd, shell=True) != 0:
-            print("ERREUR : Le build a échoué.")
-            return
-    else:
-        print(f"\n 1/3 Image {image_name} déjà présente (Cache)")
+    print(f"\n 1/3 Image Docker ({image_name})...")
+    ok, should_build = build_framework_image(framework_name, framework_dir, image_name, force_rebuild, log)
+    if not ok:
+        print("ERREUR : Le build a échoué.")
+        return False
+
+    # Conversion NetMob23 : restaurée depuis .sir_cache si ses entrées n'ont pas changé (stage_cache.py)
+    stage = stage_cache.open_stage(framework_name, framework_dir, data_dir, root_dir) if use_cache else None
+    cached = False
+    if stage is not None:
+        with LEDGER.measure(framework_name, "cache", "restore"):
+            cached = stage.restore()
+        if cached:
+            print(f" Conversion restaurée depuis le cache (clé {stage.key()[:12]})")
+        else:
+            print(f" Conversion absente du cache (clé {stage.key()[:12]}), elle sera exécutée")
+            if stage.stage['clear_on_miss']:
+                stage.clear_outputs()
 
     print(f" 2/3 Démarrage du pipeline...")
     
     data_dir_clean = data_dir.replace('\\', '/')
     framework_dir_clean = framework_dir.replace('\\', '/')
-    
-    docker_cmd = (
-        f"docker run --rm "
+    store_module_clean = os.path.join(root_dir, "netmob_store.py").replace('\\', '/')
+    worker_module_clean = os.path.join(root_dir, "sir_worker.py").replace('\\', '/')
+    cpus_option = f"--cpus={cpus} " if cpus else ""
+    mounts = (
         f"-v \"{data_dir_clean}:/data\" "
         f"-v \"{framework_dir_clean}:/app\" "
-        f"{image_name} "
-        f"bash {ENTRYPOINT_SCRIPT}"
+        f"-v \"{store_module_clean}:/opt/sir/netmob_store.py:ro\" "
+        f"-v \"{worker_module_clean}:/opt/sir/sir_worker.py:ro\" "
+        f"-e PYTHONPATH=/opt/sir "
     )
+
+    if warm:
+        # Conteneur longue durée : pipeline.sh est lancé par docker exec et ses scripts Python
+        # sont exécutés par le worker chaud (imports TensorFlow/torch déjà faits)
+        container_name = f"sir_{fw_lower}_warm"
+        if should_build:
+            call(f"docker rm -f {container_name}", log=subprocess.DEVNULL)
+        if not ensure_warm_container(container_name, image_name, mounts, cpus, WARM_PRELOAD.get(fw_lower, "numpy,pandas"), log):
+            print("ERREUR : Le conteneur chaud n'a pas démarré.")
+            return False
+        containers, baseline = stage_telemetry.containers_from_name(container_name), True
+        docker_cmd = (
+            f"docker exec "
+            f"-e SIR_WORKER_SOCKET={WARM_SOCKET} "
+            f"-e SIR_STAGE_CACHED={1 if cached else 0} "
+            f"-e SIR_AUTO_SHARD={1 if shard else 0} "
+            f"{host_env(root_dir)}"
+            f"-w /app "
+            f"{container_name} "
+            f"bash {ENTRYPOINT_SCRIPT}"
+        )
+    else:
+        cidfile = os.path.join(root_dir, LOG_DIR_NAME, f".{fw_lower}_{os.getpid()}.cid")
+        os.makedirs(os.path.dirname(cidfile), exist_ok=True)
+        if os.path.exists(cidfile):
+            os.remove(cidfile)
+        containers, baseline = stage_telemetry.containers_from_cidfile(cidfile), False
+        docker_cmd = (
+            f"docker run --rm "
+            f"--cidfile \"{cidfile}\" "
+            f"{cpus_option}"
+            f"{mounts}"
+            f"-e SIR_STAGE_CACHED={1 if cached else 0} "
+            f"-e SIR_AUTO_SHARD={1 if shard else 0} "
+            f"{host_env(root_dir)}"
+            f"{image_name} "
+            f"bash {ENTRYPOINT_SCRIPT}"
+        )
     
-    subprocess.call(docker_cmd, shell=True)
+    ok = call(docker_cmd, log=log, framework=framework_name, stage="pipeline", containers=containers, baseline=baseline) == 0
+    if not warm and os.path.exists(cidfile):
+        os.remove(cidfile)
+    if ok and stage is not None and not cached:
+        with LEDGER.measure(framework_name, "cache", "store"):
+            n_files = stage.store()
+        print(f" 3/3 Mise en cache de la conversion : {n_files} fichier(s)")
     print(f"\n FIN {framework_name.upper()} ")
+    return ok
+
+# ---------------------------------------------------------------------------
+# Mode DAG : plusieurs frameworks, les nœuds indépendants en parallèle
+# ---------------------------------------------------------------------------
+
+def parse_dag(specs):
+    """["AWSCTD>CausalRCA", "TraceAnomaly>AlertRCA", "SGmVRNN"] -> (noms, {nœud: dépendances})"""
+    names = {}
+    deps = {}
+    for spec in specs:
+        chain = [part.strip() for part in spec.split(">") if part.strip()]
+        for name in chain:
+            names.setdefault(name.lower(), name)
+            deps.setdefault(name.lower(), set())
+        for up, down in zip(chain, chain[1:]):
+            deps[down.lower()].add(up.lower())
+    return names, deps
+
+def topological_order(deps):
+    order = []
+    done = set()
+    visiting = set()
+
+    def visit(node):
+        if node in done:
+            return
+        if node in visiting:
+            raise ValueError(f"Cycle dans le DAG autour de '{node}'")
+        visiting.add(node)
+        for up in sorted(deps[node]):
+            visit(up)
+        visiting.discard(node)
+        done.add(node)
+        order.append(node)
+
+    for node in sorted(deps):
+        visit(node)
+    return order
+
+def wired_inputs(node, deps):
+    """Rapports amont copiés vers ce nœud : [(source, destination)]"""
+    pairs = []
+    for up in sorted(deps[node]):
+        pairs.extend(REPORT_WIRING.get((up, node), []))
+    return pairs
+
+def hash_file(h, path):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+
+def data_fingerprint(data_dir):
+    """Taille + mtime des fichiers du dataset (hors store et rapports câblés dans NetMob23)"""
+    wired = {os.path.normpath(dst) for pairs in REPORT_WIRING.values() for _, dst in pairs}
+    h = hashlib.sha1()
+    for dirpath, dirnames, filenames in os.walk(data_dir):
+        dirnames[:] = sorted(d for d in dirnames if d != "_store")
+        for name in sorted(filenames):
+            if os.path.relpath(os.path.join(dirpath, name)) in wired:
+                continue
+            st = os.stat(os.path.join(dirpath, name))
+            h.update(f"{os.path.relpath(os.path.join(dirpath, name), data_dir)}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+def framework_fingerprint(framework_dir):
+    """Code et configuration du framework (les sorties générées ne sont pas prises en compte)"""
+    h = hashlib.sha1()
+    for dirpath, dirnames, filenames in os.walk(framework_dir):
+        dirnames[:] = sorted(d for d in dirnames if d not in ("__pycache__", ".git") and not d.startswith("."))
+        for name in sorted(filenames):
+            if name.endswith(SOURCE_EXTENSIONS) or name in SOURCE_NAMES:
+                path = os.path.join(dirpath, name)
+                h.update(os.path.relpath(path, framework_dir).encode())
+                hash_file(h, path)
+    return h.hexdigest()
+
+def host_env(root_dir):
+    """Commit du dépôt et nom de l'hôte, vus de l'intérieur du conteneur (AWSCTDBench.py)"""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=root_dir,
+                                         stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return f"-e SIR_GIT_COMMIT={commit} -e SIR_HOST={platform.node()} "
+
+def shared_files(root_dir):
+    """Fichiers communs à toutes les étapes : modules montés et images de base (docker/)"""
+    requirements = glob.glob(os.path.join(root_dir, "docker", "*.txt"))
+    return list(SHARED_SOURCES) + [BASE_DOCKERFILE] + sorted(os.path.relpath(p, root_dir) for p in requirements)
+
+def stage_key(node, name, deps, root_dir, data_key):
+    h = hashlib.sha1(data_key.encode())
+    h.update(framework_fingerprint(os.path.join(root_dir, name)).encode())
+    for rel in shared_files(root_dir):
+        path = os.path.join(root_dir, rel)
+        h.update(rel.replace(os.sep, "/").encode())
+        if os.path.exists(path):
+            hash_file(h, path)
+    for src, dst in wired_inputs(node, deps):
+        h.update(dst.encode())
+        if os.path.exists(os.path.join(root_dir, src)):
+            hash_file(h, os.path.join(root_dir, src))
+    return h.hexdigest()
+
+def load_state(root_dir, node):
+    path = os.path.join(root_dir, STATE_DIR_NAME, f"{node}.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_state(root_dir, node, state):
+    os.makedirs(os.path.join(root_dir, STATE_DIR_NAME), exist_ok=True)
+    with open(os.path.join(root_dir, STATE_DIR_NAME, f"{node}.json"), "w") as f:
+        json.dump(state, f, indent=2)
+
+def run_dag(specs, cpus_per_container=None, max_jobs=None, force_rebuild=False, force_run=False, use_cache=True, warm=False,
+            auto_shard=False):
+    root_dir = os.getcwd()
+    data_dir = os.path.join(root_dir, DATA_DIR_NAME)
+    names, deps = parse_dag(specs)
+    order = topological_order(deps)
+
+    destinations = {}
+    for node in order:
+        for src, dst in wired_inputs(node, deps):
+            if destinations.setdefault(dst, src) != src:
+                print(f"ERREUR : {dst} serait alimenté par {destinations[dst]} et {src}. Gardez un seul amont.")
+                return False
+
+    if not check_data_presence(data_dir):
+        return False
+    with LEDGER.measure(DATA_DIR_NAME, "store"):
+        build_tile_store(data_dir)
+    data_key = data_fingerprint(data_dir)
+
+    n_cores = os.cpu_count() or 1
+    if max_jobs is None:
+        max_jobs = max(1, int(n_cores // cpus_per_container)) if cpus_per_container else len(order)
+    print(f"\n>>> DAG : {' , '.join(names[n] for n in order)}")
+    print(f"    {max_jobs} étape(s) simultanée(s), budget CPU par conteneur : {cpus_per_container or 'illimité'}")
+    os.makedirs(os.path.join(root_dir, LOG_DIR_NAME), exist_ok=True)
+
+    def run_node(node):
+        name = names[node]
+        for src, dst in wired_inputs(node, deps):
+            if not os.path.exists(os.path.join(root_dir, src)):
+                print(f"ERREUR [{name}] : rapport amont introuvable : {src}")
+                return "failed"
+            os.makedirs(os.path.dirname(os.path.join(root_dir, dst)), exist_ok=True)
+            shutil.copyfile(os.path.join(root_dir, src), os.path.join(root_dir, dst))
+            print(f"    [{name}] {src} -> {dst}")
+
+        key = stage_key(node, name, deps, root_dir, data_key)
+        state = load_state(root_dir, node)
+        outputs_present = all(os.path.exists(os.path.join(root_dir, src))
+                              for (up, down), pairs in REPORT_WIRING.items() if up == node
+                              for src, _ in pairs if node in deps.get(down, ()))
+        if not force_run and state.get("key") == key and state.get("ok") and outputs_present:
+            print(f">>> [{name}] Entrées inchangées, étape sautée")
+            return "skipped"
+
+        log_path = os.path.join(root_dir, LOG_DIR_NAME, f"{node}.log")
+        print(f">>> [{name}] Démarrage (log : {log_path})")
+        with open(log_path, "w") as log:
+            ok = run_framework(name, force_rebuild, cpus_per_container, log, prepare_data=False, use_cache=use_cache, warm=warm,
+                               auto_shard=auto_shard)
+        save_state(root_dir, node, {"key": key, "ok": ok})
+        print(f">>> [{name}] {'Terminé' if ok else 'ÉCHEC, voir ' + log_path}")
+        return "done" if ok else "failed"
+
+    status = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_jobs) as pool:
+        while len(status) < len(order):
+            for node in order:
+                if node in status or node in running.values():
+                    continue
+                if any(status.get(up) == "failed" or status.get(up) == "blocked" for up in deps[node]):
+                    status[node] = "blocked"
+                    print(f">>> [{names[node]}] Non lancé : une étape amont a échoué")
+                    continue
+                if all(status.get(up) in ("done", "skipped") for up in deps[node]) and len(running) < max_jobs:
+                    running[pool.submit(run_node, node)] = node
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                node = running.pop(future)
+                try:
+                    status[node] = future.result()
+                except Exception as e:
+                    print(f"ERREUR [{names[node]}] : {e}")
+                    status[node] = "failed"
+
+    print("\n>>> Bilan du DAG")
+    for node in order:
+        print(f"    {names[node]:<15} {status[node]}")
+    return all(status[node] in ("done", "skipped") for node in order)
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <nom_du_framework> [--rebuild]")
+    parser = argparse.ArgumentParser(description="Lancement des frameworks SIR sur NetMob23")
+    parser.add_argument("framework", nargs="?", help="Framework à lancer seul (ex: AWSCTD)")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruit l'image Docker")
+    parser.add_argument("--dag", nargs="+", metavar="A>B",
+                        help="Mode orchestrateur : chaînes de frameworks, ex: \"AWSCTD>CausalRCA\" \"TraceAnomaly>AlertRCA\"")
+    parser.add_argument("--cpus", type=float, default=None, help="Budget CPU par conteneur (docker --cpus)")
+    parser.add_argument("--jobs", type=int, default=None, help="Étapes simultanées max (défaut : coeurs / --cpus)")
+    parser.add_argument("--force", action="store_true", help="Relance les étapes même si leurs entrées sont inchangées")
+    parser.add_argument("--no-cache", action="store_true", help="Reconvertit les données sans utiliser .sir_cache")
+    parser.add_argument("--warm", action="store_true", help="Conteneur longue durée par framework (docker exec + worker Python chaud)")
+    parser.add_argument("--stop-warm", action="store_true", help="Arrête les conteneurs chauds")
+    parser.add_argument("--plan", action="store_true", help="Affiche l'estimation mémoire/durée sans rien lancer")
+    parser.add_argument("--auto-shard", action="store_true", help="Active le mode à mémoire bornée des étapes qui dépasseraient la RAM")
+    args = parser.parse_args()
+
+    if args.stop_warm:
+        stop_warm_containers()
+    elif args.plan and (args.dag or args.framework):
+        data_dir = os.path.join(os.getcwd(), DATA_DIR_NAME)
+        if not check_data_presence(data_dir):
+            sys.exit(1)
+        frameworks = list(parse_dag(args.dag)[0].values()) if args.dag else [args.framework]
+        for name in frameworks:
+            plan_resources(name, os.path.join(os.getcwd(), name), data_dir, args.auto_shard)
+    elif args.dag:
+        ok = run_dag(args.dag, args.cpus, args.jobs, args.rebuild, args.force, not args.no_cache, args.warm, args.auto_shard)
+        LEDGER.summary()
+        sys.exit(0 if ok else 1)
+    elif args.framework:
+        run_framework(args.framework, force_rebuild=args.rebuild, cpus=args.cpus, use_cache=not args.no_cache, warm=args.warm,
+                      auto_shard=args.auto_shard)
+        LEDGER.summary()
     else:
-        fw = sys.argv[1]
-        rebuild = "--rebuild" in sys.argv
-        run_framework(fw, force_rebuild=rebuild)
\ No newline at end of file
+        print("Usage: python main.py <nom_du_framework> [--rebuild]")
+        print("       python main.py --dag \"AWSCTD>CausalRCA\" \"TraceAnomaly>AlertRCA\" [--cpus 4] [--jobs 2]")
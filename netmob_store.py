@@ -0,0 +1,315 @@
+"""
+Store colonnaire NetMob23 partagé par tous les convertisseurs.
+
+Les fichiers Tile_*.txt (une ligne = "YYYYMMDD v1 ... v96") sont ingérés une
+seule fois dans un dossier `_store/` placé à la racine du dataset :
+
+    NetMob23/_store/
+        values.npy   float64 (séries, dates, slots), NaN = valeur absente/invalide
+        lengths.npy  uint16  (séries, dates), nb de valeurs lues sur la ligne (0 = pas de ligne)
+        index.json   séries (fichier, app, tuile), dates, empreinte des sources,
+                     tokens bruts des lignes contenant un token illisible
+
+Les valeurs sont gardées en float64 : format_value() redonne le token du
+fichier source (écriture décimale la plus courte), si bien que les sorties
+texte lues depuis le store sont identiques à celles lues depuis le texte.
+Un token illisible ('abc') est NaN comme un 'nan' littéral ; ses lignes sont
+listées à part (TileStore.invalid_mask) pour les convertisseurs qui les
+écartent, et leurs tokens bruts sont rendus par TileStore.tokens().
+
+Les lignes sont rendues dans l'ordre du fichier source (TileStore.rows) ; pour
+une date en double, seule la dernière ligne est gardée.
+
+Une série correspond à un fichier source (app x tuile). Les tableaux sont
+ouverts en memmap : les convertisseurs lisent les tuiles dont ils ont besoin
+sans reparser le texte.
+
+Usage : python netmob_store.py [chemin/vers/NetMob23] [--force]
+"""
+import os
+import re
+import sys
+import glob
+import json
+
+import numpy as np
+
+STORE_DIR_NAME = "_store"
+STORE_VERSION = 2
+VALUES_FILE = "values.npy"
+LENGTHS_FILE = "lengths.npy"
+INDEX_FILE = "index.json"
+
+# Fichiers présents dans NetMob23 qui ne sont pas du trafic
+IGNORED_NAME_PARTS = ("anomal", "report", "geojson")
+
+TILE_RE = re.compile(r'(?:tile)[_\-\s]?(\d+)', re.IGNORECASE)
+
+
+def list_source_files(data_dir):
+    """Liste triée (chemins relatifs) des fichiers de trafic du dataset."""
+    files = glob.glob(os.path.join(data_dir, '**', '*.txt'), recursive=True)
+    rel_files = []
+    for path in files:
+        rel = os.path.relpath(path, data_dir)
+        if rel.split(os.sep)[0] == STORE_DIR_NAME:
+            continue
+        name = os.path.basename(rel).lower()
+        if any(part in name for part in IGNORED_NAME_PARTS):
+            continue
+        rel_files.append(rel.replace(os.sep, '/'))
+    rel_files.sort()
+    return rel_files
+
+
+def source_fingerprint(data_dir, rel_files):
+    """Taille + mtime de chaque source, pour détecter un store périmé."""
+    fingerprint = {}
+    for rel in rel_files:
+        st = os.stat(os.path.join(data_dir, rel))
+        fingerprint[rel] = [st.st_size, st.st_mtime_ns]
+    return fingerprint
+
+
+def parse_series_name(rel_path):
+    """'Facebook/DL/Facebook_DL_Tile_100006.txt' -> ('Facebook', '100006')"""
+    stem = os.path.splitext(os.path.basename(rel_path))[0]
+    match = TILE_RE.search(stem)
+    parts = stem.split('_')
+    app = parts[0] if len(parts) >= 2 else "Unknown"
+    tile = match.group(1) if match else parts[-1]
+    return app, tile
+
+
+def parse_values(tokens, dtype=np.float32):
+    """Tokens texte -> tableau (float32 par défaut), les tokens illisibles deviennent NaN."""
+    return parse_tokens(tokens, dtype)[0]
+
+
+def parse_tokens(tokens, dtype=np.float64):
+    """(valeurs, True si un token est illisible) ; les tokens illisibles deviennent NaN."""
+    try:
+        return np.array(tokens, dtype=dtype), False
+    except ValueError:
+        out = np.empty(len(tokens), dtype=dtype)
+        for i, tok in enumerate(tokens):
+            try:
+                out[i] = float(tok)
+            except ValueError:
+                out[i] = np.nan
+        return out, True
+
+
+def format_value(x):
+    """Valeur du store -> token texte : '385', '0.123456789', 'nan' (repr le plus court du float64)."""
+    text = repr(float(x))
+    return text[:-2] if text.endswith('.0') else text
+
+
+def _scan_file(path):
+    """Premier passage : dates présentes et nb max de valeurs par ligne."""
+    dates = set()
+    width = 0
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+            dates.add(parts[0])
+            width = max(width, len(parts) - 1)
+    return dates, width
+
+
+def build_store(data_dir, force=False):
+    """Ingestion du dataset dans data_dir/_store. Retourne le chemin du store."""
+    data_dir = os.path.abspath(data_dir)
+    store_dir = os.path.join(data_dir, STORE_DIR_NAME)
+    rel_files = list_source_files(data_dir)
+    fingerprint = source_fingerprint(data_dir, rel_files)
+
+    if not force and _read_index(store_dir, fingerprint) is not None:
+        print(f"STORE : À jour ({store_dir})")
+        return store_dir
+
+    print(f"STORE : Ingestion de {len(rel_files)} fichiers depuis {data_dir}")
+    all_dates = set()
+    n_slots = 0
+    for rel in rel_files:
+        dates, width = _scan_file(os.path.join(data_dir, rel))
+        all_dates.update(dates)
+        n_slots = max(n_slots, width)
+
+    dates = sorted(all_dates)
+    date_pos = {d: i for i, d in enumerate(dates)}
+    os.makedirs(store_dir, exist_ok=True)
+
+    shape = (len(rel_files), len(dates), n_slots)
+    values = np.lib.format.open_memmap(os.path.join(store_dir, VALUES_FILE), mode='w+', dtype=np.float64, shape=shape)
+    lengths = np.lib.format.open_memmap(os.path.join(store_dir, LENGTHS_FILE), mode='w+', dtype=np.uint16, shape=shape[:2])
+    values[:] = np.nan
+    lengths[:] = 0
+
+    series = []
+    invalid = []
+    for s, rel in enumerate(rel_files):
+        order = []
+        with open(os.path.join(data_dir, rel), 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 2:
+                    continue
+                vals, bad = parse_tokens(parts[1:])
+                d = date_pos[parts[0]]
+                values[s, d, :len(vals)] = vals
+                lengths[s, d] = len(vals)
+                order.append(d)
+                if bad:
+                    invalid.append([s, parts[0], parts[1:]])
+        app, tile = parse_series_name(rel)
+        series.append({'file': rel, 'app': app, 'tile': tile})
+        order = list(dict.fromkeys(order))
+        if order != sorted(order):
+            # Lignes non triées par date : ordre du fichier gardé pour les lecteurs
+            series[-1]['order'] = order
+        if s % 500 == 0:
+            print(f"   ... {s}/{len(rel_files)} fichiers ingérés", end='\r')
+
+    values.flush()
+    lengths.flush()
+    del values, lengths
+
+    index = {
+        'version': STORE_VERSION,
+        'n_slots': n_slots,
+        'dates': dates,
+        'series': series,
+        'invalid': invalid,
+        'sources': fingerprint,
+    }
+    # index.json écrit en dernier : un store sans index est considéré absent
+    with open(os.path.join(store_dir, INDEX_FILE), 'w') as f:
+        json.dump(index, f)
+
+    print(f"\nSTORE : {shape[0]} séries x {shape[1]} dates x {shape[2]} slots -> {store_dir}")
+    return store_dir
+
+
+def _read_index(store_dir, fingerprint=None):
+    index_path = os.path.join(store_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get('version') != STORE_VERSION:
+        return None
+    if fingerprint is not None and index.get('sources') != fingerprint:
+        return None
+    return index
+
+
+class TileStore:
+    """Lecture du store : séries x dates x slots en memmap."""
+
+    def __init__(self, store_dir, index=None):
+        self.store_dir = store_dir
+        self.data_dir = os.path.dirname(os.path.abspath(store_dir))
+        self.index = index if index is not None else _read_index(store_dir)
+        if self.index is None:
+            raise FileNotFoundError(f"Store NetMob introuvable ou invalide : {store_dir}")
+        self.values = np.load(os.path.join(store_dir, VALUES_FILE), mmap_mode='r')
+        self.lengths = np.load(os.path.join(store_dir, LENGTHS_FILE), mmap_mode='r')
+        self.dates = self.index['dates']
+        self.series = self.index['series']
+        self.n_slots = self.index['n_slots']
+        self._date_pos = {d: i for i, d in enumerate(self.dates)}
+        self._series_pos = {}
+        for i, s in enumerate(self.series):
+            self._series_pos[s['file']] = i
+            self._series_pos.setdefault(os.path.basename(s['file']), i)
+        self._invalid = {(s, date): tokens for s, date, tokens in self.index.get('invalid', [])}
+
+    def __len__(self):
+        return len(self.series)
+
+    @property
+    def mask(self):
+        """Masque de validité (séries, dates) : True si la ligne existe."""
+        return self.lengths > 0
+
+    @property
+    def invalid_mask(self):
+        """(séries, dates) : True si la ligne contient un token illisible (NaN dans values)."""
+        mask = np.zeros(self.lengths.shape, dtype=bool)
+        for s, date in self._invalid:
+            mask[s, self._date_pos[date]] = True
+        return mask
+
+    def tokens(self, s, date, vals):
+        """Tokens texte d'une ligne (vals = ses valeurs), tels qu'écrits dans le fichier source."""
+        raw = self._invalid.get((s, date))
+        if raw is not None:
+            return list(raw)
+        return [format_value(x) for x in vals.tolist()]
+
+    def files(self):
+        """Chemins absolus des sources, dans l'ordre des séries."""
+        return [os.path.join(self.data_dir, s['file']) for s in self.series]
+
+    def series_index(self, path):
+        """Index d'une série depuis un chemin absolu, relatif ou un nom de fichier."""
+        if os.path.isabs(path):
+            path = os.path.relpath(path, self.data_dir)
+        return self._series_pos.get(path.replace(os.sep, '/'))
+
+    def rows(self, s):
+        """Positions (dans dates) des lignes présentes d'une série, dans l'ordre du fichier."""
+        order = self.series[s].get('order')
+        if order is not None:
+            return np.array(order, dtype=np.intp)
+        return np.flatnonzero(self.lengths[s])
+
+    def tile(self, s):
+        """(dates, valeurs (n, slots), longueurs) des lignes présentes d'une série."""
+        present = self.rows(s)
+        return [self.dates[d] for d in present], self.values[s, present], self.lengths[s, present]
+
+    def row(self, s, date):
+        """Valeurs d'une tuile pour une date, ou None si la ligne n'existe pas."""
+        d = self._date_pos.get(date)
+        if d is None or self.lengths[s, d] == 0:
+            return None
+        return self.values[s, d, :self.lengths[s, d]]
+
+    def iter_rows(self, series=None):
+        """Itère (index série, date, valeurs) dans l'ordre des fichiers puis de leurs lignes."""
+        for s in (range(len(self.series)) if series is None else series):
+            dates, values, lengths = self.tile(s)
+            for date, vals, n in zip(dates, values, lengths):
+                yield s, date, vals[:n]
+
+
+def open_store(data_dir, check_sources=True):
+    """
+    Ouvre le store de data_dir s'il existe et correspond aux sources.
+    Retourne None sinon : l'appelant retombe alors sur la lecture texte.
+    """
+    store_dir = os.path.join(data_dir, STORE_DIR_NAME)
+    fingerprint = None
+    if check_sources:
+        fingerprint = source_fingerprint(data_dir, list_source_files(data_dir))
+    index = _read_index(store_dir, fingerprint)
+    if index is None:
+        return None
+    return TileStore(store_dir, index)
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    target = args[0] if args else os.path.join(os.path.dirname(os.path.abspath(__file__)), "NetMob23")
+    if not os.path.isdir(target):
+        print(f"ERREUR : Dossier introuvable : {target}")
+        sys.exit(1)
+    build_store(target, force="--force" in sys.argv)
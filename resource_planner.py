@@ -0,0 +1,226 @@
+"""
+Estimation des ressources d'un framework avant son lancement (main.py --plan).
+
+Le volume du dataset est lu dans l'index du store NetMob23/_store (séries,
+dates, lignes présentes) ou, à défaut, estimé depuis la taille des fichiers
+texte. Pour chaque étape lourde du framework choisi, la mémoire pic et la durée
+sont estimées par des modèles simples (tailles des tableaux construits par le
+code, débits de référence ci-dessous) puis comparées à la RAM disponible.
+
+Les estimations sont des ordres de grandeur : leur but est d'éviter les OOM
+après des heures de calcul, pas de prédire la durée à la minute près.
+
+Usage : python resource_planner.py <framework> [chemin/vers/NetMob23]
+"""
+import os
+import sys
+import glob
+import configparser
+
+# Débits de référence (CPU, un coeur) pour les estimations de durée
+TEXT_PARSE_BYTES_S = 40e6       # lecture/parsing des .txt NetMob
+TRAIN_SEQ_S = 2000              # séquences/s par époque (CNN AWSCTD)
+CSV_ROWS_S = 300e3              # lignes CSV écrites/relues (traitementdata.py)
+PY_ROW_BYTES = 200              # tuple Python (timestamp, valeur, type) + liste
+TF_RUNTIME_BYTES = 1.5 * 2 ** 30  # TensorFlow/Keras chargés
+TORCH_RUNTIME_BYTES = 0.8 * 2 ** 30
+AVG_TXT_LINE_BYTES = 96 * 9     # ligne "YYYYMMDD v1..v96" moyenne, sans store
+SAFETY = 0.8                    # part de la RAM disponible utilisable
+
+GB = 2 ** 30
+
+
+def available_memory():
+    """RAM disponible (octets), None si inconnue."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_AVPHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def dataset_stats(data_dir):
+    """Fichiers, séries, dates, lignes (tuile x jour), slots et octets du dataset."""
+    try:
+        import netmob_store
+    except ImportError:
+        netmob_store = None
+    if netmob_store is not None:
+        store = netmob_store.open_store(data_dir)
+        if store is not None:
+            files = store.files()
+            return {
+                'files': len(files),
+                'series': len(store.series),
+                'dates': len(store.dates),
+                'tile_days': int(store.mask.sum()),
+                'slots': store.n_slots,
+                'bytes': sum(os.path.getsize(p) for p in files if os.path.exists(p)),
+                'source': 'store',
+            }
+        rel_files = netmob_store.list_source_files(data_dir)
+    else:
+        rel_files = [os.path.relpath(p, data_dir) for p in glob.glob(os.path.join(data_dir, '**', '*.txt'), recursive=True)
+                     if '_store' not in p and not any(k in os.path.basename(p).lower() for k in ('anomal', 'report'))]
+    size = sum(os.path.getsize(os.path.join(data_dir, rel)) for rel in rel_files)
+    tile_days = int(size / AVG_TXT_LINE_BYTES)
+    return {'files': len(rel_files), 'series': len(rel_files), 'dates': tile_days // max(len(rel_files), 1),
+            'tile_days': tile_days, 'slots': 96, 'bytes': size, 'source': 'taille des fichiers'}
+
+
+def read_config(framework_dir):
+    config = configparser.ConfigParser()
+    config.read(os.path.join(framework_dir, 'config.ini'))
+    return config
+
+
+def _step(name, memory, seconds, note="", shard=None):
+    """shard : texte de l'option bornant la mémoire appliquée par --auto-shard (None si aucune)"""
+    return {'step': name, 'memory': memory, 'seconds': seconds, 'note': note, 'shard': shard}
+
+
+def plan_awsctd(stats, config):
+    max_files = config.get('MAIN', 'nMaxFiles', fallback='500')
+    ratio = 1.0
+    if max_files.strip().isdigit() and stats['files'] > 0:
+        ratio = min(1.0, int(max_files) / stats['files'])
+    n = int(stats['tile_days'] * ratio)
+    seq_len = config.getint('DATA', 'nSequenceLength', fallback=96)
+    vocab = config.getint('DATA', 'nVocabSize', fallback=100)
+    embedding = config.getint('MAIN', 'nEmbeddingDim', fallback=0)
+    streaming = config.getboolean('MAIN', 'bStreaming', fallback=False)
+    parallel = config.getint('MAIN', 'nParallelFolds', fallback=1)
+    folds = config.getint('MAIN', 'nKFolds', fallback=5)
+    epochs = config.getint('MAIN', 'nEpochs', fallback=200)
+    batch = config.getint('MAIN', 'nBatchSize', fallback=64)
+
+    # Conversion : matrice float32 (lignes, slots) + DataFrame / tokens intermédiaires
+    convert = _step('conversion', n * stats['slots'] * 4 * 3, stats['bytes'] * ratio / TEXT_PARSE_BYTES_S,
+                    f"{n} séquences")
+
+    tokens = n * seq_len
+    if embedding == 0 and not streaming and parallel <= 1:
+        # to_categorical float32 sur toute la matrice, puis copie train/test du fold (Xtr[train])
+        memory = TF_RUNTIME_BYTES + n * seq_len * vocab * 4 * 1.8
+        note = f"one-hot {n}x{seq_len}x{vocab} float32"
+        shard = "bStreaming (one-hot par batch)"
+    else:
+        # nParallelFolds > 1 force le streaming (AWSCTD.py) : chaque processus de fold relit les tokens,
+        # en plus de ceux gardés par le processus principal
+        memory = (TF_RUNTIME_BYTES + tokens * 2 + batch * seq_len * vocab * 4 * 4) * max(parallel, 1)
+        if parallel > 1:
+            memory += TF_RUNTIME_BYTES + tokens * 2
+        note = "tokens + one-hot par batch" if embedding == 0 else f"Embedding {embedding}"
+        if parallel > 1:
+            note += f", {parallel} processus de fold"
+        shard = None
+    train = _step('entraînement', memory, folds * epochs * n * 0.8 / TRAIN_SEQ_S,
+                  note + f", majorant {folds} folds x {epochs} époques (early stopping)", shard)
+    return [convert, train]
+
+
+def plan_alertrca(stats, config):
+    rows = stats['tile_days'] * stats['slots']
+    # merged_flows (texte) puis metrics_filtered.csv relu dans un dict de tuples Python (toutes les métriques au pire)
+    merged = _step('merged_flows', 64 * 2 ** 20, stats['bytes'] / TEXT_PARSE_BYTES_S, f"{stats['tile_days']} flux")
+    metrics = _step('métriques', rows * PY_ROW_BYTES, 3 * rows / CSV_ROWS_S,
+                    f"majorant {rows} lignes (tous les noeuds retenus)")
+    train = _step('entraînement', TORCH_RUNTIME_BYTES + rows * 8 * 4, 0, "durée non estimée")
+    return [merged, metrics, train]
+
+
+def plan_causalrca(stats, config, data_dir):
+    top_n = config.getint('DATA', 'top_n', fallback=15)
+    epochs = config.getint('TRAINING', 'epochs', fallback=200)
+    anomalies_file = os.path.join(data_dir, config.get('PATHS', 'anomalies_file', fallback='Anomalies_NetMob23.txt'))
+    n_anomalies = 0
+    if os.path.exists(anomalies_file):
+        with open(anomalies_file, 'r', encoding='utf-8', errors='ignore') as f:
+            n_anomalies = sum(1 for line in f if line.strip())
+    cluster = (top_n + 1) * stats['dates'] * stats['slots']
+    convert = _step('conversion', cluster * 8 * 4 + 256 * 2 ** 20, stats['bytes'] / TEXT_PARSE_BYTES_S,
+                    f"{n_anomalies} anomalies, clusters de {top_n + 1} tuiles")
+    train = _step('entraînement', TORCH_RUNTIME_BYTES + cluster * 8 * 8, n_anomalies * epochs * 0.02,
+                  f"{n_anomalies} x {epochs} époques")
+    return [convert, train]
+
+
+def plan_traceanomaly(stats, config):
+    values = stats['tile_days'] * stats['slots']
+    # readdata : listes Python puis tableaux float, normalisation (moyenne / écart-type)
+    read = _step('lecture', values * (8 + 24) + stats['tile_days'] * 200, stats['bytes'] / TEXT_PARSE_BYTES_S,
+                 f"{stats['tile_days']} flux")
+    train = _step('entraînement', TF_RUNTIME_BYTES + values * 4 * 4, 0, "durée non estimée")
+    return [read, train]
+
+
+def plan_generic(stats, config):
+    # Chargement complet du texte dans pandas : ~4x la taille sur disque
+    return [_step('chargement', stats['bytes'] * 4, stats['bytes'] / TEXT_PARSE_BYTES_S, "estimation générique")]
+
+
+def plan_framework(framework, framework_dir, data_dir, stats=None):
+    """Liste des étapes estimées du framework (voir _step)."""
+    stats = stats or dataset_stats(data_dir)
+    config = read_config(framework_dir)
+    fw = framework.lower()
+    if fw == 'awsctd':
+        steps = plan_awsctd(stats, config)
+    elif fw == 'alertrca':
+        steps = plan_alertrca(stats, config)
+    elif fw == 'causalrca':
+        steps = plan_causalrca(stats, config, data_dir)
+    elif fw == 'traceanomaly':
+        steps = plan_traceanomaly(stats, config)
+    else:
+        steps = plan_generic(stats, config)
+    return steps
+
+
+def peak_memory(steps):
+    return max((s['memory'] for s in steps), default=0)
+
+
+def _fmt_duration(seconds):
+    if not seconds:
+        return '-'
+    if seconds < 120:
+        return f"{seconds:.0f} s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def print_plan(framework, steps, stats, ram=None):
+    """Affiche le plan. Retourne les étapes dont la mémoire dépasse la RAM disponible."""
+    ram = available_memory() if ram is None else ram
+    print(f"\n>>> Plan {framework} : {stats['files']} fichiers, {stats['tile_days']} tuiles-jours, "
+          f"{stats['bytes'] / GB:.2f} Go (source : {stats['source']})")
+    if ram:
+        print(f"    RAM disponible : {ram / GB:.1f} Go")
+    over = []
+    for s in steps:
+        flag = ""
+        if ram and s['memory'] > ram * SAFETY:
+            over.append(s)
+            flag = "  DÉPASSE LA RAM"
+        print(f"    {s['step']:<14} {s['memory'] / GB:8.2f} Go {_fmt_duration(s['seconds']):>9}  {s['note']}{flag}")
+    return over
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage : python resource_planner.py <framework> [chemin/vers/NetMob23]")
+        sys.exit(1)
+    root_dir = os.path.dirname(os.path.abspath(__file__))
+    framework = sys.argv[1]
+    data_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(root_dir, "NetMob23")
+    stats = dataset_stats(data_dir)
+    over = print_plan(framework, plan_framework(framework, os.path.join(root_dir, framework), data_dir, stats), stats)
+    sys.exit(1 if over else 0)
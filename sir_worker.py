@@ -0,0 +1,197 @@
+"""
+Worker Python "chaud" exécuté dans un conteneur longue durée (main.py --warm).
+
+Le serveur importe une seule fois les librairies (numpy, pandas, sklearn...)
+puis attend des jobs sur une socket Unix. Chaque job est un script Python
+exécuté dans un processus forké depuis le serveur : il hérite des imports déjà
+faits, et les modules chargés par un job ne fuient pas vers le suivant.
+
+Limite : seuls les modules sûrs après fork sont préchargés. TensorFlow, keras et
+torch créent des threads et lisent leur configuration (TF_CPP_MIN_LOG_LEVEL,
+OMP_NUM_THREADS...) à l'import : importés par le serveur, ils seraient hérités
+à moitié initialisés par le fils, et les variables d'environnement fixées par
+le script avant son `import tensorflow` seraient ignorées. Ils restent importés
+par chaque job (FORK_UNSAFE).
+
+    serveur : python3 sir_worker.py serve --socket /tmp/sir_worker.sock --preload numpy,pandas
+    client  : python3 sir_worker.py run script.py [args ...]
+
+Le client (lancé par pipeline.sh quand SIR_WORKER_SOCKET est défini) transmet
+argv, répertoire courant et environnement, recopie la sortie du job et sort
+avec son code de retour. Si le serveur ne répond pas, le script est exécuté
+directement par un nouvel interpréteur.
+
+Le client n'importe que la bibliothèque standard.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import importlib
+
+SOCKET_ENV = "SIR_WORKER_SOCKET"
+DEFAULT_SOCKET = "/tmp/sir_worker.sock"
+EXIT_MARKER = b"\x00SIR_EXIT "
+CONNECT_TIMEOUT = 300  # s, le temps de l'import des librairies au démarrage du serveur
+# Modules jamais préchargés : threads et configuration créés à l'import, incompatibles avec le fork
+FORK_UNSAFE = ("tensorflow", "keras", "torch", "jax")
+
+
+def preload(modules):
+    for name in modules:
+        if name.split('.')[0] in FORK_UNSAFE:
+            print(f"[worker] {name} non préchargé : non sûr après fork, importé par chaque job", flush=True)
+            continue
+        start = time.time()
+        try:
+            importlib.import_module(name)
+            print(f"[worker] {name} importé ({time.time() - start:.1f} s)", flush=True)
+        except Exception as e:
+            print(f"[worker] {name} non importé : {e}", flush=True)
+
+
+def run_job(conn, request):
+    """Processus fils : sorties vers la socket, exécution du script comme __main__."""
+    import runpy
+    fd = conn.fileno()
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(fd, 1)
+    os.dup2(fd, 2)
+    sys.stdin = open(0, 'r', closefd=False)
+    sys.stdout = open(1, 'w', buffering=1, closefd=False)
+    sys.stderr = open(2, 'w', buffering=1, closefd=False)
+
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    script = os.path.abspath(request['argv'][0])
+    sys.argv = [script] + request['argv'][1:]
+    sys.path.insert(0, os.path.dirname(script))
+
+    code = 0
+    try:
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        if not isinstance(e.code, int) and e.code is not None:
+            print(e.code, file=sys.stderr)
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+        code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
+
+
+def read_request(conn):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    return json.loads(data.decode())
+
+
+def serve(socket_path, modules):
+    preload(modules)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(8)
+    print(f"[worker] Prêt sur {socket_path}", flush=True)
+
+    # Un job à la fois par conteneur : les étapes d'un pipeline.sh sont séquentielles
+    while True:
+        conn, _ = server.accept()
+        try:
+            request = read_request(conn)
+        except (ValueError, OSError) as e:
+            print(f"[worker] Requête invalide : {e}", flush=True)
+            conn.close()
+            continue
+        print(f"[worker] Job : {' '.join(request['argv'])}", flush=True)
+        start = time.time()
+        pid = os.fork()
+        if pid == 0:
+            server.close()
+            run_job(conn, request)
+        _, status = os.waitpid(pid, 0)
+        code = os.waitstatus_to_exitcode(status)
+        try:
+            conn.sendall(EXIT_MARKER + str(code).encode() + b"\n")
+        except OSError:
+            pass
+        conn.close()
+        print(f"[worker] Fin du job (code {code}, {time.time() - start:.1f} s)", flush=True)
+
+
+def connect(socket_path, timeout):
+    deadline = time.time() + timeout
+    while True:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            client.connect(socket_path)
+            return client
+        except OSError:
+            client.close()
+            if time.time() > deadline:
+                return None
+            time.sleep(0.5)
+
+
+def run(argv, socket_path, timeout=CONNECT_TIMEOUT):
+    """Client : exécute argv dans le worker et retourne son code de sortie."""
+    client = connect(socket_path, timeout)
+    if client is None:
+        print(f"ATTENTION : worker indisponible ({socket_path}), exécution directe.", file=sys.stderr)
+        os.execvp(sys.executable, [sys.executable] + argv)
+
+    request = {'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ)}
+    client.sendall(json.dumps(request).encode() + b"\n")
+
+    out = sys.stdout.buffer
+    pending = b""
+    keep = len(EXIT_MARKER) + 8
+    while True:
+        chunk = client.recv(65536)
+        if not chunk:
+            break
+        pending += chunk
+        # La fin du flux peut être le marqueur de sortie : on garde les derniers octets en réserve
+        if len(pending) > keep:
+            out.write(pending[:-keep])
+            out.flush()
+            pending = pending[-keep:]
+    client.close()
+
+    pos = pending.rfind(EXIT_MARKER)
+    if pos < 0:
+        out.write(pending)
+        out.flush()
+        print("ERREUR : connexion au worker interrompue.", file=sys.stderr)
+        return 1
+    out.write(pending[:pos])
+    out.flush()
+    return int(pending[pos + len(EXIT_MARKER):].strip() or 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker Python chaud pour les conteneurs SIR")
+    sub = parser.add_subparsers(dest='command', required=True)
+    srv = sub.add_parser('serve')
+    srv.add_argument('--socket', default=os.environ.get(SOCKET_ENV, DEFAULT_SOCKET))
+    srv.add_argument('--preload', default='numpy,pandas', help="Modules importés au démarrage (séparés par des virgules)")
+    cli = sub.add_parser('run')
+    cli.add_argument('argv', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.socket, [m.strip() for m in args.preload.split(',') if m.strip()])
+    else:
+        sys.exit(run(args.argv, os.environ.get(SOCKET_ENV, DEFAULT_SOCKET)))
@@ -0,0 +1,246 @@
+"""
+Cache adressé par contenu des étapes de conversion lancées par main.py.
+
+Chaque framework reconvertit NetMob23 avant d'entraîner son modèle. La clé
+d'une conversion est le sha1 de tout ce qui détermine ses sorties :
+
+    - le contenu des fichiers de trafic du dataset (Tile_*.txt),
+    - les fichiers annexes lus par le convertisseur (anomalies, geojson),
+    - le code du convertisseur (et netmob_store.py),
+    - les seules clés de config.ini lues par le convertisseur : changer les
+      hyperparamètres du modèle ne change pas la clé,
+    - en mode incrémental (AWSCTD bIncremental), les sorties déjà présentes,
+      que la conversion complète au lieu de les remplacer.
+
+Les sorties sont copiées dans .sir_cache/<framework>/<clé>/. Si la clé est
+déjà présente, main.py restaure les sorties dans le dossier du framework et
+exporte SIR_STAGE_CACHED=1 : pipeline.sh saute alors la conversion.
+
+Le sha1 d'un fichier n'est recalculé que si sa taille ou son mtime change
+(.sir_cache/digests.json).
+
+Usage : python stage_cache.py [framework ...]   (état du cache)
+"""
+import os
+import sys
+import glob
+import json
+import shutil
+import hashlib
+import configparser
+
+CACHE_DIR_NAME = ".sir_cache"
+DIGESTS_FILE = "digests.json"
+MANIFEST_FILE = "manifest.json"
+CACHE_KEEP = 3  # Entrées conservées par framework (les plus récentes)
+
+
+def _awsctd_stage(config):
+    """Entrées / sorties de convert_netmob_awsctd.py"""
+    output = config.get('FILES', 'sOutputCSV', fallback='netmob_for_awsctd.csv')
+    stem = os.path.splitext(output)[0]
+    outputs = [config.get('FILES', 'sOutputMeta', fallback='netmob_metadata.csv'),
+               stem + '_calibration.json', stem + '_sources.json']
+    if config.get('FILES', 'sOutputFormat', fallback='csv').lower() == 'npy':
+        outputs += [stem + '.npy', stem + '_labels.npy']
+    else:
+        outputs.append(output)
+    return {
+        'sources': ['convert_netmob_awsctd.py', config.get('FILES', 'sAnomalies', fallback='anomalies.txt')],
+        'data': [],
+        'config': {'DATA': None, 'MAIN': ['nMaxFiles'],
+                   'FILES': ['sOutputCSV', 'sOutputFormat', 'sOutputMeta', 'sAnomalies']},
+        'outputs': outputs,
+        'clear_on_miss': False,  # bIncremental : la conversion complète les sorties existantes
+        # ... qui font alors partie des entrées de la conversion (et de la clé)
+        'incremental': config.getboolean('DATA', 'bIncremental', fallback=False),
+    }
+
+
+def _causalrca_stage(config):
+    """Entrées / sorties de convert_netmob_causalrca.py"""
+    output_dir = config.get('PATHS', 'output_dir', fallback='./data_collected')
+    return {
+        'sources': ['convert_netmob_causalrca.py'],
+        'data': [config.get('PATHS', 'anomalies_file', fallback='Anomalies_NetMob23.txt'),
+                 config.get('PATHS', 'geojson_file', fallback='Lyon.geojson')],
+        'config': {'PATHS': None, 'DATA': None},
+        'outputs': [os.path.join(output_dir, 'anomaly_*.pkl')],
+        'clear_on_miss': True,  # pipeline.sh saute la conversion dès qu'un .pkl existe
+        'incremental': False,
+    }
+
+
+STAGES = {
+    "awsctd": _awsctd_stage,
+    "causalrca": _causalrca_stage,
+}
+
+
+class FileDigests:
+    """sha1 des fichiers, mémorisés par (taille, mtime)."""
+
+    def __init__(self, cache_dir):
+        self.path = os.path.join(cache_dir, DIGESTS_FILE)
+        self.digests = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                self.digests = json.load(f)
+        self.changed = False
+
+    def digest(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        known = self.digests.get(path)
+        if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2]
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 22), b''):
+                h.update(chunk)
+        self.digests[path] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        self.changed = True
+        return h.hexdigest()
+
+    def save(self):
+        if self.changed:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.digests, f)
+            os.replace(tmp, self.path)
+            self.changed = False
+
+
+class StageCache:
+    """Conversion d'un framework : clé, restauration et sauvegarde des sorties."""
+
+    def __init__(self, framework, framework_dir, data_dir, root_dir):
+        self.framework = framework.lower()
+        self.framework_dir = framework_dir
+        self.data_dir = data_dir
+        self.root_dir = root_dir
+        self.cache_dir = os.path.join(root_dir, CACHE_DIR_NAME)
+        config = configparser.ConfigParser()
+        config.optionxform = str
+        config.read(os.path.join(framework_dir, 'config.ini'))
+        self.config = config
+        self.stage = STAGES[self.framework](config)
+        self._key = None
+
+    def _config_items(self):
+        items = []
+        for section, keys in sorted(self.stage['config'].items()):
+            if not self.config.has_section(section):
+                continue
+            for k in sorted(keys if keys is not None else self.config.options(section)):
+                items.append(f"[{section}] {k} = {self.config.get(section, k, fallback='')}")
+        return items
+
+    def key(self):
+        if self._key is not None:
+            return self._key
+        import netmob_store
+        digests = FileDigests(self.cache_dir)
+        h = hashlib.sha1(self.framework.encode())
+        for item in self._config_items():
+            h.update(item.encode() + b'\n')
+        for rel in self.stage['sources']:
+            path = os.path.join(self.framework_dir, rel)
+            h.update(f"source {rel} ".encode())
+            h.update((digests.digest(path) if os.path.exists(path) else 'absent').encode())
+        h.update(digests.digest(os.path.join(self.root_dir, 'netmob_store.py')).encode())
+        for rel in netmob_store.list_source_files(self.data_dir) + self.stage['data']:
+            path = os.path.join(self.data_dir, rel)
+            h.update(f"data {rel} ".encode())
+            h.update((digests.digest(path) if os.path.exists(path) else 'absent').encode())
+        if self.stage['incremental']:
+            for rel in self.output_files():
+                h.update(f"output {rel} ".encode())
+                h.update(digests.digest(os.path.join(self.framework_dir, rel)).encode())
+        digests.save()
+        self._key = h.hexdigest()
+        return self._key
+
+    def entry_dir(self):
+        return os.path.join(self.cache_dir, self.framework, self.key())
+
+    def output_files(self):
+        """Sorties présentes dans le dossier du framework (chemins relatifs)"""
+        files = []
+        for pattern in self.stage['outputs']:
+            for path in sorted(glob.glob(os.path.join(self.framework_dir, pattern))):
+                files.append(os.path.relpath(path, self.framework_dir))
+        return files
+
+    def clear_outputs(self):
+        for rel in self.output_files():
+            os.remove(os.path.join(self.framework_dir, rel))
+
+    def restore(self):
+        """Copie les sorties en cache dans le dossier du framework. Retourne False si la clé est absente."""
+        manifest_path = os.path.join(self.entry_dir(), MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return False
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        self.clear_outputs()
+        for rel in manifest['files']:
+            dst = os.path.join(self.framework_dir, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(os.path.join(self.entry_dir(), 'files', rel), dst)
+        os.utime(manifest_path)  # Entrée récemment utilisée, gardée par prune()
+        return True
+
+    def store(self):
+        """Copie les sorties de la conversion sous la clé. Retourne le nb de fichiers sauvegardés."""
+        files = self.output_files()
+        if not files:
+            return 0
+        entry = self.entry_dir()
+        tmp = entry + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        for rel in files:
+            dst = os.path.join(tmp, 'files', rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(os.path.join(self.framework_dir, rel), dst)
+        with open(os.path.join(tmp, MANIFEST_FILE), 'w') as f:
+            json.dump({'framework': self.framework, 'key': self.key(), 'files': files,
+                       'config': self._config_items()}, f, indent=2)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+        self.prune()
+        return len(files)
+
+    def prune(self, keep=CACHE_KEEP):
+        root = os.path.join(self.cache_dir, self.framework)
+        entries = [os.path.join(root, d) for d in os.listdir(root)
+                   if os.path.exists(os.path.join(root, d, MANIFEST_FILE))]
+        entries.sort(key=lambda d: os.path.getmtime(os.path.join(d, MANIFEST_FILE)), reverse=True)
+        for old in entries[keep:]:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def open_stage(framework, framework_dir, data_dir, root_dir):
+    """StageCache du framework, ou None s'il n'a pas d'étape de conversion en cache."""
+    if framework.lower() not in STAGES:
+        return None
+    try:
+        import netmob_store  # noqa: F401  (liste des fichiers de trafic)
+    except ImportError:
+        print("ATTENTION : numpy indisponible, cache des conversions désactivé.")
+        return None
+    return StageCache(framework, framework_dir, data_dir, root_dir)
+
+
+if __name__ == "__main__":
+    root_dir = os.getcwd()  # Racine du projet, comme main.py
+    for framework in sys.argv[1:] or sorted(STAGES):
+        framework_root = os.path.join(root_dir, CACHE_DIR_NAME, framework.lower())
+        entries = sorted(os.listdir(framework_root)) if os.path.isdir(framework_root) else []
+        print(f"{framework} : {len(entries)} entrée(s)")
+        for key in entries:
+            manifest_path = os.path.join(framework_root, key, MANIFEST_FILE)
+            if os.path.exists(manifest_path):
+                with open(manifest_path, 'r') as f:
+                    print(f"    {key[:12]}  {len(json.load(f)['files'])} fichier(s)")
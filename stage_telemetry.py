@@ -0,0 +1,354 @@
+"""
+Mesures de ressources des étapes lancées par main.py.
+
+Chaque étape (build, pipeline Docker, store, cache...) ajoute une ligne au
+ledger logs/telemetry.jsonl :
+
+    run, framework, étape, commande, début, durée (s), temps CPU (s),
+    pic mémoire (Mo), octets lus / écrits (Mo), code de retour, source des mesures
+
+- Commandes hôte : rusage du processus et de ses descendants (os.wait4).
+- Conteneurs Docker : le client docker ne consomme rien, les mesures viennent
+  du cgroup du conteneur (cgroup v2 ou v1), échantillonné pendant l'exécution.
+  Sans accès aux cgroups (Docker Desktop), repli sur `docker stats` (mémoire
+  et I/O seulement).
+- Étapes Python de main.py (store, cache) : getrusage du processus.
+
+Usage : python stage_telemetry.py [logs/telemetry.jsonl] [--run RUN_ID]
+        (tableau récapitulatif, par défaut le dernier run)
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+LEDGER_FILE = os.path.join("logs", "telemetry.jsonl")
+POLL_INTERVAL = 0.5  # s entre deux lectures des cgroups
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+CGROUP_V2_DIRS = ("system.slice/docker-{id}.scope", "docker/{id}")
+CGROUP_V1_DIRS = ("docker/{id}", "system.slice/docker-{id}.scope")
+
+SIZE_RE = re.compile(r'([\d.]+)\s*([kKMGT]?i?B)')
+SIZE_UNITS = {'B': 1, 'kB': 1e3, 'KB': 1e3, 'KiB': 1024, 'MB': 1e6, 'MiB': 1024 ** 2,
+              'GB': 1e9, 'GiB': 1024 ** 3, 'TB': 1e12, 'TiB': 1024 ** 4}
+MB = 1024 * 1024
+
+
+# ---------------------------------------------------------------------------
+# Lecture des statistiques d'un conteneur
+# ---------------------------------------------------------------------------
+
+def _read(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def _cgroup_v2(cid):
+    for pattern in CGROUP_V2_DIRS:
+        base = os.path.join(CGROUP_ROOT, pattern.format(id=cid))
+        if not os.path.exists(os.path.join(base, "cpu.stat")):
+            continue
+        stats = {'cpu_s': None, 'mem': 0, 'mem_peak': None, 'read': 0, 'write': 0}
+        cpu = dict(line.split() for line in _read(os.path.join(base, "cpu.stat")).splitlines() if line)
+        stats['cpu_s'] = int(cpu.get('usage_usec', 0)) / 1e6
+        stats['mem'] = int(_read(os.path.join(base, "memory.current")))
+        if os.path.exists(os.path.join(base, "memory.peak")):
+            stats['mem_peak'] = int(_read(os.path.join(base, "memory.peak")))
+        if os.path.exists(os.path.join(base, "io.stat")):
+            for line in _read(os.path.join(base, "io.stat")).splitlines():
+                fields = dict(kv.split('=') for kv in line.split()[1:] if '=' in kv)
+                stats['read'] += int(fields.get('rbytes', 0))
+                stats['write'] += int(fields.get('wbytes', 0))
+        return stats
+    return None
+
+
+def _cgroup_v1(cid):
+    for pattern in CGROUP_V1_DIRS:
+        rel = pattern.format(id=cid)
+        cpu_file = os.path.join(CGROUP_ROOT, "cpuacct", rel, "cpuacct.usage")
+        if not os.path.exists(cpu_file):
+            continue
+        stats = {'cpu_s': int(_read(cpu_file)) / 1e9, 'mem': 0, 'mem_peak': None, 'read': 0, 'write': 0}
+        mem_dir = os.path.join(CGROUP_ROOT, "memory", rel)
+        if os.path.exists(mem_dir):
+            stats['mem'] = int(_read(os.path.join(mem_dir, "memory.usage_in_bytes")))
+            stats['mem_peak'] = int(_read(os.path.join(mem_dir, "memory.max_usage_in_bytes")))
+        io_file = os.path.join(CGROUP_ROOT, "blkio", rel, "blkio.throttle.io_service_bytes")
+        if os.path.exists(io_file):
+            for line in _read(io_file).splitlines():
+                parts = line.split()
+                if len(parts) == 3 and parts[1] == 'Read':
+                    stats['read'] += int(parts[2])
+                elif len(parts) == 3 and parts[1] == 'Write':
+                    stats['write'] += int(parts[2])
+        return stats
+    return None
+
+
+def parse_size(text):
+    match = SIZE_RE.search(text)
+    if not match:
+        return 0
+    return int(float(match.group(1)) * SIZE_UNITS.get(match.group(2), 1))
+
+
+def _docker_stats(cid):
+    try:
+        output = subprocess.check_output(f"docker stats --no-stream --format \"{{{{.MemUsage}}}}|{{{{.BlockIO}}}}\" {cid}",
+                                         shell=True, stderr=subprocess.DEVNULL).decode().strip()
+    except subprocess.CalledProcessError:
+        return None
+    if '|' not in output:
+        return None
+    mem, block = output.split('|', 1)
+    read, _, write = block.partition('/')
+    return {'cpu_s': None, 'mem': parse_size(mem.split('/')[0]), 'mem_peak': None,
+            'read': parse_size(read), 'write': parse_size(write)}
+
+
+def container_stats(cid):
+    """Statistiques cumulées du conteneur (None s'il n'existe plus)."""
+    try:
+        stats = _cgroup_v2(cid) or _cgroup_v1(cid)
+    except (OSError, ValueError):
+        stats = None
+    if stats is not None:
+        stats['source'] = 'cgroup'
+        return stats
+    stats = _docker_stats(cid)
+    if stats is not None:
+        stats['source'] = 'docker stats'
+    return stats
+
+
+# ---------------------------------------------------------------------------
+# Conteneurs d'une étape
+# ---------------------------------------------------------------------------
+
+def _docker_ids(cmd):
+    try:
+        return subprocess.check_output(cmd, shell=True, stderr=subprocess.DEVNULL).decode().split()
+    except subprocess.CalledProcessError:
+        return []
+
+
+def containers_from_cidfile(path):
+    """Conteneur créé par docker run --cidfile"""
+    def find():
+        if os.path.exists(path):
+            cid = _read(path).strip()
+            return [cid] if cid else []
+        return []
+    return find
+
+
+def containers_from_name(name):
+    return lambda: _docker_ids(f"docker inspect -f \"{{{{.Id}}}}\" {name}")
+
+
+def containers_from_label(label):
+    """Conteneurs créés par docker compose run (label com.docker.compose.project=...)"""
+    return lambda: _docker_ids(f"docker ps -q --no-trunc --filter label={label}")
+
+
+class ContainerSampler(threading.Thread):
+    """Échantillonne les cgroups des conteneurs d'une étape pendant son exécution.
+
+    baseline=True : conteneur déjà démarré (conteneur chaud), seules les
+    variations pendant l'étape sont comptées et le pic mémoire est le maximum
+    échantillonné.
+    """
+
+    def __init__(self, find, baseline=False):
+        super().__init__(daemon=True)
+        self.find = find
+        self.baseline = baseline
+        self.first = {}
+        self.last = {}
+        self.peak = {}
+        self.ids = []
+        self._stop_event = threading.Event()
+        if baseline:
+            self.sample()
+
+    def sample(self):
+        ids = self.find() or self.ids
+        self.ids = ids
+        for cid in ids:
+            stats = container_stats(cid)
+            if stats is None:
+                continue
+            if cid not in self.first:
+                self.first[cid] = stats if self.baseline else dict(stats, cpu_s=0 if stats['cpu_s'] is not None else None, read=0, write=0)
+            self.last[cid] = stats
+            peak = stats['mem'] if self.baseline or stats['mem_peak'] is None else stats['mem_peak']
+            self.peak[cid] = max(self.peak.get(cid, 0), peak)
+
+    def run(self):
+        while not self._stop_event.wait(POLL_INTERVAL):
+            self.sample()
+
+    def finish(self):
+        self._stop_event.set()
+        self.join()
+        self.sample()  # Conteneur supprimé (--rm) : la dernière lecture du thread est conservée
+        if not self.last:
+            return None
+        total = {'cpu_s': None, 'peak': max(self.peak.values()), 'read': 0, 'write': 0,
+                 'source': '+'.join(sorted(set(s['source'] for s in self.last.values())))}
+        for cid, last in self.last.items():
+            first = self.first[cid]
+            if last['cpu_s'] is not None and first['cpu_s'] is not None:
+                total['cpu_s'] = (total['cpu_s'] or 0) + last['cpu_s'] - first['cpu_s']
+            total['read'] += max(0, last['read'] - first['read'])
+            total['write'] += max(0, last['write'] - first['write'])
+        return total
+
+
+# ---------------------------------------------------------------------------
+# Ledger
+# ---------------------------------------------------------------------------
+
+def _round(value, digits=2):
+    return None if value is None else round(value, digits)
+
+
+class Ledger:
+    """Ajoute une ligne par étape à logs/telemetry.jsonl (utilisable depuis plusieurs threads)."""
+
+    def __init__(self, path=LEDGER_FILE, run_id=None):
+        self.path = path
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, framework, stage, command, start, wall_s, cpu_s, peak_bytes, read_bytes, write_bytes, exit_code, source):
+        record = {
+            'run': self.run_id, 'framework': framework, 'stage': stage, 'command': command,
+            'start': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start)),
+            'wall_s': _round(wall_s), 'cpu_s': _round(cpu_s),
+            'peak_rss_mb': _round(peak_bytes / MB if peak_bytes is not None else None, 1),
+            'read_mb': _round(read_bytes / MB if read_bytes is not None else None, 1),
+            'write_mb': _round(write_bytes / MB if write_bytes is not None else None, 1),
+            'exit_code': exit_code, 'source': source,
+        }
+        with self._lock:
+            self.records.append(record)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+    def run(self, framework, stage, cmd, cwd=None, log=None, env=None, containers=None, baseline=False):
+        """subprocess.call mesuré. containers : fonction retournant les ids des conteneurs de l'étape."""
+        sampler = ContainerSampler(containers, baseline) if containers else None
+        start = time.time()
+        proc = subprocess.Popen(cmd, shell=True, cwd=cwd, env=env, stdout=log,
+                                stderr=subprocess.STDOUT if log else None, stdin=subprocess.DEVNULL if log else None)
+        if sampler:
+            sampler.start()
+        usage = None
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+        else:
+            proc.wait()
+        wall = time.time() - start
+        container = sampler.finish() if sampler else None
+
+        # Mesures hôte (le client docker, ou la commande elle-même) + celles des conteneurs
+        cpu = peak = read = write = None
+        sources = []
+        if usage is not None:
+            cpu = usage.ru_utime + usage.ru_stime
+            peak = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+            read = usage.ru_inblock * 512
+            write = usage.ru_oublock * 512
+            sources.append('host')
+        if container is not None:
+            if container['cpu_s'] is not None:
+                cpu = (cpu or 0) + container['cpu_s']
+            peak = max(peak or 0, container['peak'])
+            read = (read or 0) + container['read']
+            write = (write or 0) + container['write']
+            sources.append(container['source'])
+        self.add(framework, stage, cmd, start, wall, cpu, peak, read, write, proc.returncode, '+'.join(sources) or None)
+        return proc.returncode
+
+    @contextmanager
+    def measure(self, framework, stage, command=''):
+        """Étape exécutée dans le processus de main.py"""
+        start = time.time()
+        before = resource.getrusage(resource.RUSAGE_SELF) if resource else None
+        exit_code = 0
+        try:
+            yield
+        except BaseException:
+            exit_code = 1
+            raise
+        finally:
+            wall = time.time() - start
+            cpu = peak = read = write = None
+            if before is not None:
+                after = resource.getrusage(resource.RUSAGE_SELF)
+                cpu = after.ru_utime + after.ru_stime - before.ru_utime - before.ru_stime
+                peak = after.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+                read = (after.ru_inblock - before.ru_inblock) * 512
+                write = (after.ru_oublock - before.ru_oublock) * 512
+            self.add(framework, stage, command, start, wall, cpu, peak, read, write, exit_code, 'process' if before else None)
+
+    def summary(self):
+        print_summary(self.records)
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else '-'
+
+
+def print_summary(records):
+    if not records:
+        return
+    print("\n>>> Ressources par étape")
+    print(f"    {'Framework':<14} {'Étape':<10} {'Durée s':>9} {'CPU s':>9} {'Pic Mo':>9} {'Lu Mo':>9} {'Écrit Mo':>9} {'Code':>5}  Source")
+    totals = {}
+    for r in records:
+        print(f"    {r['framework']:<14} {r['stage']:<10} {_fmt(r['wall_s'], '9.1f')} {_fmt(r['cpu_s'], '9.1f')} "
+              f"{_fmt(r['peak_rss_mb'], '9.0f')} {_fmt(r['read_mb'], '9.0f')} {_fmt(r['write_mb'], '9.0f')} "
+              f"{_fmt(r['exit_code'], '5d')}  {r['source'] or '-'}")
+        total = totals.setdefault(r['framework'], [0.0, 0.0])
+        total[0] += r['wall_s'] or 0
+        total[1] += r['cpu_s'] or 0
+    if len(totals) > 1:
+        print("    " + "-" * 40)
+        for framework, (wall, cpu) in sorted(totals.items(), key=lambda item: -item[1][0]):
+            print(f"    {framework:<14} {'total':<10} {wall:9.1f} {cpu:9.1f}")
+
+
+def load_records(path=LEDGER_FILE, run_id=None):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if run_id is None and records:
+        run_id = records[-1]['run']
+    return [r for r in records if r['run'] == run_id]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Récapitulatif des mesures des étapes de main.py")
+    parser.add_argument("ledger", nargs="?", default=LEDGER_FILE)
+    parser.add_argument("--run", default=None, help="Identifiant du run (défaut : le dernier)")
+    args = parser.parse_args()
+    print_summary(load_records(args.ledger, args.run))
@@ -0,0 +1,65 @@
+import pytest
+
+import main
+
+
+class TestClass:
+    def test_parse_dag(self):
+        names, deps = main.parse_dag(["AWSCTD>CausalRCA", "TraceAnomaly > AlertRCA", "awsctd>AlertRCA", "SGmVRNN"])
+
+        # le premier nom rencontré est gardé pour l'affichage
+        assert names == {"awsctd": "AWSCTD", "causalrca": "CausalRCA", "traceanomaly": "TraceAnomaly",
+                         "alertrca": "AlertRCA", "sgmvrnn": "SGmVRNN"}
+        assert deps == {"awsctd": set(), "causalrca": {"awsctd"}, "traceanomaly": set(),
+                        "alertrca": {"traceanomaly", "awsctd"}, "sgmvrnn": set()}
+
+    def test_parse_dag_chain(self):
+        _, deps = main.parse_dag(["a>b>c", ">d>"])
+        assert deps == {"a": set(), "b": {"a"}, "c": {"b"}, "d": set()}
+
+    def test_topological_order(self):
+        _, deps = main.parse_dag(["c>b>a", "d>a", "e"])
+        order = main.topological_order(deps)
+
+        assert sorted(order) == ["a", "b", "c", "d", "e"]
+        for node, ups in deps.items():
+            for up in ups:
+                assert order.index(up) < order.index(node)
+        # ordre stable d'une exécution à l'autre
+        assert order == main.topological_order(deps)
+
+    def test_topological_order_cycle(self):
+        _, deps = main.parse_dag(["a>b", "b>c", "c>a"])
+        with pytest.raises(ValueError):
+            main.topological_order(deps)
+
+    def test_wired_inputs(self):
+        _, deps = main.parse_dag(["AWSCTD>AlertRCA", "TraceAnomaly>AlertRCA"])
+        pairs = main.wired_inputs("alertrca", deps)
+
+        assert pairs == (main.REPORT_WIRING[("awsctd", "alertrca")]
+                         + main.REPORT_WIRING[("traceanomaly", "alertrca")])
+        assert main.wired_inputs("awsctd", deps) == []
+
+    def test_stage_key_shared_files(self, tmp_path):
+        tmp_path.joinpath("AWSCTD").mkdir()
+        tmp_path.joinpath("AWSCTD", "convert.py").write_text("# convert\n")
+        tmp_path.joinpath("docker").mkdir()
+        files = {"netmob_store.py": "# store\n", "sir_worker.py": "# worker\n",
+                 "docker/base.Dockerfile": "FROM python\n", "docker/base-py3.10.txt": "numpy\n"}
+        for rel, text in files.items():
+            tmp_path.joinpath(rel).write_text(text)
+        _, deps = main.parse_dag(["AWSCTD"])
+
+        def key():
+            return main.stage_key("awsctd", "AWSCTD", deps, str(tmp_path), "data")
+
+        keys = [key()]
+        assert key() == keys[0]
+        # Module monté ou image de base modifiés : nouvelle clé
+        for rel, text in files.items():
+            tmp_path.joinpath(rel).write_text(text + "# v2\n")
+            keys.append(key())
+        tmp_path.joinpath("docker", "base-py3.9-torch.txt").write_text("torch\n")
+        keys.append(key())
+        assert len(set(keys)) == len(keys)
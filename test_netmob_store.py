@@ -0,0 +1,227 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+import importlib.util
+
+import numpy as np
+import pytest
+
+import netmob_store
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+VALUES = ' '.join(str(v) for v in range(100, 110))
+ROWS = {
+    'Facebook/Facebook_DL_Tile_1.txt': [
+        '20190316 123456789 0.123456789 385 0.5 1e-07 ' + VALUES,
+        '20190317 nan 519 671 756 ' + VALUES,
+        '20190318 abc 519 671 756 ' + VALUES,
+        '20190319 1 2 3',
+    ],
+    'Netflix/Netflix_UL_Tile_2.txt': [
+        '20190317 7 8 9 10 ' + VALUES,
+        '20190316 3.25 4 5 NaN ' + VALUES,
+    ],
+    # Sous-dossier : lu par le store, pas par la lecture non récursive d'AlertRCA
+    'Facebook/DL/Facebook_DL_Tile_3.txt': ['20190316 ' + VALUES],
+    'Anomalies_NetMob23.txt': ['20190316 Facebook 1'],
+}
+
+
+def make_dataset(root):
+    data = root / 'NetMob23'
+    for rel, lines in ROWS.items():
+        path = data / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('\n'.join(lines) + '\n')
+    return data
+
+
+def load_module(name, rel_path):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, rel_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_script(script, cwd, env, *args):
+    env = dict(os.environ, PYTHONPATH=ROOT, **env)
+    result = subprocess.run([sys.executable, str(script)] + list(args), cwd=str(cwd), env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    return result.stdout
+
+
+class TestClass:
+    def test_build_open(self, tmp_path):
+        data = make_dataset(tmp_path)
+        assert netmob_store.open_store(str(data)) is None
+
+        netmob_store.build_store(str(data))
+        store = netmob_store.open_store(str(data))
+        assert [s['file'] for s in store.series] == ['Facebook/DL/Facebook_DL_Tile_3.txt',
+                                                    'Facebook/Facebook_DL_Tile_1.txt',
+                                                    'Netflix/Netflix_UL_Tile_2.txt']
+        assert [(s['app'], s['tile']) for s in store.series] == [('Facebook', '3'), ('Facebook', '1'),
+                                                                 ('Netflix', '2')]
+        assert store.dates == ['20190316', '20190317', '20190318', '20190319']
+        assert store.n_slots == 15
+        assert store.values.dtype == np.float64
+        assert store.series_index(str(data / 'Netflix' / 'Netflix_UL_Tile_2.txt')) == 2
+        assert store.series_index('Facebook_DL_Tile_1.txt') == 1
+
+        # Source modifiée : store périmé, sauf si on ne vérifie pas les sources
+        with open(str(data / 'Netflix' / 'Netflix_UL_Tile_2.txt'), 'a') as f:
+            f.write('20190318 1 2\n')
+        assert netmob_store.open_store(str(data)) is None
+        assert netmob_store.open_store(str(data), check_sources=False) is not None
+
+        netmob_store.build_store(str(data))
+        assert netmob_store.open_store(str(data)) is not None
+
+        # Store d'une autre version : ignoré
+        index_path = str(data / netmob_store.STORE_DIR_NAME / netmob_store.INDEX_FILE)
+        with open(index_path) as f:
+            index = json.load(f)
+        index['version'] = netmob_store.STORE_VERSION - 1
+        with open(index_path, 'w') as f:
+            json.dump(index, f)
+        assert netmob_store.open_store(str(data)) is None
+
+    def test_rows_and_masks(self, tmp_path):
+        data = make_dataset(tmp_path)
+        netmob_store.build_store(str(data))
+        store = netmob_store.open_store(str(data))
+
+        assert store.mask.tolist() == [[True, False, False, False],
+                                       [True, True, True, True],
+                                       [True, True, False, False]]
+        # 'abc' : ligne invalide ; 'nan' / 'NaN' : valeurs absentes, lignes valides
+        assert store.invalid_mask.tolist() == [[False] * 4,
+                                               [False, False, True, False],
+                                               [False] * 4]
+
+        rows = list(store.iter_rows([1, 2]))
+        assert [(s, date, len(vals)) for s, date, vals in rows] == [
+            (1, '20190316', 15), (1, '20190317', 14), (1, '20190318', 14), (1, '20190319', 3),
+            (2, '20190317', 14), (2, '20190316', 14)]
+        # Lignes non triées : ordre du fichier
+        assert store.rows(2).tolist() == [1, 0]
+        assert store.rows(1).tolist() == [0, 1, 2, 3]
+        assert np.isnan(rows[1][2][0]) and np.isnan(rows[2][2][0])
+        assert (store.row(1, '20190319') == [1, 2, 3]).all()
+        assert store.row(0, '20190319') is None
+
+        # Tokens d'origine, y compris pour la ligne invalide
+        for s, date, vals in rows:
+            rel = store.series[s]['file']
+            line = [l for l in ROWS[rel] if l.startswith(date)][0]
+            tokens = [t if t.lower() != 'nan' else 'nan' for t in line.split()[1:]]
+            assert store.tokens(s, date, vals) == tokens
+
+    def test_format_value(self):
+        for token in ['385', '0', '0.5', '0.123456789', '123456789', '3.25', '1e-07', '-4']:
+            assert netmob_store.format_value(float(token)) == token
+        assert netmob_store.format_value(np.nan) == 'nan'
+        values, bad = netmob_store.parse_tokens(['1', 'abc'])
+        assert bad and values[0] == 1 and np.isnan(values[1])
+        assert netmob_store.parse_values(['1', '2']).dtype == np.float32
+
+    def test_traceanomaly_parity(self, tmp_path):
+        data = make_dataset(tmp_path)
+        script = os.path.join(ROOT, 'TraceAnomaly', 'traitementdata.py')
+        env = {'SIR_NETMOB_DIR': str(data)}
+        # --format npy supprime un merged_flows texte : un dossier par format et par source
+        dirs = {}
+        for name in ('text', 'text_npy', 'store', 'store_npy'):
+            dirs[name] = tmp_path / name
+            dirs[name].mkdir()
+
+        run_script(script, dirs['text'], env)
+        run_script(script, dirs['text_npy'], env, '--format', 'npy')
+        netmob_store.build_store(str(data))
+        assert 'Lecture depuis le store' in run_script(script, dirs['store'], env)
+        assert 'Lecture depuis le store' in run_script(script, dirs['store_npy'], env, '--format', 'npy')
+
+        merged = (dirs['text'] / 'merged_flows').read_text()
+        assert 'Facebook_1_20190316:123456789,0.123456789,385,0.5,1e-07,' in merged
+        assert (dirs['store'] / 'merged_flows').read_text() == merged
+        for name in ('merged_flows.npy', 'merged_flows.ids.npy'):
+            expected = np.load(str(dirs['text_npy'] / name))
+            assert len(expected) == merged.count('\n')
+            assert (np.load(str(dirs['store_npy'] / name)) == expected).all()
+
+    def test_alertrca_parity(self, tmp_path):
+        data = make_dataset(tmp_path)
+        # Copie du script : ses sorties (A_NetMob/) restent dans tmp_path
+        script_dir = tmp_path / 'AlertRCA'
+        script_dir.joinpath('A_NetMob').mkdir(parents=True)
+        shutil.copy(os.path.join(ROOT, 'AlertRCA', 'traitementdata.py'), str(script_dir))
+        # Montages docker : /data/facebook -> NetMob23/Facebook
+        flows = tmp_path / 'flows'
+        flows.mkdir()
+        os.symlink(str(data / 'Facebook'), str(flows / 'facebook'))
+        os.symlink(str(data / 'Netflix'), str(flows / 'netflix'))
+        env = {'SIR_NETMOB_DIR': str(data),
+               'SIR_FLOW_DIRS': os.pathsep.join([str(flows / 'facebook'), str(flows / 'netflix')])}
+        text_dir, store_dir = tmp_path / 'text', tmp_path / 'store'
+        text_dir.mkdir()
+        store_dir.mkdir()
+
+        # La suite du script (faults_TraceAnomaly.csv) n'est pas testée ici
+        assert 'File created' in run_script(script_dir / 'traitementdata.py', text_dir, env)
+        netmob_store.build_store(str(data))
+        out = run_script(script_dir / 'traitementdata.py', store_dir, env)
+        assert 'Lecture depuis le store' in out and 'File created' in out
+
+        merged = (text_dir / 'merged_flows').read_text()
+        assert 'Facebook_1_20190318:abc,519' in merged
+        assert 'Facebook_3_' not in merged
+        assert (store_dir / 'merged_flows').read_text() == merged
+
+    def test_aoc_ids_parity(self, tmp_path):
+        pytest.importorskip('scipy')
+        pytest.importorskip('sklearn')
+        aoc = load_module('aoc_convert', os.path.join('AOC_IDS', 'convert.py'))
+        data = make_dataset(tmp_path)
+        paths = [str(data / rel) for rel in ROWS if 'Tile' in rel]
+        text = [aoc.process_file(path, i, None) for i, path in enumerate(paths)]
+        assert all(text)
+
+        netmob_store.build_store(str(data))
+        store = netmob_store.open_store(str(data))
+        assert [aoc.process_file(path, i, store) for i, path in enumerate(paths)] == text
+
+    def test_causalrca_parity(self, tmp_path):
+        causal = load_module('causalrca_convert', os.path.join('CausalRCA', 'convert_netmob_causalrca.py'))
+        data = make_dataset(tmp_path)
+        file_mapping = {'1': str(data / 'Facebook' / 'Facebook_DL_Tile_1.txt'),
+                        '2': str(data / 'Netflix' / 'Netflix_UL_Tile_2.txt'),
+                        '3': str(data / 'Facebook' / 'DL' / 'Facebook_DL_Tile_3.txt')}
+        centroids = {'1': np.array([0.0, 0.0]), '2': np.array([1.0, 0.0]), '3': np.array([0.0, 2.0])}
+        tasks = [{'tile_id': '1', 'date': date} for date in ('20190316', '20190317', '20190318', '20190320')]
+        text = [causal.process_anomaly(task, centroids, file_mapping, None) for task in tasks]
+        assert [df is None for df in text] == [False, False, False, True]
+
+        netmob_store.build_store(str(data))
+        store = netmob_store.open_store(str(data))
+        for task, expected in zip(tasks, text):
+            df = causal.process_anomaly(task, centroids, file_mapping, store)
+            if expected is None:
+                assert df is None
+            else:
+                assert df.equals(expected)
+
+    def test_sgmvrnn_parity(self, tmp_path):
+        pytest.importorskip('torch')
+        seq = load_module('sgmvrnn_netmob_to_seq', os.path.join('SGmVRNN', 'scripts', 'netmob_to_seq.py'))
+        data = make_dataset(tmp_path)
+        path = str(data / 'Netflix' / 'Netflix_UL_Tile_2.txt')
+        ts, label, X = seq.read_tile_txt(path, None)
+
+        netmob_store.build_store(str(data))
+        store = netmob_store.open_store(str(data))
+        store_ts, store_label, store_X = seq.read_tile_txt(path, store)
+        assert (store_ts == ts).all() and (store_label == label).all()
+        assert store_X.dtype == X.dtype and (store_X == X).all()
@@ -0,0 +1,104 @@
+import os
+
+import stage_cache
+
+
+def make_project(root):
+    """Arborescence minimale : netmob_store.py, AWSCTD/ (config + convertisseur), NetMob23/ (trafic)"""
+    root.joinpath('netmob_store.py').write_text('# store\n')
+    fw = root / 'AWSCTD'
+    fw.mkdir()
+    fw.joinpath('config.ini').write_text('[MAIN]\nnMaxFiles = 10\nnEpochs = 5\n[DATA]\nnVocabSize = 100\n'
+                                         '[FILES]\nsOutputCSV = tokens.csv\n')
+    fw.joinpath('convert_netmob_awsctd.py').write_text('# convert\n')
+    data = root / 'NetMob23'
+    data.mkdir()
+    data.joinpath('Tile_1.txt').write_text('2019-03-16 1 2 3\n')
+    return fw, data
+
+
+def open_stage(root, fw, data):
+    return stage_cache.StageCache('AWSCTD', str(fw), str(data), str(root))
+
+
+class TestClass:
+    def test_key(self, tmp_path):
+        fw, data = make_project(tmp_path)
+        key = open_stage(tmp_path, fw, data).key()
+        assert key == open_stage(tmp_path, fw, data).key()
+
+        # Hyperparamètre du modèle : non lu par le convertisseur, même clé
+        config = fw.joinpath('config.ini').read_text()
+        fw.joinpath('config.ini').write_text(config.replace('nEpochs = 5', 'nEpochs = 50'))
+        assert open_stage(tmp_path, fw, data).key() == key
+
+        # Clé lue par le convertisseur, données et code : nouvelle clé
+        fw.joinpath('config.ini').write_text(config.replace('nVocabSize = 100', 'nVocabSize = 50'))
+        vocab_key = open_stage(tmp_path, fw, data).key()
+        assert vocab_key != key
+        fw.joinpath('config.ini').write_text(config)
+
+        data.joinpath('Tile_1.txt').write_text('2019-03-16 1 2 30\n')
+        data_key = open_stage(tmp_path, fw, data).key()
+        assert data_key not in (key, vocab_key)
+
+        fw.joinpath('convert_netmob_awsctd.py').write_text('# convert v2\n')
+        assert open_stage(tmp_path, fw, data).key() not in (key, vocab_key, data_key)
+
+    def test_store_restore(self, tmp_path):
+        fw, data = make_project(tmp_path)
+        stage = open_stage(tmp_path, fw, data)
+        assert stage.restore() is False
+        assert stage.store() == 0
+
+        outputs = {'tokens.csv': 'a,b\n', 'tokens_calibration.json': '{}', 'tokens_sources.json': '{}',
+                   'netmob_metadata.csv': 'Date,Tile\n'}
+        for rel, text in outputs.items():
+            fw.joinpath(rel).write_text(text)
+        assert stage.store() == len(outputs)
+
+        for rel in outputs:
+            os.remove(str(fw / rel))
+        fw.joinpath('tokens.csv').write_text('stale\n')
+        assert open_stage(tmp_path, fw, data).restore() is True
+        for rel, text in outputs.items():
+            assert fw.joinpath(rel).read_text() == text
+
+    def test_prune(self, tmp_path):
+        fw, data = make_project(tmp_path)
+        keys = []
+        for i in range(stage_cache.CACHE_KEEP + 2):
+            data.joinpath('Tile_1.txt').write_text('2019-03-16' + ' 1' * i + '\n')
+            stage = open_stage(tmp_path, fw, data)
+            fw.joinpath('tokens.csv').write_text('%d\n' % i)
+            stage.store()
+            keys.append(stage.key())
+            # mtime des manifestes distincts d'une entrée à l'autre
+            manifest = os.path.join(stage.entry_dir(), stage_cache.MANIFEST_FILE)
+            os.utime(manifest, (1000000 + i, 1000000 + i))
+
+        stage.prune()
+        kept = sorted(os.listdir(os.path.join(str(tmp_path), stage_cache.CACHE_DIR_NAME, 'awsctd')))
+        assert kept == sorted(keys[-stage_cache.CACHE_KEEP:])
+
+    def test_key_incremental(self, tmp_path):
+        fw, data = make_project(tmp_path)
+        config = fw.joinpath('config.ini').read_text()
+        fw.joinpath('tokens.csv').write_text('a,b\n')
+        key = open_stage(tmp_path, fw, data).key()
+        # Conversion complète : les sorties existantes sont remplacées, même clé
+        fw.joinpath('tokens.csv').write_text('a,b,c\n')
+        assert open_stage(tmp_path, fw, data).key() == key
+
+        # bIncremental : la conversion complète les sorties existantes, elles entrent dans la clé
+        fw.joinpath('config.ini').write_text(config.replace('[DATA]\n', '[DATA]\nbIncremental = true\n'))
+        os.remove(str(fw / 'tokens.csv'))
+        empty_key = open_stage(tmp_path, fw, data).key()
+        fw.joinpath('tokens.csv').write_text('a,b\n')
+        first_key = open_stage(tmp_path, fw, data).key()
+        fw.joinpath('tokens.csv').write_text('a,b,c\n')
+        second_key = open_stage(tmp_path, fw, data).key()
+        fw.joinpath('tokens_sources.json').write_text('{}')
+        sources_key = open_stage(tmp_path, fw, data).key()
+        assert len({key, empty_key, first_key, second_key, sources_key}) == 5
+        assert open_stage(tmp_path, fw, data).key() == sources_key